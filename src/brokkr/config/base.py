@@ -7,10 +7,14 @@
 import argparse
 import collections.abc
 import copy
+import hashlib
 import json
 import logging
 import os
 from pathlib import Path
+import pickle
+import stat
+import sys
 
 # Third party imports
 import tomli
@@ -48,6 +52,13 @@
 LEVEL_CLASS = "level_class"
 LEVEL_ARGS = "level_args"
 
+# Rendered config snapshot cache; set the env var to any value to disable
+CACHE_DISABLE_ENV_VAR = "BROKKR_NO_CONFIG_CACHE"
+CACHE_EXTENSION = "pickle"
+CACHE_FORMAT_VERSION = 1
+CACHE_DIR_MODE = 0o700
+CACHE_FILE_MODE = 0o600
+
 
 # --- Utility functions --- #
 
@@ -105,6 +116,28 @@ def read_config_file(path, extension=None, logger=None):
     return config_data
 
 
+def get_file_key(path):
+    """Get the path, modification time and size of a file, if it exists."""
+    try:
+        file_stat = os.stat(path)
+    except OSError:
+        return (str(path), None, None)
+    return (str(path), file_stat.st_mtime_ns, file_stat.st_size)
+
+
+def hash_key(key_data):
+    key_json = json.dumps(key_data, sort_keys=True, default=str)
+    return hashlib.sha256(key_json.encode("utf-8")).hexdigest()
+
+
+def check_cache_path_private(path_stat):
+    """Check a cache file or dir is owned by and only writable by us."""
+    if not hasattr(os, "geteuid"):  # Can't check ownership, e.g. Windows
+        return False
+    return (path_stat.st_uid == os.geteuid()
+            and not path_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH))
+
+
 def write_config_file(config_data, path, extension=None):
     path = Path(path)
     if extension is None:
@@ -199,6 +232,7 @@ def __init__(
             preset_config_path=None,
             path_variables=None,
             config_version=CONFIG_VERSION_DEFAULT,
+            cache_path=None,
                 ):
         self.name = name
         self.defaults = {} if defaults is None else defaults
@@ -209,6 +243,7 @@ def __init__(
             None if preset_config_path is None else Path(preset_config_path))
         self.path_variables = [] if path_variables is None else path_variables
         self.config_version = config_version
+        self.cache_path = None if cache_path is None else Path(cache_path)
 
 
 # --- Config level classes #
@@ -232,6 +267,19 @@ def generate_config(self):
             config_data = {}
         return config_data
 
+    def get_source_key(self):
+        """
+        Get a key that changes whenever the level's config would change.
+
+        Returns
+        -------
+        source_key : dict or None
+            JSON-serializable key of the sources of the config,
+            or None if unknown, in which case it is never cached.
+
+        """
+        return None
+
     @abc.abstractmethod
     def read_config(self, input_data=None):
         config_data = convert_paths(
@@ -254,6 +302,9 @@ def generate_config(self):
         config_data = config_data.update(self.config_type.defaults)
         return config_data
 
+    def get_source_key(self):
+        return {"name": self.name, "defaults": self.config_type.defaults}
+
     def read_config(self, input_data=None):
         if input_data is None:
             input_data = copy.deepcopy(self.config_type.defaults)
@@ -293,6 +344,9 @@ def __init__(
             config_filename += ("." + self.extension)
             self.path = self.path / config_filename
 
+    def get_source_key(self):
+        return {"name": self.name, "file": get_file_key(self.path)}
+
     def read_config(self, input_data=None):
         if input_data is None:
             try:
@@ -356,6 +410,16 @@ def __init__(
         else:
             self.path = self.config_type.local_config_path
 
+    def get_source_key(self):
+        return {
+            "name": self.name,
+            "files": sorted(get_file_key(path)
+                            for path in self.path.glob(self.filename_glob)),
+            "key_name": self.key_name,
+            "template": self.template,
+            "insert_items": self.insert_items,
+            }
+
     def read_config(self, input_data=None):
         if input_data is None:
             preset_paths = self.path.glob(self.filename_glob)
@@ -387,6 +451,9 @@ def __init__(
         self.mapping = mapping
         super().__init__(name=name, **kwargs)
 
+    def get_source_key(self):
+        return {"name": self.name, "mapping": self.mapping}
+
     def read_config(self, input_data=None):
         config_data = {}
         if input_data:
@@ -410,6 +477,11 @@ class EnvVarsConfigLevel(MappingConfigLevel):
     def __init__(self, name=LEVEL_NAME_ENV_VARS, mapping=None, **kwargs):
         super().__init__(name=name, mapping=mapping, **kwargs)
 
+    def get_source_key(self):
+        return {**super().get_source_key(), "env_vars": {
+            env_var: os.environ.get(env_var, None)
+            for env_var in self.mapping.keys()}}
+
     def read_config(self, input_data=None):
         if input_data is None:
             input_data = os.environ
@@ -421,17 +493,26 @@ class CLIArgsConfigLevel(MappingConfigLevel):
     def __init__(self, name=LEVEL_NAME_CLI_ARGS, mapping=None, **kwargs):
         super().__init__(name=name, mapping=mapping, **kwargs)
 
+    def parse_cli_args(self):
+        arg_parser = argparse.ArgumentParser(
+            argument_default=argparse.SUPPRESS,
+            usage=argparse.SUPPRESS,
+            add_help=False,
+            )
+        for arg_name in self.mapping.keys():
+            arg_parser.add_argument(f"--{arg_name.replace('_', '-')}")
+
+        cli_args, __ = arg_parser.parse_known_args()
+        return cli_args
+
+    def get_source_key(self):
+        # Only the args mapped to config values, not e.g. the subcommand
+        return {**super().get_source_key(),
+                "cli_args": vars(self.parse_cli_args())}
+
     def read_config(self, input_data=None):
         if input_data is None:
-            arg_parser = argparse.ArgumentParser(
-                argument_default=argparse.SUPPRESS,
-                usage=argparse.SUPPRESS,
-                add_help=False,
-                )
-            for arg_name in self.mapping.keys():
-                arg_parser.add_argument(f"--{arg_name.replace('_', '-')}")
-
-            cli_args, __ = arg_parser.parse_known_args()
+            cli_args = self.parse_cli_args()
         else:
             input_data = cli_args
 
@@ -463,7 +544,90 @@ def __init__(self, config_type=None, config_levels=None):
         for config_level in config_levels:
             self.config_levels[config_level.name] = config_level
 
+        # Configs read and rendered from or pending writing to the snapshot
+        self._snapshot = None
+        self._snapshot_pending = None
+
+    def get_snapshot_path(self):
+        if (self.config_type.cache_path is None
+                or os.environ.get(CACHE_DISABLE_ENV_VAR, None)):
+            return None
+        # Keep one snapshot per set of config paths (e.g. per system)
+        paths_hash = hash_key([self.config_type.local_config_path,
+                               self.config_type.preset_config_path])[:16]
+        return self.config_type.cache_path / (
+            f"{self.config_type.name}_{paths_hash}.{CACHE_EXTENSION}")
+
+    def get_source_key(self):
+        level_keys = [config_level.get_source_key()
+                      for config_level in self.config_levels.values()]
+        if any(level_key is None for level_key in level_keys):
+            return None
+        return hash_key({
+            "cache_format_version": CACHE_FORMAT_VERSION,
+            "python_version": sys.version_info[:2],
+            "levels": level_keys,
+            "overlay": self.config_type.overlay,
+            "path_variables": self.config_type.path_variables,
+            "config_version": self.config_type.config_version,
+            })
+
+    def read_snapshot(self, snapshot_path, source_key):
+        # Only unpickle snapshots no other user could have written
+        try:
+            if not check_cache_path_private(os.lstat(snapshot_path.parent)):
+                return None
+            snapshot_fd = os.open(
+                snapshot_path, os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0))
+            with open(snapshot_fd, "rb") as snapshot_file:
+                if not check_cache_path_private(
+                        os.fstat(snapshot_file.fileno())):
+                    return None
+                snapshot = pickle.load(snapshot_file)
+        except Exception:  # Any unreadable snapshot is simply regenerated
+            return None
+        if snapshot.get("source_key", None) != source_key:
+            return None
+        return snapshot
+
+    def write_snapshot(self, snapshot_path, source_key, configs,
+                       rendered_config):
+        snapshot = {"source_key": source_key, "configs": configs,
+                    "rendered_config": rendered_config}
+        snapshot_path_temp = snapshot_path.with_name(
+            f"{snapshot_path.name}.{os.getpid()}.tmp")
+        try:
+            os.makedirs(snapshot_path.parent, mode=CACHE_DIR_MODE,
+                        exist_ok=True)
+            if not check_cache_path_private(os.lstat(snapshot_path.parent)):
+                return
+            snapshot_fd = os.open(
+                snapshot_path_temp, os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                CACHE_FILE_MODE)
+            with open(snapshot_fd, "wb") as snapshot_file:
+                pickle.dump(snapshot, snapshot_file,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(snapshot_path_temp, snapshot_path)
+        except Exception:  # Caching is only an optimization, so carry on
+            try:
+                os.remove(snapshot_path_temp)
+            except OSError:
+                pass
+
     def read_configs(self, config_names=None):
+        # Use the snapshot if none of the sources have changed since
+        snapshot_path = None
+        if config_names is None:
+            snapshot_path = self.get_snapshot_path()
+        source_key = None
+        if snapshot_path is not None:
+            source_key = self.get_source_key()
+        if source_key is not None:
+            snapshot = self.read_snapshot(snapshot_path, source_key)
+            if snapshot is not None:
+                self._snapshot = snapshot
+                return snapshot["configs"]
+
         configs = {}
         if config_names is None:
             config_names = self.config_levels.keys()
@@ -472,12 +636,20 @@ def read_configs(self, config_names=None):
         if self.config_type.overlay is not None:
             configs[LEVEL_NAME_OVERLAY] = copy.deepcopy(
                 self.config_type.overlay)
+
+        if source_key is not None:
+            self._snapshot_pending = (snapshot_path, source_key, configs)
         return configs
 
     def render_config(self, configs=None):
         if configs is None:
             configs = self.read_configs()
 
+        # Return the rendered config from the snapshot the configs came from
+        snapshot, self._snapshot = self._snapshot, None
+        if snapshot is not None and configs is snapshot["configs"]:
+            return snapshot["rendered_config"]
+
         # Recursively build final config dict from succession of loaded configs
         rendered_config = copy.deepcopy(
             configs[list(configs.keys())[0]])
@@ -486,6 +658,14 @@ def render_config(self, configs=None):
                 rendered_config = brokkr.utils.misc.update_dict_recursive(
                     rendered_config, configs[config_name])
 
+        # Snapshot the result, unless the sources changed (e.g. were created)
+        snapshot_pending, self._snapshot_pending = self._snapshot_pending, None
+        if snapshot_pending is not None and configs is snapshot_pending[2]:
+            snapshot_path, source_key, __ = snapshot_pending
+            if self.get_source_key() == source_key:
+                self.write_snapshot(
+                    snapshot_path, source_key, configs, rendered_config)
+
         return rendered_config
 
 
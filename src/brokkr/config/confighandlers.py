@@ -11,6 +11,7 @@
 import brokkr.config.systempathhandler
 from brokkr.config.systempath import SYSTEMPATH_CONFIG
 from brokkr.constants import (
+    CONFIG_CACHE_PATH,
     CONFIG_NAME_LOG,
     CONFIG_NAME_MAIN,
     CONFIG_NAME_METADATA,
@@ -42,6 +43,7 @@
     preset_config_path=SYSTEM_BASE_PATH / SYSTEM_SUBPATH_CONFIG,
     config_version=CONFIG_VERSION,
     ignore_cli_args=(not brokkr.utils.misc.get_cli_invoked()),
+    cache_path=CONFIG_CACHE_PATH,
     )
 
 DEFAULT_CONFIG_UNIT = {
@@ -87,6 +89,16 @@
             "level": DEFAULT_LOG_LEVEL,
             "maxBytes": int(1e7),
             },
+        "binary": {
+            "backup_count": 10,
+            "class": "brokkr.utils.binarylog.BinaryLogHandler",
+            "filename":
+                (OUTPUT_SUBPATH_LOG
+                 / (PACKAGE_NAME + "_{system_name}_{unit_number:0>4}.blog"))
+                .as_posix(),
+            "level": DEFAULT_LOG_LEVEL,
+            "max_bytes": int(1e7),
+            },
         "console": {
             "class": "logging.StreamHandler",
             "formatter": "detailed",
@@ -118,7 +130,10 @@
             "{output_type}_{system_name}_{unit_number:0>4}_{utc_date!s}",
         "output_path_client": OUTPUT_PATH_DEFAULT.as_posix(),
         "system_prefix": "",
+        "worker_preload": True,
         "worker_shutdown_wait_s": 10,
+        "worker_start_method": "",
+        "worker_startup_wait_s": 30,
         },
     "autossh": {
         "local_port": 22,
@@ -127,6 +142,26 @@
         "server_username": "",
         "tunnel_port_offset": 10000,
         },
+    "log_transport": {
+        "batch_size": 64,
+        "flush_interval_s": 0.5,
+        "rate_limit_burst": 50,
+        "rate_limit_per_s": 10,
+        },
+    "metrics": {
+        "enabled": False,
+        "host": "127.0.0.1",
+        "port": 9108,
+        "push_interval_s": 5,
+        "worker_stats_interval_s": 10,
+        },
+    "restart": {
+        "enabled": True,
+        "backoff_initial_s": 1,
+        "backoff_max_s": 300,
+        "crash_loop_limit": 5,
+        "crash_loop_window_s": 600,
+        },
     "queues": {},
     "data_types": {},
     "steps": {},
@@ -155,6 +190,10 @@
                 "_module_path": "brokkr.inputs.currenttime",
                 "_class_name": "CurrentTimeInput",
                 },
+            "process_stats": {
+                "_module_path": "brokkr.inputs.processstats",
+                "_class_name": "ProcessStatsInput",
+                },
             "queue": {
                 "_builder": "queue",
                 "_module_path": "brokkr.pipeline.queuesteps",
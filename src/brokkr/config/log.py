@@ -3,9 +3,18 @@
 """
 
 # Local imports
-from brokkr.config.confighandlers import CONFIG_HANDLER_LOG
+import brokkr.utils.misc
 
 
-# Logging config dicts
-LOG_CONFIGS = CONFIG_HANDLER_LOG.read_configs()
-LOG_CONFIG = CONFIG_HANDLER_LOG.render_config(LOG_CONFIGS)
+def load_config():
+    # pylint: disable=import-outside-toplevel
+    from brokkr.config.confighandlers import CONFIG_HANDLER_LOG
+    configs = CONFIG_HANDLER_LOG.read_configs()
+    return {"LOG_CONFIGS": configs,
+            "LOG_CONFIG": CONFIG_HANDLER_LOG.render_config(configs)}
+
+
+# Logging config dicts, declared here and loaded on first access
+LOG_CONFIGS: dict
+LOG_CONFIG: dict
+brokkr.utils.misc.set_lazy_attributes(__name__, load_config)
@@ -3,9 +3,18 @@
 """
 
 # Local imports
-from brokkr.config.confighandlers import CONFIG_HANDLER_MAIN
+import brokkr.utils.misc
 
 
-# Main config dict
-CONFIGS = CONFIG_HANDLER_MAIN.read_configs()
-CONFIG = CONFIG_HANDLER_MAIN.render_config(CONFIGS)
+def load_config():
+    # pylint: disable=import-outside-toplevel
+    from brokkr.config.confighandlers import CONFIG_HANDLER_MAIN
+    configs = CONFIG_HANDLER_MAIN.read_configs()
+    return {"CONFIGS": configs,
+            "CONFIG": CONFIG_HANDLER_MAIN.render_config(configs)}
+
+
+# Main config dicts, declared here and loaded on first access
+CONFIGS: dict
+CONFIG: dict
+brokkr.utils.misc.set_lazy_attributes(__name__, load_config)
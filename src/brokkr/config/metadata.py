@@ -3,9 +3,18 @@
 """
 
 # Local imports
-from brokkr.config.metadatahandler import CONFIG_HANDLER_METADATA
+import brokkr.utils.misc
 
 
-# Metadata config dict
-METADATA_CONFIGS = CONFIG_HANDLER_METADATA.read_configs()
-METADATA = CONFIG_HANDLER_METADATA.render_config(METADATA_CONFIGS)
+def load_config():
+    # pylint: disable=import-outside-toplevel
+    from brokkr.config.metadatahandler import CONFIG_HANDLER_METADATA
+    configs = CONFIG_HANDLER_METADATA.read_configs()
+    return {"METADATA_CONFIGS": configs,
+            "METADATA": CONFIG_HANDLER_METADATA.render_config(configs)}
+
+
+# Metadata config dicts, declared here and loaded on first access
+METADATA_CONFIGS: dict
+METADATA: dict
+brokkr.utils.misc.set_lazy_attributes(__name__, load_config)
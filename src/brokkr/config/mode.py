@@ -3,9 +3,18 @@
 """
 
 # Local imports
-from brokkr.config.modehandler import CONFIG_HANDLER_MODE
+import brokkr.utils.misc
 
 
-# Mode config dict
-MODE_CONFIGS = CONFIG_HANDLER_MODE.read_configs()
-MODE_CONFIG = CONFIG_HANDLER_MODE.render_config(MODE_CONFIGS)
+def load_config():
+    # pylint: disable=import-outside-toplevel
+    from brokkr.config.modehandler import CONFIG_HANDLER_MODE
+    configs = CONFIG_HANDLER_MODE.read_configs()
+    return {"MODE_CONFIGS": configs,
+            "MODE_CONFIG": CONFIG_HANDLER_MODE.render_config(configs)}
+
+
+# Mode config dicts, declared here and loaded on first access
+MODE_CONFIGS: dict
+MODE_CONFIG: dict
+brokkr.utils.misc.set_lazy_attributes(__name__, load_config)
@@ -3,9 +3,18 @@
 """
 
 # Local imports
-from brokkr.config.confighandlers import CONFIG_HANDLER_PRESETS
+import brokkr.utils.misc
 
 
-# Preset config dict
-PRESET_CONFIGS = CONFIG_HANDLER_PRESETS.read_configs()
-PRESETS = CONFIG_HANDLER_PRESETS.render_config(PRESET_CONFIGS)
+def load_config():
+    # pylint: disable=import-outside-toplevel
+    from brokkr.config.confighandlers import CONFIG_HANDLER_PRESETS
+    configs = CONFIG_HANDLER_PRESETS.read_configs()
+    return {"PRESET_CONFIGS": configs,
+            "PRESETS": CONFIG_HANDLER_PRESETS.render_config(configs)}
+
+
+# Preset config dicts, declared here and loaded on first access
+PRESET_CONFIGS: dict
+PRESETS: dict
+brokkr.utils.misc.set_lazy_attributes(__name__, load_config)
@@ -3,9 +3,19 @@
 """
 
 # Local imports
-from brokkr.config.systempathhandler import CONFIG_HANDLER_SYSTEMPATH
+import brokkr.utils.misc
 
 
-# System path config dict
-SYSTEMPATH_CONFIGS = CONFIG_HANDLER_SYSTEMPATH.read_configs()
-SYSTEMPATH_CONFIG = CONFIG_HANDLER_SYSTEMPATH.render_config(SYSTEMPATH_CONFIGS)
+def load_config():
+    # pylint: disable=import-outside-toplevel
+    from brokkr.config.systempathhandler import CONFIG_HANDLER_SYSTEMPATH
+    configs = CONFIG_HANDLER_SYSTEMPATH.read_configs()
+    return {"SYSTEMPATH_CONFIGS": configs,
+            "SYSTEMPATH_CONFIG":
+                CONFIG_HANDLER_SYSTEMPATH.render_config(configs)}
+
+
+# System path config dicts, declared here and loaded on first access
+SYSTEMPATH_CONFIGS: dict
+SYSTEMPATH_CONFIG: dict
+brokkr.utils.misc.set_lazy_attributes(__name__, load_config)
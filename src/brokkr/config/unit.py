@@ -3,9 +3,18 @@
 """
 
 # Local imports
-from brokkr.config.confighandlers import CONFIG_HANDLER_UNIT
+import brokkr.utils.misc
 
 
-# Unit config dict
-UNIT_CONFIGS = CONFIG_HANDLER_UNIT.read_configs()
-UNIT_CONFIG = CONFIG_HANDLER_UNIT.render_config(UNIT_CONFIGS)
+def load_config():
+    # pylint: disable=import-outside-toplevel
+    from brokkr.config.confighandlers import CONFIG_HANDLER_UNIT
+    configs = CONFIG_HANDLER_UNIT.read_configs()
+    return {"UNIT_CONFIGS": configs,
+            "UNIT_CONFIG": CONFIG_HANDLER_UNIT.render_config(configs)}
+
+
+# Unit config dicts, declared here and loaded on first access
+UNIT_CONFIGS: dict
+UNIT_CONFIG: dict
+brokkr.utils.misc.set_lazy_attributes(__name__, load_config)
@@ -67,6 +67,9 @@
 CONFIG_PATH_XDG = Path(
     f"~{os.environ.get('SUDO_USER', '')}/.config").expanduser()
 CONFIG_PATH_LOCAL = CONFIG_PATH_XDG / PACKAGE_NAME
+CACHE_PATH_XDG = Path(
+    f"~{os.environ.get('SUDO_USER', '')}/.cache").expanduser()
+CONFIG_CACHE_PATH = CACHE_PATH_XDG / PACKAGE_NAME / "config"
 CONFIG_VERSION = 1
 
 
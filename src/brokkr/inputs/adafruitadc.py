@@ -4,13 +4,10 @@
 
 # Standard library imports
 import importlib
-
-# Third party imports
-import board
-import busio
+import time
 
 # Local imports
-import brokkr.pipeline.baseinput
+import brokkr.inputs.adafruiti2c
 
 
 DEFAULT_ADC_CHANNEL = 0
@@ -18,9 +15,17 @@
 DEFAULT_ADC_CLASS = "ADS1115"
 DEFAULT_ANALOG_MODULE = "adafruit_ads1x15.analog_in"
 DEFAULT_ANALOG_CLASS = "AnalogIn"
+DEFAULT_ANALOG_ATTRIBUTE = "voltage"
+
+# Operating mode register values, per adafruit_ads1x15.ads1x15.Mode
+ADC_MODE_CONTINUOUS = 0x0000
+ADC_MODE_SINGLE = 0x0100
 
+# ADC settings that can be set per channel
+ADC_CHANNEL_SETTINGS = ("gain", "data_rate")
 
-class AdafruitADCInput(brokkr.pipeline.baseinput.PropertyInputStep):
+
+class AdafruitADCInput(brokkr.inputs.adafruiti2c.BaseAdafruitI2CInput):
     def __init__(
             self,
             sensor_module,
@@ -29,14 +34,12 @@ def __init__(
             adc_kwargs=None,
             analog_module=DEFAULT_ANALOG_MODULE,
             analog_class=DEFAULT_ANALOG_CLASS,
-            i2c_kwargs=None,
-            **property_input_kwargs):
+            **adafruit_i2c_input_kwargs):
         super().__init__(
             sensor_module=sensor_module,
             sensor_class=sensor_class,
             cache_sensor_object=False,
-            **property_input_kwargs)
-        self._i2c_kwargs = {} if i2c_kwargs is None else i2c_kwargs
+            **adafruit_i2c_input_kwargs)
         self._adc_kwargs = {} if adc_kwargs is None else adc_kwargs
 
         analog_object = importlib.import_module(analog_module)
@@ -49,12 +52,156 @@ def __init__(
             self._adc_kwargs["positive_pin"] = adc_channel
 
     def read_sensor_data(self, sensor_object=None):
-        with busio.I2C(board.SCL, board.SDA, **self._i2c_kwargs) as i2c:
-            sensor_object = self.init_sensor_object(i2c)
-            if sensor_object is None:
+        with self.open_sensor_object() as adc_object:
+            if adc_object is None:
                 return None
             channel_object = self._analog_class(
-                sensor_object, **self._adc_kwargs)
+                adc_object, **self._adc_kwargs)
             raw_data = super().read_sensor_data(
                 sensor_object=channel_object)
         return raw_data
+
+
+class AdafruitADCScanInput(brokkr.inputs.adafruiti2c.BaseAdafruitI2CInput):
+    def __init__(
+            self,
+            sensor_module,
+            sensor_class,
+            channels,
+            channel_default_kwargs=None,
+            continuous=False,
+            oversample=1,
+            analog_module=DEFAULT_ANALOG_MODULE,
+            analog_class=DEFAULT_ANALOG_CLASS,
+            sensor_kwargs=None,
+            **adafruit_i2c_input_kwargs):
+        """
+        Scan several channels of one ADC, reporting them all in one payload.
+
+        Parameters
+        ----------
+        sensor_module : str
+            Module of the ADC driver class, e.g. ``adafruit_ads1x15.ads1115``.
+        sensor_class : str
+            Name of the ADC driver class, e.g. ``ADS1115``.
+        channels : list of dict
+            Channels to read, one per data type and in the same order.
+            Each can have a ``positive_pin`` (by default, its index),
+            ``negative_pin`` for a differential read, ``gain``, ``data_rate``
+            and ``attribute`` of the analog object to read (by default,
+            ``voltage``).
+        channel_default_kwargs : dict, optional
+            Default parameters for every channel.
+        continuous : bool, optional
+            Use continuous conversion mode, which avoids waiting for a
+            single-shot conversion when reading the same channel repeatedly.
+            The default is False.
+        oversample : int, optional
+            Number of samples to average for each channel. The default is 1.
+        analog_module : str, optional
+            Module of the analog channel class.
+        analog_class : str, optional
+            Name of the analog channel class.
+        sensor_kwargs : dict, optional
+            Kwargs to pass to the ADC driver class.
+        **adafruit_i2c_input_kwargs
+            Passed on to the ``BaseAdafruitI2CInput`` base class.
+
+        """
+        sensor_kwargs = {} if sensor_kwargs is None else dict(sensor_kwargs)
+        if continuous:
+            sensor_kwargs["mode"] = ADC_MODE_CONTINUOUS
+        super().__init__(
+            sensor_module=sensor_module,
+            sensor_class=sensor_class,
+            sensor_kwargs=sensor_kwargs,
+            cache_sensor_object=False,
+            **adafruit_i2c_input_kwargs)
+        if channel_default_kwargs is None:
+            channel_default_kwargs = {}
+        if len(channels) != len(self.data_types):
+            raise ValueError(
+                f"Number of ADC channels ({len(channels)}) must match "
+                f"number of data types ({len(self.data_types)})")
+
+        self.channels = []
+        for idx, channel in enumerate(channels):
+            self.channels.append({
+                "positive_pin": idx,
+                "negative_pin": None,
+                "gain": None,
+                "data_rate": None,
+                "attribute": DEFAULT_ANALOG_ATTRIBUTE,
+                **channel_default_kwargs,
+                **channel,
+                })
+        self.continuous = continuous
+        self.oversample = max(int(oversample), 1)
+
+        analog_object = importlib.import_module(analog_module)
+        self._analog_class = getattr(analog_object, analog_class)
+        self._channel_objects = None
+        self._channel_adc_object = None
+
+    def get_channel_objects(self, adc_object):
+        """Get the analog objects for the channels, creating them once."""
+        if adc_object is not self._channel_adc_object:
+            self._channel_objects = [
+                self._analog_class(
+                    adc_object, channel["positive_pin"],
+                    *([] if channel["negative_pin"] is None
+                      else [channel["negative_pin"]]))
+                for channel in self.channels]
+            self._channel_adc_object = adc_object
+        return self._channel_objects
+
+    def read_channel(self, adc_object, channel, channel_object, adc_settings):
+        # Use the ADC's previous settings for channels not setting them
+        for setting, previous_value in adc_settings.items():
+            value = channel[setting]
+            setattr(adc_object, setting,
+                    previous_value if value is None else value)
+        samples = []
+        for idx in range(self.oversample):
+            # In continuous mode, wait for the next conversion to complete
+            if idx and self.continuous:
+                time.sleep(1 / adc_object.data_rate)
+            samples.append(getattr(channel_object, channel["attribute"]))
+        if self.oversample == 1:
+            return samples[0]
+        return sum(samples) / len(samples)
+
+    def read_sensor_data(self, sensor_object=None):
+        with self.open_sensor_object() as adc_object:
+            if adc_object is None:
+                return None
+            channel_objects = self.get_channel_objects(adc_object)
+            # Put back the settings after, as the ADC object can be shared
+            # with other steps reading the same device
+            adc_settings = {setting: getattr(adc_object, setting)
+                            for setting in ADC_CHANNEL_SETTINGS}
+            sensor_data = []
+            try:
+                for channel, channel_object in zip(
+                        self.channels, channel_objects):
+                    sensor_data.append(self.read_channel_safe(
+                        adc_object, channel, channel_object, adc_settings))
+            finally:
+                for setting, value in adc_settings.items():
+                    setattr(adc_object, setting, value)
+        return sensor_data
+
+    def read_channel_safe(
+            self, adc_object, channel, channel_object, adc_settings):
+        """Read a channel, logging any error and returning None instead."""
+        try:
+            return self.read_channel(
+                adc_object, channel, channel_object, adc_settings)
+        except Exception as e:
+            self.logger.error(
+                "%s reading ADC channel %s (%s) of %s on step %s: %s",
+                type(e).__name__, channel["positive_pin"],
+                channel["attribute"], self.object_class, self.name, e)
+            self.logger.info("Error details:", exc_info=True)
+            self._read_error = True
+        return None
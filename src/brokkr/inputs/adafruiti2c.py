@@ -2,30 +2,200 @@
 Input steps for Adafruit digital I2C devices (e.g. SHT31, HTU21, BMP280, etc).
 """
 
-# Third party imports
-import board
-import busio
+# Standard library imports
+import atexit
+import contextlib
+import logging
+import os
+import threading
 
 # Local imports
 import brokkr.pipeline.baseinput
+import brokkr.utils.misc
 
+# Third party imports (loaded on first use)
+board = brokkr.utils.misc.lazy_import("board")
+busio = brokkr.utils.misc.lazy_import("busio")
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+# --- Helper classes --- #
+
+class AdafruitI2CObjectCache(brokkr.utils.misc.AutoReprMixin):
+    def __init__(self):
+        """
+        Share I2C buses and initialized sensor objects within a process.
+
+        Buses are keyed by their init kwargs, and sensor objects by their
+        class, bus and init args, so sensors are only probed and
+        calibrated once rather than on every read.
+
+        """
+        self._buses = {}
+        self._sensor_objects = {}
+        self._lock = threading.RLock()
+        self._pid = os.getpid()
+
+    @staticmethod
+    def _make_key(*args, **kwargs):
+        return repr((args, sorted(kwargs.items())))
+
+    def _check_pid(self):
+        # Don't share buses or sensors inherited through a fork
+        if self._pid != os.getpid():
+            self._buses.clear()
+            self._sensor_objects.clear()
+            self._pid = os.getpid()
+
+    def get_bus(self, **i2c_kwargs):
+        """Get the shared busio.I2C bus with the given kwargs."""
+        bus_key = self._make_key(**i2c_kwargs)
+        with self._lock:
+            self._check_pid()
+            i2c = self._buses.get(bus_key, None)
+            if i2c is None:
+                LOGGER.debug("Opening shared I2C bus with kwargs %r",
+                             i2c_kwargs)
+                i2c = busio.I2C(board.SCL, board.SDA, **i2c_kwargs)
+                self._buses[bus_key] = i2c
+        return i2c
+
+    def get_sensor_object(
+            self,
+            sensor_class,
+            init_function,
+            i2c_kwargs=None,
+            sensor_args=None,
+            sensor_kwargs=None,
+                ):
+        """
+        Get the shared sensor object, initializing it if not cached.
+
+        Parameters
+        ----------
+        sensor_class : type
+            Class of the sensor object, used as part of the key.
+        init_function : Callable[[busio.I2C], Any]
+            Function to create the sensor object from the I2C bus.
+            If it returns None, nothing is cached.
+        i2c_kwargs : dict, optional
+            Kwargs of the I2C bus to use, and part of the key.
+        sensor_args : tuple, optional
+            Args of the sensor object, used as part of the key.
+        sensor_kwargs : dict, optional
+            Kwargs of the sensor object, used as part of the key.
+
+        Returns
+        -------
+        sensor_object : Any
+            The shared sensor object, or None if it couldn't be created.
+
+        """
+        i2c_kwargs = {} if i2c_kwargs is None else i2c_kwargs
+        sensor_args = () if sensor_args is None else sensor_args
+        sensor_kwargs = {} if sensor_kwargs is None else sensor_kwargs
+        sensor_key = (sensor_class, self._make_key(**i2c_kwargs),
+                      self._make_key(*sensor_args, **sensor_kwargs))
+        with self._lock:
+            self._check_pid()
+            sensor_object = self._sensor_objects.get(sensor_key, None)
+            if sensor_object is None:
+                sensor_object = init_function(self.get_bus(**i2c_kwargs))
+                if sensor_object is not None:
+                    self._sensor_objects[sensor_key] = sensor_object
+        return sensor_object
+
+    def invalidate_sensor_object(self, sensor_object):
+        """Drop a sensor object, so it will be reinitialized on next use."""
+        with self._lock:
+            for sensor_key, cached_object in list(
+                    self._sensor_objects.items()):
+                if cached_object is sensor_object:
+                    LOGGER.debug("Invalidating cached sensor object %r",
+                                 sensor_object)
+                    del self._sensor_objects[sensor_key]
+
+    def close_all(self):
+        with self._lock:
+            self._sensor_objects.clear()
+            for i2c in self._buses.values():
+                try:
+                    i2c.deinit()
+                except Exception as e:
+                    LOGGER.debug("%s closing I2C bus %r: %s",
+                                 type(e).__name__, i2c, e)
+            self._buses.clear()
+
+
+I2C_OBJECT_CACHE = AdafruitI2CObjectCache()
+atexit.register(I2C_OBJECT_CACHE.close_all)
+
+
+# --- Input steps --- #
 
 class BaseAdafruitI2CInput(brokkr.pipeline.baseinput.PropertyInputStep):
     def __init__(
             self,
             i2c_kwargs=None,
+            share_objects=True,
             **property_input_kwargs):
         super().__init__(**property_input_kwargs)
         self._i2c_kwargs = {} if i2c_kwargs is None else i2c_kwargs
+        self.share_objects = share_objects
+        self._read_error = False
+
+    def read_sensor_value(self, sensor_object, data_type):
+        try:
+            return super().read_sensor_value(
+                sensor_object=sensor_object, data_type=data_type)
+        except Exception:
+            self._read_error = True
+            raise
+
+    @contextlib.contextmanager
+    def open_sensor_object(self):
+        """Context manager to get the sensor object on the I2C bus."""
+        if not self.share_objects:
+            with busio.I2C(board.SCL, board.SDA, **self._i2c_kwargs) as i2c:
+                yield self.init_sensor_object(i2c)
+            return
+
+        try:
+            sensor_object = I2C_OBJECT_CACHE.get_sensor_object(
+                self.object_class,
+                init_function=self.init_sensor_object,
+                i2c_kwargs=self._i2c_kwargs,
+                sensor_args=self.sensor_args,
+                sensor_kwargs=self.sensor_kwargs,
+                )
+        except Exception as e:
+            self.logger.error(
+                "%s getting shared I2C bus with kwargs %r on step %s: %s",
+                type(e).__name__, self._i2c_kwargs, self.name, e)
+            self.logger.info("Error details:", exc_info=True)
+            sensor_object = None
+
+        self._read_error = False
+        try:
+            yield sensor_object
+        except Exception:
+            self._read_error = True
+            raise
+        finally:
+            # Reinitialize the sensor next time if reading it failed
+            if self._read_error and sensor_object is not None:
+                I2C_OBJECT_CACHE.invalidate_sensor_object(sensor_object)
 
 
 class AdafruitI2CInput(BaseAdafruitI2CInput):
     def read_sensor_data(self, sensor_object=None):
-        with busio.I2C(board.SCL, board.SDA, **self._i2c_kwargs) as i2c:
-            sensor_object = self.init_sensor_object(i2c)
-            if sensor_object is None:
+        with self.open_sensor_object() as i2c_sensor_object:
+            if i2c_sensor_object is None:
                 return None
-            sensor_data = super().read_sensor_data(sensor_object=sensor_object)
+            sensor_data = super().read_sensor_data(
+                sensor_object=i2c_sensor_object)
         return sensor_data
 
 
@@ -36,7 +206,10 @@ def __init__(
         super().__init__(cache_sensor_object=True, **adafruit_i2c_input_kwargs)
 
     def init_sensor_object(self, *sensor_args, **sensor_kwargs):
-        i2c = busio.I2C(board.SCL, board.SDA, **self._i2c_kwargs)
+        if self.share_objects:
+            i2c = I2C_OBJECT_CACHE.get_bus(**self._i2c_kwargs)
+        else:
+            i2c = busio.I2C(board.SCL, board.SDA, **self._i2c_kwargs)
         sensor_object = super().init_sensor_object(
             i2c, *sensor_args, **sensor_kwargs)
         return sensor_object
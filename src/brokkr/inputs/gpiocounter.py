@@ -3,54 +3,298 @@
 """
 
 # Standard library imports
-import collections
+import array
+import bisect
+import math
+import struct
+import threading
 import time
 
-# Third party imports
-import gpiozero
-
 # Local imports
 import brokkr.pipeline.baseinput
 import brokkr.utils.misc
 
+# Third party imports (loaded on first use)
+gpiozero = brokkr.utils.misc.lazy_import("gpiozero")
+
+
+COUNT_STATISTICS = {"count", "rate"}
+INTERVAL_STATISTICS = {
+    "interval_mean", "interval_min", "interval_max", "interval_std"}
+STATISTIC_DEFAULT = "count"
+
+# Min number of expired timestamps before compacting the array
+COMPACT_MIN_EXPIRED = 1024
+
+EDGE_BUFFER_SIZE_DEFAULT = 4096
+EDGE_BATCH_VERSION = 1
+# Version, time of first edge (ns since epoch), number of edges and overruns
+EDGE_BATCH_HEADER_FORMAT = "!BqII"
+EDGE_BATCH_HEADER_SIZE = struct.calcsize(EDGE_BATCH_HEADER_FORMAT)
+# Count and overruns written after each batch by BinaryFileOutput by default
+EDGE_FILE_TRAILER_FORMAT = "!IQ"
+EDGE_DATA_TYPES_DEFAULT = [
+    {"name": "edge_batch", "conversion": "bytes"},
+    {"name": "edge_count", "binary_type": "I"},
+    {"name": "edge_overruns", "binary_type": "Q"},
+    ]
+
+
+# --- Utility functions --- #
+
+def encode_edge_batch(edge_times_ns, n_overruns=0):
+    """
+    Encode edge times as a compact, self-delimiting binary batch.
+
+    The batch is a header with the format version, the time of the
+    first edge, the number of edges and of edges dropped due to overruns,
+    followed by the delta in ns from each edge to the next as varints.
+
+    Parameters
+    ----------
+    edge_times_ns : Sequence[int]
+        Times of each edge, in ns since the epoch, in increasing order.
+    n_overruns : int, optional
+        Number of edges dropped since the last batch. The default is 0.
+
+    Returns
+    -------
+    edge_batch : bytes
+        The encoded batch of edges.
+
+    """
+    first_time_ns = edge_times_ns[0] if len(edge_times_ns) else 0
+    edge_batch = bytearray(struct.pack(
+        EDGE_BATCH_HEADER_FORMAT, EDGE_BATCH_VERSION, first_time_ns,
+        len(edge_times_ns), n_overruns))
+    last_time_ns = first_time_ns
+    for edge_time_ns in edge_times_ns[1:]:
+        delta_ns = max(edge_time_ns - last_time_ns, 0)
+        last_time_ns = edge_time_ns
+        while delta_ns >= 0x80:
+            edge_batch.append((delta_ns & 0x7F) | 0x80)
+            delta_ns >>= 7
+        edge_batch.append(delta_ns)
+    return bytes(edge_batch)
+
+
+def decode_edge_batches(binary_data, trailer_format=None):
+    """
+    Decode one or more concatenated binary batches of edge times.
+
+    Parameters
+    ----------
+    binary_data : bytes
+        Edge batches, e.g. as written to a ``BinaryFileOutput``.
+    trailer_format : str, optional
+        Struct format of any values written after each batch, to skip.
+        Pass ``EDGE_FILE_TRAILER_FORMAT`` for files written with the
+        default data types. The default is None, for bare batches.
+
+    Returns
+    -------
+    edge_batches : list of tuple(list of int, int)
+        The edge times, in ns since the epoch, and the number of overruns
+        of each batch.
+
+    """
+    trailer_size = struct.calcsize(trailer_format) if trailer_format else 0
+    edge_batches = []
+    offset = 0
+    while offset < len(binary_data):
+        version, first_time_ns, n_edges, n_overruns = struct.unpack_from(
+            EDGE_BATCH_HEADER_FORMAT, binary_data, offset)
+        if version != EDGE_BATCH_VERSION:
+            raise ValueError(
+                f"Unknown edge batch version {version} at byte {offset}")
+        offset += EDGE_BATCH_HEADER_SIZE
+        edge_times_ns = [first_time_ns] if n_edges else []
+        for __ in range(n_edges - 1):
+            delta_ns = 0
+            shift = 0
+            while True:
+                byte = binary_data[offset]
+                offset += 1
+                delta_ns |= (byte & 0x7F) << shift
+                shift += 7
+                if not byte & 0x80:
+                    break
+            edge_times_ns.append(edge_times_ns[-1] + delta_ns)
+        offset += trailer_size
+        edge_batches.append((edge_times_ns, n_overruns))
+    return edge_batches
+
+
+# --- Helper classes --- #
+
+class IntervalAccumulator(brokkr.utils.misc.AutoReprMixin):
+    def __init__(self):
+        self.n_intervals = 0
+        self.interval_sum = 0
+        self.interval_sum_sq = 0
+        self.interval_min = None
+        self.interval_max = None
+
+    def add(self, interval):
+        self.n_intervals += 1
+        self.interval_sum += interval
+        self.interval_sum_sq += interval ** 2
+        if self.interval_min is None or interval < self.interval_min:
+            self.interval_min = interval
+        if self.interval_max is None or interval > self.interval_max:
+            self.interval_max = interval
+
+    def summarize(self):
+        if not self.n_intervals:
+            return {"interval_mean": None, "interval_min": None,
+                    "interval_max": None, "interval_std": None}
+        interval_mean = self.interval_sum / self.n_intervals
+        interval_var = self.interval_sum_sq / self.n_intervals - (
+            interval_mean ** 2)
+        return {
+            "interval_mean": interval_mean,
+            "interval_min": self.interval_min,
+            "interval_max": self.interval_max,
+            "interval_std": math.sqrt(max(interval_var, 0)),
+            }
+
+
+# --- Core classes --- #
 
 class GPIOCounterDevice(brokkr.utils.misc.AutoReprMixin):
-    def __init__(self, pin, max_counts=None, gpio_kwargs=None):
+    def __init__(
+            self,
+            pin,
+            max_counts=None,
+            retention_s=None,
+            gpio_kwargs=None,
+                ):
+        """
+        Count edges on a GPIO pin and summarize them over time windows.
+
+        Edge times are kept in a monotonic array, so the edges in a window
+        are found by binary search, and expired times are pruned as new
+        ones come in.
+
+        Parameters
+        ----------
+        pin : int or str
+            The GPIO pin to count edges on, as accepted by gpiozero.
+        max_counts : int, optional
+            Maximum number of edge times to keep. By default, no limit.
+        retention_s : float, optional
+            Time to keep edge times for, in s, which should be the longest
+            window queried. The total count is tracked regardless.
+            By default, keep them until the next reset.
+        gpio_kwargs : dict, optional
+            Kwargs to pass to ``gpiozero.DigitalInputDevice``.
+
+        """
         self._gpio_kwargs = {} if gpio_kwargs is None else gpio_kwargs
         self._gpio_kwargs["pin"] = pin
+        self.max_counts = max_counts
+        self.retention_s = retention_s
 
-        self._count_times = collections.deque(maxlen=max_counts)
-        self._gpio_device = gpiozero.DigitalInputDevice(**gpio_kwargs)
+        self.total_count = 0
+        self._count_times = array.array("d")
+        self._start_idx = 0
+        self._lock = threading.Lock()
+        self._gpio_device = gpiozero.DigitalInputDevice(**self._gpio_kwargs)
         self._gpio_device.when_activated = self._count
 
         self.start_time = time.monotonic()
 
+    def _prune(self, current_time):
+        n_times = len(self._count_times)
+        if self.retention_s is not None:
+            self._start_idx = bisect.bisect_left(
+                self._count_times, current_time - self.retention_s,
+                self._start_idx, n_times)
+        if self.max_counts is not None:
+            self._start_idx = max(self._start_idx, n_times - self.max_counts)
+        # Compact once most of the array has expired, to bound memory
+        if (self._start_idx >= COMPACT_MIN_EXPIRED
+                and self._start_idx * 2 >= n_times):
+            del self._count_times[:self._start_idx]
+            self._start_idx = 0
+
     def _count(self):
         """Count one transition. Used as a callback."""
-        self._count_times.append(time.monotonic())
+        count_time = time.monotonic()
+        with self._lock:
+            self.total_count += 1
+            self._count_times.append(count_time)
+            self._prune(count_time)
 
     @property
     def time_elapsed_s(self):
         """The time elapsed, in s, since the start time was last reset."""
         return time.monotonic() - self.start_time
 
-    def get_count(self, period_s=None, mean=False):
-        if not period_s:
-            count = len(self._count_times)
-        else:
-            # Tabulate the number of counts over a given period
-            count = -1
-            for count, count_time in enumerate(reversed(self._count_times)):
-                if count_time < (time.monotonic() - period_s):
-                    break
-            else:
-                count += 1
+    def get_stats(self, periods_s=(None, ), interval_stats=True):
+        """
+        Get the count, rate and inter-arrival stats over several windows.
+
+        Parameters
+        ----------
+        periods_s : Sequence[float or None], optional
+            Windows to summarize, in s, ending now. None or 0 means
+            since the last reset. The default is only since the last reset.
+        interval_stats : bool, optional
+            Also compute the mean, min, max and standard deviation of
+            the interval between edges, in one pass for all the windows.
+            The default is True.
+
+        Returns
+        -------
+        stats : dict[float or None, dict[str, Any]]
+            The stats for each window, keyed by period.
+
+        """
+        resolution = time.get_clock_info("monotonic").resolution
+        with self._lock:
+            current_time = time.monotonic()
+            time_elapsed_s = current_time - self.start_time
+            count_times = self._count_times
+            n_times = len(count_times)
+
+            window_starts = {}
+            stats = {}
+            for period_s in set(periods_s):
+                if period_s:
+                    window_start = bisect.bisect_left(
+                        count_times, current_time - period_s,
+                        self._start_idx, n_times)
+                    count = n_times - window_start
+                    window_s = min(time_elapsed_s, period_s)
+                else:
+                    window_start = self._start_idx
+                    count = self.total_count
+                    window_s = time_elapsed_s
+                window_starts[period_s] = window_start
+                stats[period_s] = {
+                    "count": count,
+                    "rate": count / max(window_s, resolution),
+                    }
 
-        if mean:
-            count = count / max([min([self.time_elapsed_s, period_s]),
-                                 time.get_clock_info("time").resolution])
+            if interval_stats:
+                # Walk back from the newest edge, summarizing at each window
+                accumulator = IntervalAccumulator()
+                idx = n_times - 1
+                for period_s, window_start in sorted(
+                        window_starts.items(), key=lambda item: -item[1]):
+                    while idx > window_start:
+                        interval = count_times[idx] - count_times[idx - 1]
+                        accumulator.add(interval)
+                        idx -= 1
+                    stats[period_s].update(accumulator.summarize())
 
-        return count
+        return stats
+
+    def get_count(self, period_s=None, mean=False):
+        period_stats = self.get_stats(
+            periods_s=(period_s, ), interval_stats=False)[period_s]
+        return period_stats["rate" if mean else "count"]
 
     def reset(self):
         """
@@ -61,9 +305,110 @@ def reset(self):
         None.
 
         """
-        self._count_times.clear()
-        self.start_time = time.monotonic()
+        with self._lock:
+            self.total_count = 0
+            self._count_times = array.array("d")
+            self._start_idx = 0
+            self.start_time = time.monotonic()
+
+
+class GPIOEdgeCaptureDevice(brokkr.utils.misc.AutoReprMixin):
+    def __init__(
+            self,
+            pin,
+            buffer_size=EDGE_BUFFER_SIZE_DEFAULT,
+            edge="rising",
+            gpio_kwargs=None,
+                ):
+        """
+        Record the time of each edge on a GPIO pin into a ring buffer.
+
+        Parameters
+        ----------
+        pin : int or str
+            The GPIO pin to capture edges on, as accepted by gpiozero.
+        buffer_size : int, optional
+            Number of edges the preallocated buffer can hold between
+            drains. Edges arriving while it is full are dropped and
+            counted as overruns. The default is 4096.
+        edge : str, optional
+            Edges to capture, ``rising``, ``falling`` or ``both``.
+            The default is ``rising``.
+        gpio_kwargs : dict, optional
+            Kwargs to pass to ``gpiozero.DigitalInputDevice``, e.g.
+            ``pin_factory`` to use gpiozero's mock pins for testing.
+
+        """
+        self._gpio_kwargs = {} if gpio_kwargs is None else gpio_kwargs
+        self._gpio_kwargs["pin"] = pin
+        self.buffer_size = buffer_size
+
+        self.total_count = 0
+        self.total_overruns = 0
+        self._n_overruns = 0
+        self._edge_times = array.array("q", [0] * buffer_size)
+        self._write_idx = 0
+        self._read_idx = 0
+        self._lock = threading.Lock()
+
+        if edge not in {"rising", "falling", "both"}:
+            raise ValueError(
+                f"Edge must be 'rising', 'falling' or 'both', not {edge!r}")
+        self._gpio_device = gpiozero.DigitalInputDevice(**self._gpio_kwargs)
+        if edge in {"rising", "both"}:
+            self._gpio_device.when_activated = self._capture
+        if edge in {"falling", "both"}:
+            self._gpio_device.when_deactivated = self._capture
+
+    def _capture(self):
+        """Record the time of one edge. Used as a callback."""
+        edge_time_ns = brokkr.utils.misc.monotonic_ns()
+        with self._lock:
+            if self._write_idx - self._read_idx >= self.buffer_size:
+                self._n_overruns += 1
+                return
+            self._edge_times[self._write_idx % self.buffer_size] = (
+                edge_time_ns)
+            self._write_idx += 1
+
+    def drain(self):
+        """
+        Remove and return the edges captured since the last drain.
+
+        Returns
+        -------
+        edge_times_ns : list of int
+            Time of each edge, in ns since the epoch.
+        n_overruns : int
+            Number of edges dropped since the last drain.
 
+        """
+        with self._lock:
+            start_idx = self._read_idx % self.buffer_size
+            n_edges = self._write_idx - self._read_idx
+            end_idx = start_idx + n_edges
+            edge_times_ns = self._edge_times[start_idx:end_idx].tolist()
+            if end_idx > self.buffer_size:
+                edge_times_ns += self._edge_times[
+                    :end_idx - self.buffer_size].tolist()
+            self._read_idx = self._write_idx
+            n_overruns = self._n_overruns
+            self._n_overruns = 0
+            self.total_count += n_edges
+            self.total_overruns += n_overruns
+
+        # Convert from monotonic to wall clock time only when draining
+        time_offset_ns = (brokkr.utils.misc.time_ns()
+                          - brokkr.utils.misc.monotonic_ns())
+        edge_times_ns = [edge_time_ns + time_offset_ns
+                         for edge_time_ns in edge_times_ns]
+        return edge_times_ns, n_overruns
+
+    def close(self):
+        self._gpio_device.close()
+
+
+# --- Input steps --- #
 
 class GPIOCounterInput(brokkr.pipeline.baseinput.ValueInputStep):
     def __init__(
@@ -74,16 +419,104 @@ def __init__(
             reset_after_read=False,
             **value_input_kwargs):
         super().__init__(**value_input_kwargs)
+
+        for data_type in self.data_types:
+            statistic = self._get_statistic(data_type)
+            if statistic not in COUNT_STATISTICS | INTERVAL_STATISTICS:
+                raise ValueError(
+                    f"Statistic {statistic!r} for {data_type.name!r} must be "
+                    f"one of {sorted(COUNT_STATISTICS | INTERVAL_STATISTICS)}")
+
+        # Only keep edge times as long as the longest window needs them
+        retention_s = 0
+        for data_type in self.data_types:
+            period_s = getattr(data_type, "period_s", None)
+            if period_s:
+                retention_s = max(retention_s, period_s)
+            elif self._get_statistic(data_type) in INTERVAL_STATISTICS:
+                retention_s = None
+                break
+
         self._counter_device = GPIOCounterDevice(
-            pin=pin, max_counts=max_counts, gpio_kwargs=gpio_kwargs)
+            pin=pin, max_counts=max_counts, retention_s=retention_s,
+            gpio_kwargs=gpio_kwargs)
         self._reset_after_read = reset_after_read
+        self._interval_stats = any(
+            self._get_statistic(data_type) in INTERVAL_STATISTICS
+            for data_type in self.data_types)
+
+    @staticmethod
+    def _get_statistic(data_type):
+        if getattr(data_type, "mean", False):
+            return "rate"
+        return getattr(data_type, "statistic", STATISTIC_DEFAULT)
 
     def read_raw_data(self, input_data=None):
+        stats = self._counter_device.get_stats(
+            periods_s=[getattr(data_type, "period_s", None)
+                       for data_type in self.data_types],
+            interval_stats=self._interval_stats,
+            )
         raw_data = [
-            self._counter_device.get_count(
-                period_s=getattr(data_type, "period_s", None),
-                mean=getattr(data_type, "mean", False),
-                ) for data_type in self.data_types]
+            stats[getattr(data_type, "period_s", None)][
+                self._get_statistic(data_type)]
+            for data_type in self.data_types]
         if self._reset_after_read:
             self._counter_device.reset()
         return raw_data
+
+
+class GPIOEdgeCaptureInput(brokkr.pipeline.baseinput.ValueInputStep):
+    def __init__(
+            self,
+            pin,
+            buffer_size=EDGE_BUFFER_SIZE_DEFAULT,
+            edge="rising",
+            gpio_kwargs=None,
+            data_types=None,
+            **value_input_kwargs):
+        """
+        Drain the GPIO edges captured each tick as one binary batch.
+
+        Outputs the edge batch (see ``encode_edge_batch``) along with the
+        number of edges in it and the total overruns so far. With the
+        default data types, a ``BinaryFileOutput`` writes each tick as the
+        self-delimiting batch followed by the count and overruns as
+        big-endian uint32 and uint64, while text outputs show the batch
+        as hex.
+
+        Parameters
+        ----------
+        pin : int or str
+            The GPIO pin to capture edges on, as accepted by gpiozero.
+        buffer_size : int, optional
+            Number of edges that can be captured between ticks.
+        edge : str, optional
+            Edges to capture, ``rising``, ``falling`` or ``both``.
+        gpio_kwargs : dict, optional
+            Kwargs to pass to ``gpiozero.DigitalInputDevice``.
+        data_types : list, optional
+            Data types for the batch, count and overruns, in that order.
+            By default, ``edge_batch``, ``edge_count`` and ``edge_overruns``.
+        **value_input_kwargs
+            Passed on to the ``ValueInputStep`` base class.
+
+        """
+        if data_types is None:
+            data_types = [dict(data_type)
+                          for data_type in EDGE_DATA_TYPES_DEFAULT]
+        super().__init__(data_types=data_types, **value_input_kwargs)
+        self._capture_device = GPIOEdgeCaptureDevice(
+            pin=pin, buffer_size=buffer_size, edge=edge,
+            gpio_kwargs=gpio_kwargs)
+
+    def read_raw_data(self, input_data=None):
+        edge_times_ns, n_overruns = self._capture_device.drain()
+        if n_overruns:
+            self.logger.warning(
+                "%s GPIO edges dropped due to buffer overrun on step %s; "
+                "increase the buffer size or reduce the period",
+                n_overruns, self.name)
+        edge_batch = encode_edge_batch(edge_times_ns, n_overruns=n_overruns)
+        return [edge_batch, len(edge_times_ns),
+                self._capture_device.total_overruns]
@@ -3,29 +3,111 @@
 """
 
 # Standard library imports
+import asyncio
+import importlib
 import struct
 
-# Third party imports
-import pymodbus.client.sync
-import pymodbus.pdu
-import serial.tools.list_ports
-
 # Local imports
 import brokkr.pipeline.baseinput
+import brokkr.pipeline.datavalue
+import brokkr.pipeline.decode
+import brokkr.pipeline.multistep
+import brokkr.pipeline.utils
+import brokkr.utils.busarbiter
 import brokkr.utils.misc
 import brokkr.utils.ports
 
+# Third party imports (loaded on first use)
+pymodbus_client_sync = brokkr.utils.misc.lazy_import("pymodbus.client.sync")
+pymodbus_factory = brokkr.utils.misc.lazy_import("pymodbus.factory")
+pymodbus_pdu = brokkr.utils.misc.lazy_import("pymodbus.pdu")
+serial_list_ports = brokkr.utils.misc.lazy_import("serial.tools.list_ports")
+
 
 MODBUS_COIL_TYPE = "?"
 MODBUS_REGISTER_TYPE = "H"
 
+# Maximum number of coils/registers that can be requested in one read
+MODBUS_MAX_COUNT_COILS = 2000
+MODBUS_MAX_COUNT_REGISTERS = 125
+
+MODBUS_TCP_PORT_DEFAULT = 502
+MODBUS_TCP_HEADER_FORMAT = "!HHHB"
+MODBUS_TCP_PROTOCOL_ID = 0
+MODBUS_TIMEOUT_S_DEFAULT = 2
+MODBUS_RETRIES_DEFAULT = 3  # Pymodbus client default
+
+# Module and class of the request for each command, imported when used
+MODBUS_REQUEST_CLASSES = {
+    "read_coils": ("pymodbus.bit_read_message", "ReadCoilsRequest"),
+    "read_discrete_inputs":
+        ("pymodbus.bit_read_message", "ReadDiscreteInputsRequest"),
+    "read_holding_registers":
+        ("pymodbus.register_read_message", "ReadHoldingRegistersRequest"),
+    "read_input_registers":
+        ("pymodbus.register_read_message", "ReadInputRegistersRequest"),
+    }
+
 MODBUS_SERIAL_KWARGS_DEFAULT = {
     "method": "rtu",
     "strict": False,
-    "timeout": 2,
+    "timeout": MODBUS_TIMEOUT_S_DEFAULT,
     }
 
 
+# --- Utility functions --- #
+
+def plan_modbus_reads(
+        address_ranges, max_count=MODBUS_MAX_COUNT_REGISTERS, max_gap=0):
+    """
+    Coalesce a set of Modbus address ranges into as few reads as possible.
+
+    Parameters
+    ----------
+    address_ranges : sequence of tuple(int, int)
+        The (start address, count) pairs of coils/registers to read.
+    max_count : int, optional
+        Maximum number of coils/registers to request in one read.
+        The default is the protocol limit for registers, 125.
+    max_gap : int, optional
+        Maximum number of unrequested addresses to read through in order
+        to merge two nearby ranges into one read. The default is 0,
+        which only merges ranges that are adjacent or overlap.
+
+    Returns
+    -------
+    read_blocks : list of tuple(int, int, list of int)
+        The (start address, count, indices of the ranges it covers)
+        of each planned read, in address order. Ranges longer than
+        ``max_count`` are split over several consecutive reads.
+
+    """
+    # Split ranges too long for one read into pieces that fit
+    range_pieces = []
+    for idx, (start, count) in enumerate(address_ranges):
+        for piece_start in range(start, start + max(count, 1), max_count):
+            piece_count = min(max_count, start + count - piece_start)
+            range_pieces.append((piece_start, piece_count, idx))
+
+    read_blocks = []
+    for start, count, idx in sorted(range_pieces):
+        if read_blocks:
+            block_start, block_count, block_members = read_blocks[-1]
+            block_end = block_start + block_count
+            merged_end = max(block_end, start + count)
+            if (start - block_end <= max_gap
+                    and merged_end - block_start <= max_count):
+                if idx not in block_members:
+                    block_members = [*block_members, idx]
+                read_blocks[-1] = (
+                    block_start, merged_end - block_start, block_members)
+                continue
+        read_blocks.append((start, count, [idx]))
+    return read_blocks
+
+
+# --- Core input classes --- #
+
 class ModbusInput(brokkr.pipeline.baseinput.ValueInputStep):
     def __init__(
             self,
@@ -65,30 +147,66 @@ def __init__(
         self._start_address = start_address
         self._unit = unit
 
-        self._modbus_class = getattr(pymodbus.client.sync, modbus_client)
+        self._modbus_class = getattr(pymodbus_client_sync, modbus_client)
         self._modbus_function = modbus_command
         self._modbus_kwargs = {} if modbus_kwargs is None else modbus_kwargs
 
-    def _handle_failed_connect(self, error, modbus_client, port_object):
-        # pylint: disable=unused-argument, no-self-use
-        return False
+        self._has_prefetched = False
+        self._prefetched_values = None
 
-    def _get_responce_data(self, modbus_client, port_object=None):
+    @property
+    def address_range(self):
+        """The (start address, count) of the coils/registers this reads."""
         if self._raw_type == MODBUS_REGISTER_TYPE:
             responce_count = (
                 self.decoder.packet_size
                 // struct.calcsize("!" + MODBUS_REGISTER_TYPE))
         else:
             responce_count = len(self.data_types)
+        return self._start_address, responce_count
+
+    @property
+    def max_read_count(self):
+        """The maximum number of coils/registers to request in one read."""
+        if self._raw_type == MODBUS_REGISTER_TYPE:
+            return MODBUS_MAX_COUNT_REGISTERS
+        return MODBUS_MAX_COUNT_COILS
+
+    def get_connection_key(self):
+        """Get a key identifying the device and function this step reads."""
+        return (
+            brokkr.utils.misc.get_full_class_name(self),
+            self._modbus_class.__name__,
+            repr(sorted(self._modbus_kwargs.items())),
+            self._unit,
+            self._modbus_function,
+            )
+
+    def prefetch(self, raw_values):
+        """Set coil/register values read elsewhere to use on the next read."""
+        self._has_prefetched = True
+        self._prefetched_values = raw_values
+
+    def _handle_failed_connect(self, error, modbus_client, port_object):
+        # pylint: disable=unused-argument, no-self-use
+        return False
+
+    def _get_responce_data(
+            self, modbus_client, port_object=None, address=None, count=None):
+        default_address, default_count = self.address_range
+        if address is None:
+            address = default_address
+        if count is None:
+            count = default_count
         try:
             responce_data = getattr(modbus_client, self._modbus_function)(
-                address=self._start_address,
-                count=responce_count,
+                address=address,
+                count=count,
                 unit=self._unit)
             # If modbus data is an exception, log it and return None
             if isinstance(responce_data, BaseException):
                 raise responce_data
-            if isinstance(responce_data, pymodbus.pdu.ExceptionResponse):
+            if isinstance(responce_data, pymodbus_pdu.ExceptionResponse):
                 self.logger.error("Error reading Modbus data for %s",
                                   port_object)
                 self.log_helper.log(error=responce_data, client=modbus_client,
@@ -100,35 +218,41 @@ def _get_responce_data(self, modbus_client, port_object=None):
                               type(e).__name__, port_object, e)
             self.log_helper.log(client=modbus_client, port=port_object)
             return None
-        finally:
-            self.logger.debug("Closing Modbus client connection")
-            try:
-                modbus_client.close()
-            # Catch and log any errors closing the modbus connection
-            except AttributeError:
-                self.logger.debug(
-                    "Modbus client of type %r lacks close method; skipping",
-                    brokkr.utils.misc.get_full_class_name(modbus_client))
-            except Exception as e:
-                self.logger.warning("%s closing modbus device at %s: %s",
-                                    type(e).__name__, port_object, e)
-                self.log_helper.log(client=modbus_client, port=port_object)
 
         return responce_data
 
-    def _read_modbus_data(self, port_object=None):
+    def _close_client(self, modbus_client, port_object=None):
+        self.logger.debug("Closing Modbus client connection")
+        try:
+            modbus_client.close()
+        # Catch and log any errors closing the modbus connection
+        except AttributeError:
+            self.logger.debug(
+                "Modbus client of type %r lacks close method; skipping",
+                brokkr.utils.misc.get_full_class_name(modbus_client))
+        except Exception as e:
+            self.logger.warning("%s closing modbus device at %s: %s",
+                                type(e).__name__, port_object, e)
+            self.log_helper.log(client=modbus_client, port=port_object)
+
+    def _read_modbus_data(self, port_object=None, read_blocks=None):
         """
         Read data from an attached Modbus device.
 
         Parameters
         ----------
-        None.
+        port_object : Any, optional
+            Object describing the port in use, for logging purposes.
+        read_blocks : list of tuple(int, int), optional
+            If passed, the (start address, count) of each of multiple reads
+            to make over the same connection, instead of this step's own.
 
         Returns
         -------
-        responce_data : pymodbbus Responce
+        responce_data : pymodbbus Responce or list of pymodbus Responce
             Pymodbus data object reprisenting the read data,
             or None if no data could be read and an exception was logged.
+            If ``read_blocks`` is passed, a list with one per read block.
 
         """
         # Read data over Modbus
@@ -148,8 +272,23 @@ def _read_modbus_data(self, port_object=None):
                 if not connect_successful:
                     raise
             if connect_successful:
-                modbus_data = self._get_responce_data(
-                    modbus_client=modbus_client)
+                try:
+                    if read_blocks is None:
+                        modbus_data = self._get_responce_data(
+                            modbus_client=modbus_client,
+                            port_object=port_object)
+                    else:
+                        modbus_data = [
+                            self._get_responce_data(
+                                modbus_client=modbus_client,
+                                port_object=port_object,
+                                address=address,
+                                count=count,
+                                )
+                            for address, count in read_blocks]
+                finally:
+                    self._close_client(
+                        modbus_client=modbus_client, port_object=port_object)
             else:
                 # Raise an error if connect not successful
                 self.logger.error(
@@ -168,34 +307,52 @@ def _read_modbus_data(self, port_object=None):
 
         return modbus_data
 
-    def read_raw_data(self, input_data=None):
-        modbus_data = self._read_modbus_data()
-
-        if modbus_data is not None:
-            try:
-                if self._raw_type == MODBUS_REGISTER_TYPE:
-                    raw_data = modbus_data.registers
-                else:
-                    raw_data = modbus_data.bits
-            except Exception:
-                raw_data = None
-                self.logger.error(
-                    "Could not get Modbus responce data from obj %r",
-                    modbus_data)
-                self.log_helper.log(modbus_data=modbus_data)
+    def _get_responce_values(self, modbus_data):
+        if modbus_data is None:
+            return None
+        try:
+            if self._raw_type == MODBUS_REGISTER_TYPE:
+                raw_values = modbus_data.registers
             else:
-                # Convert uint16s or bools back to packed bytes
-                if self._raw_type == MODBUS_COIL_TYPE:
-                    # Coil responce length is rounded up to the nearest byte
-                    raw_data = raw_data[:len(self.data_types)]
-
-                struct_format = "!" + self._raw_type * len(raw_data)
-                raw_data = struct.pack(struct_format, *raw_data)
-                self.logger.debug(
-                    "Converted Modbus responce to struct of format %r: %r",
-                    struct_format, raw_data)
+                raw_values = modbus_data.bits
+        except Exception:
+            self.logger.error(
+                "Could not get Modbus responce data from obj %r",
+                modbus_data)
+            self.log_helper.log(modbus_data=modbus_data)
+            return None
+        return raw_values
+
+    def read_blocks(self, read_blocks):
+        """Read the coil/register values of each (address, count) block."""
+        modbus_data = self._read_modbus_data(read_blocks=read_blocks)
+        if modbus_data is None:
+            return [None] * len(read_blocks)
+        return [self._get_responce_values(block_data)
+                for block_data in modbus_data]
+
+    def read_raw_data(self, input_data=None):
+        if self._has_prefetched:
+            self.logger.debug("Using prefetched Modbus data")
+            raw_values = self._prefetched_values
+            self._has_prefetched = False
+            self._prefetched_values = None
         else:
-            raw_data = None
+            raw_values = self._get_responce_values(self._read_modbus_data())
+
+        if raw_values is None:
+            return None
+
+        # Convert uint16s or bools back to packed bytes
+        if self._raw_type == MODBUS_COIL_TYPE:
+            # Coil responce length is rounded up to the nearest byte
+            raw_values = raw_values[:len(self.data_types)]
+
+        struct_format = "!" + self._raw_type * len(raw_values)
+        raw_data = struct.pack(struct_format, *raw_values)
+        self.logger.debug(
+            "Converted Modbus responce to struct of format %r: %r",
+            struct_format, raw_data)
 
         return raw_data
 
@@ -207,6 +364,9 @@ def __init__(
             serial_port=None,
             serial_pids=None,
             try_usb_reset=False,
+            arbitrate_bus=False,
+            arbiter_kwargs=None,
+            arbiter_timeout_s=None,
             **modbus_kwargs):
         """
         Class to read data from an attached Modbus serial (RTU/ASCII) device.
@@ -220,6 +380,15 @@ def __init__(
             If serial port device not specified, collection of USB PIDs
             to look for to find the expected USB to serial adapter.
             By default, doesn't look for any and instead just picks the first.
+        arbitrate_bus : bool, optional
+            If True, wait for a turn on the serial bus before each
+            transaction, so multiple steps and processes polling units on
+            the same adapter never overlap. The default is False.
+        arbiter_kwargs : dict, optional
+            Additional kwargs to pass to the bus arbiter, if used.
+        arbiter_timeout_s : float, optional
+            Maximum time to wait for a turn on the bus, in s.
+            The default is None, which uses the arbiter's default of 30 s.
 
         """
         super().__init__(modbus_client=modbus_client, **modbus_kwargs)
@@ -229,6 +398,12 @@ def __init__(
         self._serial_port = serial_port
         self._serial_pids = [] if serial_pids is None else serial_pids
         self._try_usb_reset = try_usb_reset
+        self._arbitrate_bus = arbitrate_bus
+        self._arbiter_kwargs = {} if arbiter_kwargs is None else arbiter_kwargs
+        self._arbiter_timeout_s = (
+            brokkr.utils.busarbiter.ACQUIRE_TIMEOUT_S_DEFAULT
+            if arbiter_timeout_s is None else arbiter_timeout_s)
+        self.bus_arbiter = None
 
     def _handle_failed_connect(
             self, error, modbus_client=None, port_object=None):
@@ -248,10 +423,14 @@ def _handle_failed_connect(
 
         return connect_successful
 
-    def _read_modbus_data(self, port_object=None):
+    def get_connection_key(self):
+        return (*super().get_connection_key(),
+                self._serial_port, tuple(self._serial_pids))
+
+    def _read_modbus_data(self, port_object=None, read_blocks=None):
         # Get serial port to use from port list
         if not port_object:
-            port_list = serial.tools.list_ports.comports()
+            port_list = serial_list_ports.comports()
             port_object = brokkr.utils.ports.get_serial_port(
                 port_list=port_list,
                 port=self._serial_port,
@@ -261,7 +440,35 @@ def _read_modbus_data(self, port_object=None):
             return None
 
         self._modbus_kwargs["port"] = port_object.device
-        modbus_data = super()._read_modbus_data(port_object=port_object)
+        if not self._arbitrate_bus:
+            modbus_data = super()._read_modbus_data(
+                port_object=port_object, read_blocks=read_blocks)
+            return modbus_data
+
+        # Allow for connecting and every request to take all their tries
+        n_requests = 1 if read_blocks is None else len(read_blocks)
+        hold_timeout_s = (
+            (n_requests + 1)
+            * (self._modbus_kwargs.get("retries", MODBUS_RETRIES_DEFAULT) + 1)
+            * self._modbus_kwargs.get("timeout", MODBUS_TIMEOUT_S_DEFAULT))
+
+        self.bus_arbiter = brokkr.utils.busarbiter.get_bus_arbiter(
+            port_object.device, **self._arbiter_kwargs)
+        try:
+            with self.bus_arbiter.transaction(
+                    unit=self._unit,
+                    timeout_s=self._arbiter_timeout_s,
+                    hold_timeout_s=hold_timeout_s,
+                    ):
+                modbus_data = super()._read_modbus_data(
+                    port_object=port_object, read_blocks=read_blocks)
+        except TimeoutError as e:
+            self.logger.error("%s waiting for Modbus serial bus %s: %s",
+                              type(e).__name__, port_object, e)
+            self.logger.info("Bus stats: %r", self.bus_arbiter.get_stats())
+            return None
+        self.logger.debug("Bus stats for %s: %r",
+                          port_object, self.bus_arbiter.get_stats())
         return modbus_data
 
 
@@ -275,7 +482,7 @@ def __init__(
         """
         super().__init__(modbus_client=modbus_client, **modbus_kwargs)
 
-    def _read_modbus_data(self, port_object=None):
+    def _read_modbus_data(self, port_object=None, read_blocks=None):
         # Get port object for use in logging
         if not port_object:
             port_object = {
@@ -283,5 +490,329 @@ def _read_modbus_data(self, port_object=None):
                 "port": self._modbus_kwargs.get("port", "Default"),
                 }
 
-        modbus_data = super()._read_modbus_data(port_object=port_object)
+        modbus_data = super()._read_modbus_data(
+            port_object=port_object, read_blocks=read_blocks)
         return modbus_data
+
+
+# --- Multi-step classes --- #
+
+class ModbusCoalescingMultiStep(
+        brokkr.pipeline.multistep.SequentialMultiStep):
+    def __init__(
+            self,
+            max_gap=0,
+            **multistep_kwargs):
+        """
+        Run several steps, coalescing reads of Modbus steps on one device.
+
+        Modbus input steps that read the same unit with the same function
+        over the same connection are grouped, and their address ranges
+        merged into as few reads as possible over a single connection.
+        The result of each read is then sliced back to each step, which
+        decodes it as normal. Other steps are executed as usual.
+
+        Parameters
+        ----------
+        max_gap : int, optional
+            Maximum number of unrequested coils/registers to read through
+            in order to merge two nearby ranges into one read.
+            The default is 0, which only merges adjacent/overlapping ranges.
+
+        """
+        super().__init__(**multistep_kwargs)
+        self.max_gap = max_gap
+
+        read_groups = {}
+        for step in self.steps:
+            if isinstance(step, ModbusInput):
+                read_groups.setdefault(
+                    step.get_connection_key(), []).append(step)
+        self._read_groups = [
+            group_steps for group_steps in read_groups.values()
+            if len(group_steps) > 1]
+
+    def prefetch_group(self, group_steps):
+        lead_step = group_steps[0]
+        read_blocks = plan_modbus_reads(
+            [step.address_range for step in group_steps],
+            max_count=lead_step.max_read_count,
+            max_gap=self.max_gap,
+            )
+        self.logger.debug(
+            "Reading %s Modbus steps in %s read(s) for %s: %r",
+            len(group_steps), len(read_blocks), self.name, read_blocks)
+
+        all_block_values = lead_step.read_blocks(
+            [(start, count) for start, count, __ in read_blocks])
+
+        # Gather each step's values from the block(s) covering its range,
+        # taking from each block only the piece not already read from
+        # a previous one, as the blocks of a split range can overlap
+        step_values = [[] for __ in group_steps]
+        for (block_start, block_count, members), block_values in zip(
+                read_blocks, all_block_values):
+            for member_idx in members:
+                if step_values[member_idx] is None:
+                    continue
+                if block_values is None:
+                    step_values[member_idx] = None
+                    continue
+                start, count = group_steps[member_idx].address_range
+                piece_start = start + len(step_values[member_idx])
+                piece_end = min(start + count, block_start + block_count)
+                step_values[member_idx] += block_values[
+                    piece_start - block_start:piece_end - block_start]
+
+        for step, raw_values in zip(group_steps, step_values):
+            step.prefetch(raw_values)
+
+    def prefetch_due_groups(self):
+        """Prefetch the data of each group for the steps due next tick."""
+        next_tick = self.tick_count + 1
+        for group_steps in self._read_groups:
+            due_steps = [
+                step for step in group_steps
+                if self.is_step_due(step, tick_count=next_tick)]
+            if len(due_steps) < 2:
+                continue
+            try:
+                self.prefetch_group(due_steps)
+            except Exception as e:
+                self.logger.error(
+                    "%s prefetching coalesced Modbus data for %s: %s",
+                    type(e).__name__, self.name, e)
+                self.logger.info("Error details:", exc_info=True)
+
+    def execute(self, input_data=None):
+        if input_data is not brokkr.pipeline.utils.NASentinel:
+            self.prefetch_due_groups()
+        return super().execute(input_data=input_data)
+
+    async def execute_async(self, input_data=None):
+        if input_data is not brokkr.pipeline.utils.NASentinel:
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self.prefetch_due_groups)
+        output_data = await super().execute_async(input_data=input_data)
+        return output_data
+
+
+# --- Asynchronous input classes --- #
+
+class AsyncModbusTCPDevice(brokkr.utils.misc.AutoReprMixin):
+    def __init__(
+            self,
+            host,
+            data_types,
+            port=MODBUS_TCP_PORT_DEFAULT,
+            unit=1,
+            start_address=0x0000,
+            modbus_command="read_holding_registers",
+            timeout_s=MODBUS_TIMEOUT_S_DEFAULT,
+                ):
+        """
+        A Modbus TCP device read asynchronously over an asyncio stream.
+
+        Requests and responces are encoded and decoded with pymodbus'
+        PDU classes, and framed with the standard Modbus TCP MBAP header.
+
+        Parameters
+        ----------
+        host : str
+            Hostname/IP of the device.
+        data_types : list of brokkr.pipeline.datavalue.DataType
+            The data types to read from the device, in address order.
+        port : int, optional
+            TCP port of the device. The default is 502.
+        unit : int or hex, optional
+            Unit ID to request data from. The default is 1.
+        start_address : int or hex, optional
+           Register or coil start offset (PDU address). The default is 0x0000.
+        modbus_command : str, optional
+            Name of the Modbus read function to use.
+            The default is ``read_holding_registers``.
+        timeout_s : float, optional
+            Deadline for connecting to and reading from the device, in s.
+
+        """
+        self.host = host
+        self.port = port
+        self.unit = unit
+        self.start_address = start_address
+        self.timeout_s = timeout_s
+
+        request_module, request_class = MODBUS_REQUEST_CLASSES[modbus_command]
+        self._request_class = getattr(
+            importlib.import_module(request_module), request_class)
+        self._raw_type = (
+            MODBUS_REGISTER_TYPE if "register" in modbus_command
+            else MODBUS_COIL_TYPE)
+        self.decoder = brokkr.pipeline.decode.BinaryDataDecoder(
+            data_types=data_types)
+        if self._raw_type == MODBUS_REGISTER_TYPE:
+            self.count = (self.decoder.packet_size
+                          // struct.calcsize("!" + MODBUS_REGISTER_TYPE))
+        else:
+            self.count = len(data_types)
+        self._transaction_id = 0
+
+    def build_request_frame(self):
+        request = self._request_class(
+            self.start_address, self.count, unit=self.unit)
+        self._transaction_id = (self._transaction_id + 1) % 2**16
+        pdu = struct.pack("!B", request.function_code) + request.encode()
+        header = struct.pack(
+            MODBUS_TCP_HEADER_FORMAT, self._transaction_id,
+            MODBUS_TCP_PROTOCOL_ID, len(pdu) + 1, self.unit)
+        return header + pdu
+
+    def decode_responce(self, pdu):
+        responce = pymodbus_factory.ClientDecoder().decode(pdu)
+        if responce is None:
+            raise ValueError(f"Could not decode Modbus responce {pdu!r}")
+        if isinstance(responce, pymodbus_pdu.ExceptionResponse):
+            raise ValueError(f"Modbus exception responce {responce}")
+
+        if self._raw_type == MODBUS_REGISTER_TYPE:
+            raw_values = responce.registers
+        else:
+            # Coil responce length is rounded up to the nearest byte
+            raw_values = responce.bits[:self.count]
+        return struct.pack("!" + self._raw_type * len(raw_values), *raw_values)
+
+    async def _read(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(self.build_request_frame())
+            await writer.drain()
+            while True:
+                header = await reader.readexactly(
+                    struct.calcsize(MODBUS_TCP_HEADER_FORMAT))
+                transaction_id, __, length, __ = struct.unpack(
+                    MODBUS_TCP_HEADER_FORMAT, header)
+                pdu = await reader.readexactly(length - 1)
+                # Discard any stale responces to earlier requests
+                if transaction_id == self._transaction_id:
+                    break
+        finally:
+            writer.close()
+        return self.decode_responce(pdu)
+
+    async def read(self):
+        """Read the device's raw data as packed bytes, within the timeout."""
+        raw_data = await asyncio.wait_for(self._read(), timeout=self.timeout_s)
+        return raw_data
+
+
+class ModbusAsyncEthernetInput(brokkr.pipeline.baseinput.ValueInputStep):
+    def __init__(
+            self,
+            devices,
+            timeout_s=MODBUS_TIMEOUT_S_DEFAULT,
+            max_concurrent=None,
+            datatype_default_kwargs=None,
+            **value_input_kwargs):
+        """
+        Poll a fleet of Modbus TCP devices concurrently with asyncio.
+
+        All devices are read at once, each within its own deadline,
+        and the results merged into one output, with NA values filled in
+        for the data of any device that could not be read.
+
+        Parameters
+        ----------
+        devices : list of dict
+            The devices to read, each with the keys ``host`` and
+            ``data_types``, and optionally ``port``, ``unit``,
+            ``start_address``, ``modbus_command`` and ``timeout_s``
+            (see AsyncModbusTCPDevice), plus ``name_suffix``, a string to
+            append to the names of the device's data types. If not passed,
+            defaults to ``_1``, ``_2``, etc. if there is more than one device.
+        timeout_s : float, optional
+            Default per-device deadline for each read, in s. The default is 2.
+        max_concurrent : int, optional
+            Maximum number of devices to read at the same time.
+            The default is None, which reads all devices at once.
+
+        """
+        if datatype_default_kwargs is None:
+            datatype_default_kwargs = {}
+
+        device_specs = []
+        all_data_types = []
+        for idx, device_kwargs in enumerate(devices):
+            device_kwargs = {"timeout_s": timeout_s, **device_kwargs}
+            device_data_types = device_kwargs.pop("data_types")
+            default_suffix = f"_{idx + 1}" if len(devices) > 1 else ""
+            name_suffix = device_kwargs.pop("name_suffix", default_suffix)
+            raw_type = (
+                MODBUS_REGISTER_TYPE if "register" in device_kwargs.get(
+                    "modbus_command", "register") else MODBUS_COIL_TYPE)
+
+            data_types = brokkr.pipeline.datavalue.build_data_types(
+                device_data_types,
+                datatype_default_kwargs={
+                    "input_type": raw_type, **datatype_default_kwargs},
+                name_suffix=name_suffix,
+                )
+            device_specs.append((device_kwargs, data_types))
+            all_data_types += data_types
+
+        super().__init__(
+            data_types=all_data_types,
+            binary_decoder=False,
+            **value_input_kwargs)
+
+        self.devices = [
+            AsyncModbusTCPDevice(data_types=data_types, **device_kwargs)
+            for device_kwargs, data_types in device_specs]
+        self._max_concurrent = max_concurrent
+        self._loop = None
+
+    async def _read_device(self, device, semaphore=None):
+        try:
+            if semaphore is None:
+                return await device.read()
+            async with semaphore:
+                return await device.read()
+        except asyncio.TimeoutError:
+            self.logger.error(
+                "Timeout after %s s reading Modbus data from %s:%s unit %s",
+                device.timeout_s, device.host, device.port, device.unit)
+        except Exception as e:
+            self.logger.error(
+                "%s reading Modbus data from %s:%s unit %s: %s",
+                type(e).__name__, device.host, device.port, device.unit, e)
+            self.logger.info("Error details:", exc_info=True)
+        return None
+
+    async def read_devices(self):
+        semaphore = None
+        if self._max_concurrent:
+            semaphore = asyncio.Semaphore(self._max_concurrent)
+        device_data = await asyncio.gather(*[
+            self._read_device(device, semaphore=semaphore)
+            for device in self.devices])
+        n_read = sum(raw_data is not None for raw_data in device_data)
+        self.logger.debug("Read Modbus data from %s of %s devices",
+                          n_read, len(device_data))
+        raw_data = brokkr.pipeline.decode.decode_binary_segments(
+            [device.decoder for device in self.devices], device_data)
+        return raw_data
+
+    def read_raw_data(self, input_data=None):
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        raw_data = self._loop.run_until_complete(self.read_devices())
+        return raw_data
+
+    def close(self):
+        """Close the event loop used to read devices synchronously."""
+        if self._loop is not None:
+            self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+            self._loop.close()
+            self._loop = None
+
+    async def read_raw_data_async(self, input_data=None):
+        raw_data = await self.read_devices()
+        return raw_data
@@ -0,0 +1,82 @@
+"""
+Input reporting the resource usage of the worker running it and the system.
+"""
+
+# Local imports
+import brokkr.pipeline.baseinput
+import brokkr.utils.procstats
+
+
+PROCESS_STATS_DATA_TYPES_DEFAULT = [
+    {"name": "cpu_time_s", "binary_type": "d", "full_name": "CPU Time",
+     "unit": "s"},
+    {"name": "cpu_percent", "binary_type": "f", "full_name": "CPU Usage",
+     "unit": "%"},
+    {"name": "rss_bytes", "binary_type": "Q", "full_name": "Memory RSS",
+     "unit": "B"},
+    {"name": "open_fds", "binary_type": "I", "full_name": "Open FDs"},
+    {"name": "ctx_switches_voluntary", "binary_type": "Q",
+     "full_name": "Voluntary Context Switches"},
+    {"name": "ctx_switches_involuntary", "binary_type": "Q",
+     "full_name": "Involuntary Context Switches"},
+    {"name": "io_read_bytes", "binary_type": "Q", "full_name": "I/O Read",
+     "unit": "B"},
+    {"name": "io_write_bytes", "binary_type": "Q", "full_name": "I/O Write",
+     "unit": "B"},
+    {"name": "load_1m", "binary_type": "f", "full_name": "Load Avg (1 min)"},
+    {"name": "disk_read_bytes", "binary_type": "Q", "full_name": "Disk Read",
+     "unit": "B"},
+    {"name": "disk_write_bytes", "binary_type": "Q",
+     "full_name": "Disk Write", "unit": "B"},
+    ]
+
+
+class ProcessStatsInput(brokkr.pipeline.baseinput.ValueInputStep):
+    def __init__(
+            self,
+            disk_device=brokkr.utils.procstats.DISK_DEVICE_DEFAULT,
+            data_types=None,
+            **value_input_kwargs):
+        """
+        Report the CPU, memory, fd, context switch and I/O use of this worker.
+
+        Also reports the system load and the disk I/O of the given device.
+        Each data type reads the stat of the same name in
+        ``brokkr.utils.procstats.STATS``, or that given by its ``stat``
+        attribute. Only the /proc files the data types need are read;
+        set ``period_ticks`` to only read them every N ticks.
+
+        Parameters
+        ----------
+        disk_device : str, optional
+            Block device to report the disk I/O of. By default, the SD card.
+        data_types : list, optional
+            Data types of the stats to report. By default, the CPU time
+            and usage, RSS, open fds, context switches, process and disk I/O
+            and 1 minute load average.
+        **value_input_kwargs
+            Passed on to the ``ValueInputStep`` base class.
+
+        """
+        if data_types is None:
+            data_types = [dict(data_type)
+                          for data_type in PROCESS_STATS_DATA_TYPES_DEFAULT]
+        super().__init__(data_types=data_types, **value_input_kwargs)
+
+        name_suffix = value_input_kwargs.get("name_suffix", "")
+        self._stats = [
+            getattr(data_type, "stat",
+                    data_type.name[:len(data_type.name) - len(name_suffix)])
+            for data_type in self.data_types]
+        for data_type, stat in zip(self.data_types, self._stats):
+            if stat not in brokkr.utils.procstats.STATS:
+                raise ValueError(
+                    f"Stat {stat!r} for {data_type.name!r} must be one of "
+                    f"{sorted(brokkr.utils.procstats.STATS)}")
+        self._stats_reader = brokkr.utils.procstats.ProcessStatsReader(
+            disk_device=disk_device)
+
+    def read_raw_data(self, input_data=None):
+        stat_values = self._stats_reader.read(stats=self._stats)
+        raw_data = [stat_values[stat] for stat in self._stats]
+        return raw_data
@@ -3,53 +3,202 @@
 """
 
 # Standard library imports
+import atexit
+import contextlib
+import functools
 import logging
+import os
 from pathlib import Path
-
-# Third party imports
-import smbus2
+import threading
 
 # Local imports
 import brokkr.pipeline.baseinput
+import brokkr.pipeline.datavalue
+import brokkr.pipeline.decode
 import brokkr.utils.misc
 
+# Third party imports (loaded on first use)
+smbus2 = brokkr.utils.misc.lazy_import("smbus2")
+
 
 MAX_I2C_BUS_N = 6
 
 I2C_BLOCK_READ_FUNCTION = "read_i2c_block_data"
 DEFAULT_READ_FUNCTION = I2C_BLOCK_READ_FUNCTION
 
+# Max messages per I2C_RDWR ioctl, per the Linux kernel
+I2C_RDWR_MAX_MESSAGES = 42
+
 LOGGER = logging.getLogger(__name__)
 
 
+# --- Utility functions --- #
+
+@functools.lru_cache(maxsize=None)
+def find_i2c_bus():
+    """Find the first I2C bus device present, caching the result."""
+    for n_bus in range(0, MAX_I2C_BUS_N + 1):
+        if Path(f"/dev/i2c-{n_bus}").exists():
+            LOGGER.debug("Found I2C device at bus %s", n_bus)
+            return n_bus
+    raise RuntimeError("Could not find I2C any bus device")
+
+
+# --- Helper classes --- #
+
+class SMBusManager(brokkr.utils.misc.AutoReprMixin):
+    def __init__(self, smbus_class=None):
+        """
+        Keep I2C buses open for the life of the process, one lock per bus.
+
+        Parameters
+        ----------
+        smbus_class : type, optional
+            Class to create bus handles with, given the bus and force.
+            The default is smbus2.SMBus.
+
+        """
+        self.smbus_class = smbus_class
+        self._buses = {}
+        self._bus_locks = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _get_bus_lock(self, bus):
+        with self._lock:
+            # Don't share bus handles inherited through a fork
+            if self._pid != os.getpid():
+                self._buses.clear()
+                self._bus_locks.clear()
+                self._pid = os.getpid()
+            try:
+                return self._bus_locks[bus]
+            except KeyError:
+                bus_lock = threading.Lock()
+                self._bus_locks[bus] = bus_lock
+                return bus_lock
+
+    @contextlib.contextmanager
+    def open_bus(self, bus, force=None):
+        """Context manager to hold the lock on a bus and get its handle."""
+        # Handles are kept per force setting, as it is set when opened
+        handle_key = (bus, force)
+        with self._get_bus_lock(bus):
+            i2c_bus = self._buses.get(handle_key, None)
+            if i2c_bus is None:
+                LOGGER.debug("Opening I2C bus %s with force %s", bus, force)
+                smbus_class = (smbus2.SMBus if self.smbus_class is None
+                               else self.smbus_class)
+                i2c_bus = smbus_class(bus, force=force)
+                self._buses[handle_key] = i2c_bus
+            try:
+                yield i2c_bus
+            except Exception:
+                # Close the bus on error, so it will be reopened on next use
+                LOGGER.debug("Closing I2C bus %s after error", bus)
+                self._close_handle(handle_key)
+                raise
+
+    def _close_handle(self, handle_key):
+        i2c_bus = self._buses.pop(handle_key, None)
+        if i2c_bus is None:
+            return
+        try:
+            i2c_bus.close()
+        except Exception as e:
+            LOGGER.debug("%s closing I2C bus %s: %s",
+                         type(e).__name__, handle_key[0], e)
+
+    def close_bus(self, bus):
+        with self._get_bus_lock(bus):
+            for handle_key in list(self._buses):
+                if handle_key[0] == bus:
+                    self._close_handle(handle_key)
+
+    def close_all(self):
+        for bus in {handle_key[0] for handle_key in list(self._buses)}:
+            self.close_bus(bus)
+
+
+SMBUS_MANAGER = SMBusManager()
+atexit.register(SMBUS_MANAGER.close_all)
+
+
+# --- Core classes --- #
+
 class SMBusI2CDevice(brokkr.utils.misc.AutoReprMixin):
-    def __init__(self, bus=None, force=None):
+    def __init__(self, bus=None, force=None, persist_bus=True):
         self.force = force
+        self.persist_bus = persist_bus
 
         # Automatically try to find first I2C bus and use that
         if bus is None:
-            for n_bus in range(0, MAX_I2C_BUS_N + 1):
-                if Path(f"/dev/i2c-{n_bus}").exists():
-                    bus = n_bus
-                    LOGGER.debug("Found I2C device at bus %s", bus)
-                    break
-            else:
-                raise RuntimeError("Could not find I2C any bus device")
+            bus = find_i2c_bus()
 
         self.bus = bus
 
+    @contextlib.contextmanager
+    def open_bus(self):
+        if self.persist_bus:
+            with SMBUS_MANAGER.open_bus(
+                    self.bus, force=self.force) as i2c_bus:
+                yield i2c_bus
+        else:
+            with smbus2.SMBus(self.bus, force=self.force) as i2c_bus:
+                yield i2c_bus
+
     def read(self, force=None,
              read_function=DEFAULT_READ_FUNCTION, **read_kwargs):
         if force is None:
             force = self.force
         LOGGER.debug("Reading I2C data with function %s at bus %r, kwargs %r",
                      read_function, self.bus, read_kwargs)
-        with smbus2.SMBus(self.bus, force=self.force) as i2c_bus:
+        with self.open_bus() as i2c_bus:
             buffer = getattr(i2c_bus, read_function)(
                 force=force, **read_kwargs)
         LOGGER.debug("Read I2C data %r", buffer)
         return buffer
 
+    def supports_combined(self):
+        """Check if the bus adapter supports combined I2C transactions."""
+        with self.open_bus() as i2c_bus:
+            return bool(i2c_bus.funcs & smbus2.I2cFunc.I2C)
+
+    def read_combined(self, i2c_addr, register_reads):
+        """
+        Read several register blocks with combined I2C_RDWR transactions.
+
+        Each read is a write of the register address followed by a
+        repeated-start read, with as many reads as fit in each transaction.
+
+        Parameters
+        ----------
+        i2c_addr : int
+            Address of the device on the bus.
+        register_reads : list of tuple(int, int)
+            Register address and length in bytes of each read.
+
+        Returns
+        -------
+        buffers : list of bytes
+            The data read for each register block, in order.
+
+        """
+        messages = []
+        for register, length in register_reads:
+            messages += [smbus2.i2c_msg.write(i2c_addr, [register]),
+                         smbus2.i2c_msg.read(i2c_addr, length)]
+        LOGGER.debug("Reading I2C data combined at bus %r, addr %r, reads %r",
+                     self.bus, i2c_addr, register_reads)
+        with self.open_bus() as i2c_bus:
+            for idx in range(0, len(messages), I2C_RDWR_MAX_MESSAGES):
+                i2c_bus.i2c_rdwr(*messages[idx:idx + I2C_RDWR_MAX_MESSAGES])
+        buffers = [bytes(message) for message in messages[1::2]]
+        LOGGER.debug("Read I2C data %r", buffers)
+        return buffers
+
+
+# --- Input steps --- #
 
 class SMBusI2CInput(brokkr.pipeline.baseinput.SensorInputStep):
     def __init__(
@@ -59,6 +208,7 @@ def __init__(
             init_kwargs=None,
             read_kwargs=None,
             include_all_data_each=True,
+            cache_sensor_object=False,
             **sensor_input_kwargs):
         init_kwargs = {} if init_kwargs is None else init_kwargs
         self._read_kwargs = {} if read_kwargs is None else read_kwargs
@@ -69,6 +219,7 @@ def __init__(
             sensor_class=SMBusI2CDevice,
             sensor_kwargs=sensor_kwargs,
             include_all_data_each=include_all_data_each,
+            cache_sensor_object=cache_sensor_object,
             **sensor_input_kwargs)
 
     def read_sensor_data(self, sensor_object=None):
@@ -108,3 +259,118 @@ def __init__(
 
         super().__init__(read_function=I2C_BLOCK_READ_FUNCTION,
                          read_kwargs=read_kwargs, **smbus_input_kwargs)
+
+
+class SMBusI2CMultiBlockInput(SMBusI2CInput):
+    def __init__(
+            self,
+            i2c_addr,
+            reads,
+            force=None,
+            use_combined=True,
+            byte_order="!",
+            datatype_default_kwargs=None,
+            include_all_data_each=False,
+            **smbus_input_kwargs):
+        """
+        Read multiple register blocks from one I2C device in one step.
+
+        Parameters
+        ----------
+        i2c_addr : int
+            Address of the device on the bus.
+        reads : list of dict
+            The register blocks to read, each with the ``register``
+            to start at, its ``data_types`` and optionally the ``length``
+            in bytes (by default, that of the data types) and ``byte_order``
+            to unpack the segment with.
+        force : bool, optional
+            Force the address for the per-register fallback reads.
+        use_combined : bool, optional
+            Read all registers in one combined I2C_RDWR transaction where
+            the adapter supports it. Otherwise, or if False, falls back
+            to an SMBus block read per register. The default is True.
+        byte_order : str, optional
+            Default struct byte order character to unpack segments with.
+        datatype_default_kwargs : dict, optional
+            Default kwargs for the DataTypes of each segment.
+        **smbus_input_kwargs
+            Passed on to the ``SMBusI2CInput`` base class.
+
+        """
+        if datatype_default_kwargs is None:
+            datatype_default_kwargs = {}
+
+        self.i2c_addr = i2c_addr
+        self.force = force
+        self.use_combined = use_combined
+        self.register_reads = []
+        self.segment_decoders = []
+        for read in reads:
+            segment_decoder = brokkr.pipeline.decode.BinaryDataDecoder(
+                data_types=brokkr.pipeline.datavalue.build_data_types(
+                    read["data_types"],
+                    datatype_default_kwargs=datatype_default_kwargs),
+                byte_order=read.get("byte_order", byte_order),
+                )
+            self.segment_decoders.append(segment_decoder)
+            self.register_reads.append(
+                (read["register"],
+                 read.get("length", segment_decoder.packet_size)))
+
+        data_types = [data_type for segment_decoder in self.segment_decoders
+                      for data_type in segment_decoder.data_types]
+        super().__init__(
+            data_types=data_types,
+            binary_decoder=False,
+            include_all_data_each=include_all_data_each,
+            **smbus_input_kwargs)
+
+    def _read_separate(self, sensor_object):
+        buffers = []
+        for register, length in self.register_reads:
+            try:
+                buffer = bytes(sensor_object.read(
+                    read_function=I2C_BLOCK_READ_FUNCTION,
+                    i2c_addr=self.i2c_addr, register=register,
+                    length=length, force=self.force))
+            except Exception as e:
+                self.logger.error(
+                    "%s reading I2C register %s at addr %s on step %s: %s",
+                    type(e).__name__, register, self.i2c_addr, self.name, e)
+                self.logger.info("Error details:", exc_info=True)
+                buffer = None
+            buffers.append(buffer)
+        return buffers
+
+    def read_sensor_data(self, sensor_object=None):
+        sensor_object = self.get_sensor_object(sensor_object=sensor_object)
+        if sensor_object is None:
+            return None
+
+        if self.use_combined:
+            try:
+                if sensor_object.supports_combined():
+                    return sensor_object.read_combined(
+                        i2c_addr=self.i2c_addr,
+                        register_reads=self.register_reads)
+                self.logger.info(
+                    "I2C bus %s doesn't support combined transactions; "
+                    "falling back to separate reads on step %s",
+                    sensor_object.bus, self.name)
+                self.use_combined = False
+            except Exception as e:
+                self.logger.error(
+                    "%s reading I2C data combined at addr %s on step %s: %s",
+                    type(e).__name__, self.i2c_addr, self.name, e)
+                self.logger.info("Error details:", exc_info=True)
+                return None
+
+        return self._read_separate(sensor_object)
+
+    def read_raw_data(self, input_data=None):
+        buffers = self.read_sensor_data()
+        if buffers is None:
+            return None
+        return brokkr.pipeline.decode.decode_binary_segments(
+            self.segment_decoders, buffers)
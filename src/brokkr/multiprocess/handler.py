@@ -3,31 +3,141 @@
 """
 
 # Standard library imports
+import collections
+import ctypes
+import ctypes.util
+import importlib
 import logging
 import multiprocessing
+import multiprocessing.connection
+import os
 import sys
+import threading
 import time
 
 # Local imports
 from brokkr.constants import SLEEP_TICK_S
 import brokkr.multiprocess.loglistener
+import brokkr.multiprocess.metricsserver
+import brokkr.utils.metrics
 import brokkr.utils.misc
+import brokkr.utils.procstats
 
 
-# Startup and shutdown delays for processes
-LOGGING_STARTUP_WAIT_S = 1
+# Startup and shutdown timeouts for processes
+LOGGING_STARTUP_WAIT_S = 10
 LOGGING_SHUTDOWN_WAIT_S = 5
+WORKER_STARTUP_WAIT_S = 30
 WORKER_SHUTDOWN_WAIT_S = 10
 
+WORKER_STATS_INTERVAL_S_DEFAULT = 10
+
+# Interval to check for thread workers exiting, which lack a sentinel
+THREAD_POLL_INTERVAL_S = 0.05
+
+METRICS_PUSH_INTERVAL_S_DEFAULT = (
+    brokkr.utils.metrics.METRICS_PUSH_INTERVAL_S_DEFAULT)
+
+RESTART_CONFIG_DEFAULT = {
+    "enabled": True,
+    "backoff_initial_s": 1,
+    "backoff_max_s": 300,
+    "crash_loop_limit": 5,
+    "crash_loop_window_s": 600,
+    }
+
+WORKER_MODES = {"process", "thread"}
+WORKER_MODE_DEFAULT = "process"
+
+# Flags for mlockall, to lock current and future pages in memory
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+
+REALTIME_PRIORITY_RANGE = (1, 99)
+
 
 # --- General helper functions --- #
 
+def notify_ready(ready_conn, ready=True):
+    """Tell the handler a worker is ready (or failed) and close the pipe."""
+    if ready_conn is None or ready_conn.closed:
+        return
+    try:
+        ready_conn.send(ready)
+        ready_conn.close()
+    except (OSError, ValueError) as e:
+        logging.getLogger(__name__).debug(
+            "%s notifying handler of worker readiness: %s",
+            type(e).__name__, e)
+
+
+def get_elapsed_ms(start_time):
+    return round((time.monotonic() - start_time) * int(1e3), 1)
+
+
+def lock_process_memory():
+    """Lock all current and future pages of this process in RAM."""
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    if libc.mlockall(MCL_CURRENT | MCL_FUTURE):
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+
+def apply_scheduling(worker_config, logger=None):
+    """
+    Apply a worker's CPU affinity, priority and memory locking options.
+
+    These are only supported for process workers, as a thread worker
+    would apply them to (part of) the main process. Options that are
+    unsupported or lack the needed privileges are logged and skipped,
+    rather than stopping the worker.
+
+    Parameters
+    ----------
+    worker_config : WorkerConfig
+        The config of the worker to apply the options of.
+    logger : logging.Logger, optional
+        Logger to use. By default, this module's.
+
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    settings = [
+        ("CPU affinity", worker_config.cpu_affinity,
+         lambda value: os.sched_setaffinity(0, value)),
+        ("nice level", worker_config.nice,
+         lambda value: os.setpriority(os.PRIO_PROCESS, 0, value)),
+        ("SCHED_FIFO priority", worker_config.realtime_priority,
+         lambda value: os.sched_setscheduler(
+             0, os.SCHED_FIFO, os.sched_param(value))),
+        ("memory lock", worker_config.lock_memory or None,
+         lambda value: lock_process_memory()),
+        ]
+    for setting_name, value, apply_setting in settings:
+        if value is None:
+            continue
+        try:
+            apply_setting(value)
+        except (AttributeError, OSError) as e:
+            logger.warning("%s setting %s to %r for worker %s, skipping: %s",
+                           type(e).__name__, setting_name, value,
+                           worker_config.name, e)
+            logger.debug("Error details:", exc_info=True)
+        else:
+            logger.debug("Set %s to %r for worker %s",
+                         setting_name, value, worker_config.name)
+
+
 def start_worker_process(
         worker_config,
         log_configurator=None,
         configurator_kwargs=None,
         exit_event=None,
         on_startup=None,
+        metrics_queue=None,
+        metrics_interval_s=METRICS_PUSH_INTERVAL_S_DEFAULT,
+        exit_on_build_error=True,
+        ready_conn=None,
         ):
     if log_configurator is not None:
         if configurator_kwargs is None:
@@ -41,6 +151,8 @@ def start_worker_process(
         logger.debug("Running on-startup callback %r", on_startup)
         on_startup()
 
+    apply_scheduling(worker_config, logger=logger)
+
     executor = worker_config.executor
     if worker_config.build_method:
         try:
@@ -55,8 +167,9 @@ def start_worker_process(
             logger.info("Build method: %s; Build args: %r; Build kwargs: %r",
                         worker_config.build_method,
                         worker_config.build_args, worker_config.build_kwargs)
-            if exit_event is not None:
+            if exit_on_build_error and exit_event is not None:
                 exit_event.set()
+            notify_ready(ready_conn, ready=False)
             sys.exit(e.code)
         except Exception as e:
             logger.critical("%s during executor build for process %s: %s",
@@ -65,11 +178,21 @@ def start_worker_process(
             logger.info("Build method: %s; Build args: %r; Build kwargs: %r",
                         worker_config.build_method,
                         worker_config.build_args, worker_config.build_kwargs)
-            if exit_event is not None:
+            if exit_on_build_error and exit_event is not None:
                 exit_event.set()
+            notify_ready(ready_conn, ready=False)
             sys.exit(1)
         if executor_new:
             executor = executor_new
+    if metrics_queue is not None:
+        logger.debug("Starting metrics pusher for %s", worker_config.name)
+        brokkr.utils.metrics.MetricsPusher(
+            metrics_queue=metrics_queue,
+            source=worker_config.name,
+            interval_s=metrics_interval_s,
+            ).start()
+    notify_ready(ready_conn)
+
     if worker_config.run_method:
         run_callable = getattr(executor, worker_config.run_method)
     else:
@@ -94,7 +217,35 @@ def __init__(
             run_method=None,
             run_args=(),
             run_kwargs=None,
+            mode=WORKER_MODE_DEFAULT,
+            cpu_affinity=None,
+            nice=None,
+            realtime_priority=None,
+            lock_memory=False,
                 ):
+        if mode not in WORKER_MODES:
+            raise ValueError(
+                f"Worker mode must be one of {WORKER_MODES}, not {mode!r}")
+        scheduling_options = {
+            "cpu_affinity": cpu_affinity,
+            "nice": nice,
+            "realtime_priority": realtime_priority,
+            "lock_memory": lock_memory or None,
+            }
+        if mode == "thread":
+            options_set = [option for option, value
+                           in scheduling_options.items() if value is not None]
+            if options_set:
+                raise ValueError(
+                    f"Scheduling options {options_set} of worker {name!r} "
+                    "require process mode, as in thread mode they would "
+                    "apply to the main process")
+        if realtime_priority is not None and not (
+                REALTIME_PRIORITY_RANGE[0] <= realtime_priority
+                <= REALTIME_PRIORITY_RANGE[1]):
+            raise ValueError(
+                f"Realtime priority must be in {REALTIME_PRIORITY_RANGE}, "
+                f"not {realtime_priority!r}")
         self.executor = executor
         self.name = name
         self.build_method = build_method
@@ -103,31 +254,247 @@ def __init__(
         self.run_method = run_method
         self.run_args = run_args
         self.run_kwargs = {} if run_kwargs is None else run_kwargs
+        self.mode = mode
+        self.cpu_affinity = (
+            None if cpu_affinity is None else set(cpu_affinity))
+        self.nice = nice
+        self.realtime_priority = realtime_priority
+        self.lock_memory = lock_memory
+
+
+class WorkerRestartState(brokkr.utils.misc.AutoReprMixin):
+    def __init__(self):
+        self.n_restarts = 0
+        self.failure_times = collections.deque()
+        self.next_restart_time = None
+        self.stopped = False
+
+
+class WorkerSupervisor(brokkr.utils.misc.AutoReprMixin):
+    def __init__(self, restart_config=None, before_restart=None):
+        """
+        Track failed workers and when to restart them, with backoff.
+
+        Parameters
+        ----------
+        restart_config : dict, optional
+            Restart options, overriding those in ``RESTART_CONFIG_DEFAULT``.
+        before_restart : Callable, optional
+            Function to call with a failed worker's config before it is
+            restarted, e.g. to replace resources it may have left broken.
+
+        """
+        self.restart_config = {
+            **RESTART_CONFIG_DEFAULT,
+            **({} if restart_config is None else restart_config),
+            }
+        self.before_restart = before_restart
+        self.restart_states = []
+
+    @property
+    def enabled(self):
+        return self.restart_config["enabled"]
+
+    def reset(self, n_workers=0):
+        """Start tracking a new set of workers."""
+        self.restart_states = [
+            WorkerRestartState() for __ in range(n_workers)]
+
+    def schedule_restart(self, restart_state, worker, current_time):
+        """Record a worker's failure and schedule its restart, if allowed."""
+        logger = logging.getLogger(__name__)
+        failure_times = restart_state.failure_times
+        failure_times.append(current_time)
+        while failure_times[0] < (
+                current_time - self.restart_config["crash_loop_window_s"]):
+            failure_times.popleft()
+        brokkr.utils.metrics.REGISTRY.increment(
+            worker.name, "worker_failures")
+
+        if len(failure_times) > self.restart_config["crash_loop_limit"]:
+            logger.critical(
+                "Worker %s failed %s times in %s s with exitcode %s, "
+                "not restarting again", worker, len(failure_times),
+                self.restart_config["crash_loop_window_s"], worker.exitcode)
+            brokkr.utils.metrics.REGISTRY.set_gauge(
+                worker.name, "worker_crash_looping", 1)
+            restart_state.stopped = True
+            return
+
+        backoff_s = min(
+            self.restart_config["backoff_initial_s"]
+            * 2 ** (len(failure_times) - 1),
+            self.restart_config["backoff_max_s"])
+        restart_state.next_restart_time = current_time + backoff_s
+        logger.error("Worker %s failed with exitcode %s, restarting in %s s",
+                     worker, worker.exitcode, backoff_s)
+
+    def check_worker(self, idx, worker, current_time):
+        """Check a worker's status, and if it should be restarted now."""
+        restart_state = self.restart_states[idx]
+        if restart_state.stopped or worker.is_alive():
+            return False
+        if not worker.exitcode:
+            logging.getLogger(__name__).info(
+                "Worker %s exited cleanly, not restarting", worker)
+            restart_state.stopped = True
+            return False
+
+        # Schedule the restart when a failure is first noticed
+        if restart_state.next_restart_time is None:
+            self.schedule_restart(restart_state, worker, current_time)
+        return (not restart_state.stopped
+                and current_time >= restart_state.next_restart_time)
+
+    def run_before_restart(self, worker_config):
+        if self.before_restart is None:
+            return
+        logger = logging.getLogger(__name__)
+        logger.debug("Running before restart callback %r", self.before_restart)
+        try:
+            self.before_restart(worker_config)
+        except (Exception, SystemExit) as e:
+            logger.error("%s in before restart callback for worker %s: %s",
+                         type(e).__name__, worker_config.name, e)
+            logger.info("Error details:", exc_info=True)
+
+    def record_restart(self, idx, worker_name):
+        restart_state = self.restart_states[idx]
+        restart_state.next_restart_time = None
+        restart_state.n_restarts += 1
+        brokkr.utils.metrics.REGISTRY.set_counter(
+            worker_name, "worker_restarts", restart_state.n_restarts)
+
+
+class WorkerStatsMonitor(brokkr.utils.misc.AutoReprMixin):
+    def __init__(self, interval_s=WORKER_STATS_INTERVAL_S_DEFAULT):
+        """
+        Periodically read and publish the resource usage of each worker.
+
+        Parameters
+        ----------
+        interval_s : float, optional
+            Interval to read worker stats at, in s. If 0, they aren't read.
+            The default is 10 s.
+
+        """
+        self.interval_s = interval_s
+        self.worker_stats = {}
+        self._stats_readers = {}
+        self._next_update_time = time.monotonic()
+
+    def update_if_due(self, workers):
+        if not self.interval_s or time.monotonic() < self._next_update_time:
+            return
+        self._next_update_time = time.monotonic() + self.interval_s
+        self.update(workers)
+
+    def update(self, workers):
+        """Read the resource usage of each live worker and publish it."""
+        for worker in workers:
+            if not worker.is_alive():
+                self.worker_stats.pop(worker.name, None)
+                continue
+            # Thread workers are tasks of this process, sharing its memory
+            if isinstance(worker, ThreadWorker):
+                task_id = getattr(worker, "native_id", None)
+                if task_id is None:  # Not availible on Python <3.8
+                    continue
+                proc_path = (brokkr.utils.procstats.PROC_PATH / "self"
+                             / "task" / str(task_id))
+            else:
+                proc_path = brokkr.utils.procstats.PROC_PATH / str(worker.pid)
+
+            stats_reader = self._stats_readers.get(worker.name, None)
+            if stats_reader is None or stats_reader.proc_path != proc_path:
+                stats_reader = brokkr.utils.procstats.ProcessStatsReader(
+                    proc_path=proc_path)
+                self._stats_readers[worker.name] = stats_reader
+            worker_stats = stats_reader.read(
+                stats=brokkr.utils.procstats.PROCESS_STATS)
+            self.worker_stats[worker.name] = worker_stats
+            for stat, value in worker_stats.items():
+                if value is not None:
+                    brokkr.utils.metrics.REGISTRY.set_gauge(
+                        worker.name, f"worker_{stat}", value)
+
+    def get_stats(self):
+        """Get the last read resource usage of each worker, by name."""
+        return {worker_name: dict(worker_stats)
+                for worker_name, worker_stats in self.worker_stats.items()}
+
+
+class ThreadWorker(threading.Thread):
+    """Thread running a worker in the main process, like a Process."""
+
+    def __init__(self, *args, ready_conn=None, **kwargs):
+        super().__init__(*args, daemon=True, **kwargs)
+        self.exitcode = None
+        self.ready_conn = ready_conn
+
+    def run(self):
+        try:
+            super().run()
+        except SystemExit as e:
+            self.exitcode = e.code if isinstance(e.code, int) else 1
+        except BaseException:
+            self.exitcode = 1
+            raise
+        else:
+            self.exitcode = 0
+        finally:
+            # Unlike a process, the pipe isn't closed by the thread exiting,
+            # so report failure if it exits before notifying it is ready
+            notify_ready(self.ready_conn, ready=False)
+
+    def terminate(self):
+        logging.getLogger(__name__).warning(
+            "Thread worker %s cannot be terminated; leaving it to exit "
+            "with the main process", self.name)
+
+    def kill(self):
+        self.terminate()
+
+    def close(self):
+        pass
 
 
 # --- Core process handler class --- #
 
 class MultiprocessHandler(brokkr.utils.misc.AutoReprMixin):
+    # pylint: disable=too-many-instance-attributes
     def __init__(
             self,
             worker_configs=None,
+            start_method=None,
+            preload_modules=(),
+            worker_startup_wait_s=WORKER_STARTUP_WAIT_S,
             worker_shutdown_wait_s=WORKER_SHUTDOWN_WAIT_S,
             log_config=None,
+            log_transport_config=None,
             logging_startup_wait_s=LOGGING_STARTUP_WAIT_S,
             logging_shutdown_wait_s=LOGGING_SHUTDOWN_WAIT_S,
             exit_event=None,
             before_startup=None,
             on_startup=None,
             after_shutdown=None,
+            metrics_config=None,
+            restart_config=None,
                 ):
         if worker_configs is None:
             worker_configs = []
         self.worker_configs = worker_configs
+        self.preload_modules = list(preload_modules)
+        self.start_method = self.setup_start_method(start_method)
+        self._preloaded = False
+        self.worker_startup_wait_s = worker_startup_wait_s
         self.worker_shutdown_wait_s = worker_shutdown_wait_s
         self.workers = None
 
         self.log_config = {} if log_config is None else log_config
         self.log_filter_level = log_config.get("root", {}).get("level", None)
+        self.log_transport_config = (
+            {} if log_transport_config is None else log_transport_config)
         self.log_process = None
         self.log_queue = None
         self.logging_startup_wait_s = logging_startup_wait_s
@@ -142,6 +509,71 @@ def __init__(
         self.on_startup = on_startup
         self.after_shutdown = after_shutdown
 
+        self.metrics_config = {} if metrics_config is None else metrics_config
+        self.metrics_server = None
+
+        self.supervisor = WorkerSupervisor(restart_config=restart_config)
+        self.stats_monitor = WorkerStatsMonitor(
+            interval_s=self.metrics_config.get(
+                "worker_stats_interval_s", WORKER_STATS_INTERVAL_S_DEFAULT))
+
+    def setup_start_method(self, start_method=None):
+        """
+        Set the method used to start processes, and what to preload.
+
+        This must be done before any multiprocessing objects (events,
+        queues, etc.) are created, as they can only be shared with
+        processes started with the same method.
+
+        Parameters
+        ----------
+        start_method : str, optional
+            The multiprocessing start method, e.g. ``forkserver`` to
+            start workers from a server process with the preload modules
+            imported. By default, the platform's default.
+
+        Returns
+        -------
+        start_method : str
+            The start method actually in use.
+
+        """
+        # Don't log here, as loggers created before the log process starts
+        # would be disabled in it; errors are logged once it has started
+        self.start_method_error = None
+        if start_method:
+            try:
+                multiprocessing.set_start_method(start_method, force=True)
+            except ValueError as e:
+                self.start_method_error = e
+        start_method = multiprocessing.get_start_method()
+        if start_method == "forkserver" and self.preload_modules:
+            multiprocessing.set_forkserver_preload(self.preload_modules)
+        return start_method
+
+    def preload_worker_modules(self):
+        """Import the preload modules before forking, to share the pages."""
+        if (self._preloaded or self.start_method != "fork"
+                or not self.preload_modules):
+            return
+        preload_start_time = time.monotonic()
+        n_preloaded = 0
+        for module_path in self.preload_modules:
+            try:
+                importlib.import_module(module_path)
+            except Exception as e:
+                self.logger.debug(
+                    "%s preloading module %s, leaving it to workers: %s",
+                    type(e).__name__, module_path, e)
+            else:
+                n_preloaded += 1
+        # Also import the drivers the preloaded modules defer importing
+        brokkr.utils.misc.load_lazy_modules(logger=self.logger)
+        self._preloaded = True
+        self.logger.info(
+            "Preloaded %s of %s modules in %s ms", n_preloaded,
+            len(self.preload_modules), get_elapsed_ms(preload_start_time))
+
     def start_logger(self, ignore_started=False):
         # If logging already started, don't start another
         if self.logger is not None or self.log_process is not None:
@@ -153,7 +585,9 @@ def start_logger(self, ignore_started=False):
             raise RuntimeError("Logging is already started")
 
         # Setup logging process
+        startup_start_time = time.monotonic()
         self.log_queue = multiprocessing.Queue()
+        log_ready_event = multiprocessing.Event()
         self.log_process = multiprocessing.Process(
             target=brokkr.multiprocess.loglistener.run_log_listener,
             name="LogProcess",
@@ -163,18 +597,96 @@ def start_logger(self, ignore_started=False):
                     brokkr.multiprocess.loglistener.setup_listener_logger,
                 "configurator_kwargs": {"log_config": self.log_config},
                 "exit_event": self.exit_event,
+                "ready_event": log_ready_event,
                 },
             )
 
-        # Start logging process
+        # Start logging process and wait until it is ready
         self.log_process.start()
-        time.sleep(self.logging_startup_wait_s)  # Ensure logger is ready
+        log_ready = log_ready_event.wait(self.logging_startup_wait_s)
 
         # Setup logging for main thread
         brokkr.multiprocess.loglistener.setup_worker_logger(
-            self.log_queue, filter_level=self.log_filter_level)
+            self.log_queue, filter_level=self.log_filter_level,
+            **self.log_transport_config)
         self.logger = logging.getLogger(__name__)
         self.logger.info("Set up logging for main thread")
+        if self.start_method_error is not None:
+            self.logger.warning(
+                "%s setting start method, falling back to %s: %s",
+                type(self.start_method_error).__name__, self.start_method,
+                self.start_method_error)
+        self.logger.debug("Starting workers with the %s method%s",
+                          self.start_method,
+                          " and preloading modules" if self.preload_modules
+                          else "")
+        if log_ready:
+            self.logger.info("Logging process ready in %s ms",
+                             get_elapsed_ms(startup_start_time))
+        else:
+            self.logger.warning(
+                "Logging process not ready after %s s, continuing anyway",
+                self.logging_startup_wait_s)
+
+    def start_metrics_server(self):
+        if (not self.metrics_config.get("enabled", False)
+                or self.metrics_server is not None):
+            return
+        metrics_server_kwargs = {
+            key: value for key, value in self.metrics_config.items()
+            if key in {"host", "port"}}
+        self.metrics_server = brokkr.multiprocess.metricsserver.MetricsServer(
+            **metrics_server_kwargs)
+        try:
+            self.metrics_server.start()
+        except Exception as e:
+            self.logger.error("%s starting metrics server on port %s: %s",
+                              type(e).__name__, self.metrics_server.port, e)
+            self.logger.info("Error details:", exc_info=True)
+            self.metrics_server = None
+
+    def shutdown_metrics_server(self):
+        if self.metrics_server is not None:
+            self.logger.info("Shutting down metrics server")
+            self.metrics_server.shutdown()
+            self.metrics_server = None
+
+    def create_worker(self, worker_config, ready_conn=None):
+        worker_kwargs = {
+            "worker_config": worker_config,
+            "exit_event": self.exit_event,
+            "on_startup": self.on_startup,
+            "exit_on_build_error": not self.supervisor.enabled,
+            "ready_conn": ready_conn,
+            }
+
+        # Thread workers share the main process' logging and metrics
+        if worker_config.mode == "thread":
+            return ThreadWorker(
+                target=start_worker_process,
+                name=worker_config.name,
+                kwargs=worker_kwargs,
+                ready_conn=ready_conn,
+                )
+
+        worker_kwargs.update({
+            "log_configurator":
+                brokkr.multiprocess.loglistener.setup_worker_logger,
+            "configurator_kwargs": {
+                "log_queue": self.log_queue,
+                "filter_level": self.log_filter_level,
+                **self.log_transport_config,
+                },
+            "metrics_queue": getattr(
+                self.metrics_server, "metrics_queue", None),
+            "metrics_interval_s": self.metrics_config.get(
+                "push_interval_s", METRICS_PUSH_INTERVAL_S_DEFAULT),
+            })
+        return multiprocessing.Process(
+            target=start_worker_process,
+            name=worker_config.name,
+            kwargs=worker_kwargs,
+            )
 
     def start_workers(self, ignore_started=False):
         # Check for processes already started
@@ -191,38 +703,101 @@ def start_workers(self, ignore_started=False):
                 "Running before startup callback %r", self.before_startup)
             self.before_startup()
 
-        # Setup processes
+        self.preload_worker_modules()
+
+        # Start processes, letting them all build in parallel. Create each
+        # pipe just before starting its worker, so no other process
+        # inherits its writer and its EOF signals the worker died.
+        startup_start_time = time.monotonic()
         self.workers = []
+        self.supervisor.reset(n_workers=len(self.worker_configs))
+        ready_conns = {}
         for worker_config in self.worker_configs:
-            worker = multiprocessing.Process(
-                target=start_worker_process,
-                name=worker_config.name,
-                kwargs={
-                    "worker_config": worker_config,
-                    "log_configurator":
-                        brokkr.multiprocess.loglistener.setup_worker_logger,
-                    "configurator_kwargs": {
-                        "log_queue": self.log_queue,
-                        "filter_level": self.log_filter_level,
-                        },
-                    "exit_event": self.exit_event,
-                    "on_startup": self.on_startup,
-                    },
-                )
-            self.workers.append(worker)
-
-        # Start processes
-        self.logger.debug("Starting up processes: %r", self.workers)
-        for worker in self.workers:
+            ready_reader, ready_writer = multiprocessing.Pipe(duplex=False)
+            worker = self.create_worker(worker_config, ready_conn=ready_writer)
             self.logger.info("Starting worker process %s", worker)
             worker.start()
+            if not isinstance(worker, ThreadWorker):
+                ready_writer.close()
             self.logger.info("Finished starting worker process %s", worker)
+            self.workers.append(worker)
+            ready_conns[ready_reader] = worker
+        self.wait_workers_ready(
+            ready_conns, startup_start_time=startup_start_time)
+
+    def wait_workers_ready(self, ready_conns, startup_start_time):
+        """Wait until each worker reports it has been built, or failed."""
+        deadline = startup_start_time + self.worker_startup_wait_s
+        n_ready = 0
+        while ready_conns:
+            timeout_s = deadline - time.monotonic()
+            if timeout_s <= 0:
+                for worker in ready_conns.values():
+                    self.logger.warning(
+                        "Worker %s not ready after %s s, continuing anyway",
+                        worker, self.worker_startup_wait_s)
+                break
+            for ready_reader in multiprocessing.connection.wait(
+                    list(ready_conns), timeout=timeout_s):
+                worker = ready_conns.pop(ready_reader)
+                try:
+                    ready = ready_reader.recv()
+                except EOFError:  # The process exited without notifying
+                    ready = False
+                ready_reader.close()
+                if ready:
+                    n_ready += 1
+                    self.logger.info(
+                        "Worker %s ready in %s ms",
+                        worker, get_elapsed_ms(startup_start_time))
+                else:
+                    self.logger.error(
+                        "Worker %s failed during startup after %s ms",
+                        worker, get_elapsed_ms(startup_start_time))
+        for ready_reader in ready_conns:
+            ready_reader.close()
+        self.logger.info(
+            "%s of %s workers ready in %s ms", n_ready, len(self.workers),
+            get_elapsed_ms(startup_start_time))
 
     def start(self, ignore_started=False):
         self.start_logger(ignore_started=ignore_started)
+        self.start_metrics_server()
         self.start_workers(ignore_started=ignore_started)
 
-    def manage(self):  # pylint: disable=no-self-use
+    def restart_worker(self, idx):
+        worker_config = self.worker_configs[idx]
+        try:
+            self.workers[idx].close()
+        except (AttributeError, ValueError):
+            pass  # Threads and Python <3.7 have no close; dead already
+
+        self.supervisor.run_before_restart(worker_config)
+        worker = self.create_worker(worker_config)
+        self.logger.info("Restarting worker %s", worker)
+        worker.start()
+        self.workers[idx] = worker
+        self.supervisor.record_restart(idx, worker_config.name)
+
+    def supervise_workers(self):
+        """Restart failed workers with exponential backoff."""
+        current_time = time.monotonic()
+        for idx, worker in enumerate(self.workers):
+            if self.supervisor.check_worker(idx, worker, current_time):
+                self.restart_worker(idx)
+
+    def get_worker_stats(self):
+        """Get the last read resource usage of each worker, by name."""
+        return self.stats_monitor.get_stats()
+
+    def manage(self):
+        if self.supervisor.enabled and not self.exit_event.is_set():
+            self.supervise_workers()
+        self.stats_monitor.update_if_due(self.workers)
+        if self.metrics_server is not None:
+            for worker in self.workers:
+                brokkr.utils.metrics.REGISTRY.set_gauge(
+                    worker.name, "worker_up", int(worker.is_alive()))
         time.sleep(SLEEP_TICK_S)
 
     def manage_loop(self):
@@ -232,18 +807,55 @@ def manage_loop(self):
                 self.manage, exit_event=self.exit_event, logger=self.logger)()
         self.logger.info("Exiting manager")
 
+    def join_workers(self, shutdown_start_time):
+        """Join workers concurrently as they end, up to the timeout."""
+        shutdown_wait_time = shutdown_start_time + self.worker_shutdown_wait_s
+        pending_workers = list(self.workers)
+        while pending_workers:
+            for worker in list(pending_workers):
+                if not worker.is_alive():
+                    worker.join()
+                    pending_workers.remove(worker)
+                    self.logger.info(
+                        "Process %s shut down in %s ms",
+                        worker, get_elapsed_ms(shutdown_start_time))
+            timeout_s = shutdown_wait_time - time.monotonic()
+            if not pending_workers or timeout_s <= 0:
+                break
+            sentinels = [worker.sentinel for worker in pending_workers
+                         if not isinstance(worker, ThreadWorker)]
+            if len(sentinels) < len(pending_workers):
+                timeout_s = min(timeout_s, THREAD_POLL_INTERVAL_S)
+            if sentinels:
+                multiprocessing.connection.wait(sentinels, timeout=timeout_s)
+            else:
+                time.sleep(timeout_s)
+
+    def close_worker(self, worker):
+        """Close a shut down worker, killing it if it is still open."""
+        try:
+            worker.close()
+        except AttributeError:
+            self.logger.debug("Could not call close on worker %s; "
+                              "presumably running on Python <3.7", worker)
+        except ValueError:
+            self.logger.error("Worker %s still open after shutdown, "
+                              "sending kill signal", worker)
+            self.logger.info("Process info %r", worker)
+            worker.kill()
+            try:
+                worker.close()
+            except ValueError:
+                self.logger.error("Worker %s still not dead after kill",
+                                  worker)
+            else:
+                self.logger.info("Worker %s killed", worker)
+
     def shutdown_workers(self):
         self.logger.info("Beginning worker shutdown")
         shutdown_start_time = time.monotonic()
         self.exit_event.set()
-
-        # Join workers gracefully as they end, up to the timeout
-        shutdown_wait_time = shutdown_start_time + self.worker_shutdown_wait_s
-        for worker in self.workers:
-            self.logger.info("Attempting to shut down worker %s", worker)
-            join_timeout = max(0, shutdown_wait_time - time.monotonic())
-            worker.join(join_timeout)
-            self.logger.info("Process %s shut down", worker)
+        self.join_workers(shutdown_start_time)
 
         # Check worker status and forcefully terminate any remaining
         n_terminated = 0
@@ -262,23 +874,7 @@ def shutdown_workers(self):
                 self.logger.info("Process info %r", worker)
                 n_failed += 1
             self.logger.debug("Worker %s shut down successfully", worker)
-            try:
-                worker.close()
-            except AttributeError:
-                self.logger.debug("Could not call close on worker %s; "
-                                  "presumably running on Python <3.7", worker)
-            except ValueError:
-                self.logger.error("Worker %s still open after shutdown, "
-                                  "sending kill signal", worker)
-                self.logger.info("Process info %r", worker)
-                worker.kill()
-                try:
-                    worker.close()
-                except ValueError:
-                    self.logger.error("Worker %s still not dead after kill",
-                                      worker)
-                else:
-                    self.logger.info("Worker %s killed", worker)
+            self.close_worker(worker)
 
         # Run after shutdown callback
         if self.after_shutdown is not None:
@@ -328,6 +924,7 @@ def shutdown_logger(self):
 
     def shutdown(self):
         self.shutdown_workers()
+        self.shutdown_metrics_server()
         self.shutdown_logger()
 
     def run(self):
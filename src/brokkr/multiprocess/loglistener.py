@@ -3,31 +3,193 @@
 """
 
 # Standard library imports
+import copy
 import logging
 import logging.config
 import logging.handlers
 import multiprocessing
+import multiprocessing.util
+import os
 import queue
+import threading
 import time
 import unittest.mock
 
 # Local imports
 from brokkr.constants import SLEEP_TICK_S
+import brokkr.utils.binarylog
 import brokkr.utils.misc
 
 
 # Value to use to shut down the logging system
 LogShutdownSentinel = unittest.mock.sentinel.LogShutdownSentinel
 
+# Batching and rate limiting of records sent to the log listener
+BATCH_SIZE_DEFAULT = 64
+FLUSH_INTERVAL_S_DEFAULT = 0.5
+RATE_LIMIT_PER_S_DEFAULT = 10
+RATE_LIMIT_BURST_DEFAULT = 50
+
+# Max records to handle per call of the listener before checking to exit
+DRAIN_MAX_RECORDS = 1024
+
+
+# --- Logging helper classes --- #
+
+class BatchingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(
+            self,
+            queue,  # pylint: disable=redefined-outer-name
+            batch_size=BATCH_SIZE_DEFAULT,
+            flush_interval_s=FLUSH_INTERVAL_S_DEFAULT,
+            flush_level=logging.CRITICAL,
+                ):
+        """
+        Queue handler that sends records to the listener in batches.
+
+        Records are sent as a list once ``batch_size`` are buffered, every
+        ``flush_interval_s`` by a background thread, on a record at or
+        above ``flush_level``, and when the process exits.
+
+        """
+        super().__init__(queue)
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.flush_level = flush_level
+        self._buffer = []
+        self._flusher_pid = None
+        self._close_event = threading.Event()
+        # Worker processes exit without running atexit handlers, so flush
+        # via a finalizer run before that closing the queue (priority 10)
+        multiprocessing.util.Finalize(self, self.flush, exitpriority=20)
+
+    def _run_flusher(self):
+        while not self._close_event.wait(self.flush_interval_s):
+            self.flush()
+
+    def _start_flusher(self):
+        # Threads don't survive a fork, so start one per process
+        if self._flusher_pid != os.getpid():
+            self._flusher_pid = os.getpid()
+            threading.Thread(target=self._run_flusher, daemon=True,
+                             name="LogFlusherThread").start()
+
+    def prepare(self, record):
+        # Also keep the template, args and traceback for structured sinks
+        message = self.format(record)
+        prepared_record = copy.copy(record)
+        prepared_record.template = str(record.msg)
+        prepared_record.template_args = brokkr.utils.binarylog.simplify_args(
+            record.args)
+        prepared_record.traceback_text = record.exc_text
+        prepared_record.message = message
+        prepared_record.msg = message
+        prepared_record.args = None
+        prepared_record.exc_info = None
+        prepared_record.exc_text = None
+        prepared_record.stack_info = None
+        return prepared_record
+
+    def emit(self, record):
+        # Once closed, e.g. by logging.shutdown(), send records unbatched
+        if self._close_event.is_set():
+            super().emit(record)
+            return
+        try:
+            prepared_record = self.prepare(record)
+            with self.lock:
+                self._buffer.append(prepared_record)
+                flush = (len(self._buffer) >= self.batch_size
+                         or record.levelno >= self.flush_level)
+            if flush:
+                self.flush()
+            else:
+                self._start_flusher()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        with self.lock:
+            log_records, self._buffer = self._buffer, []
+        if log_records:
+            try:
+                self.enqueue(log_records)
+            except Exception:
+                self.handleError(log_records[-1])
+
+    def close(self):
+        self.flush()
+        self._close_event.set()
+        super().close()
+
+
+class RateLimitFilter(logging.Filter):
+    def __init__(
+            self,
+            rate_per_s=RATE_LIMIT_PER_S_DEFAULT,
+            burst=RATE_LIMIT_BURST_DEFAULT,
+            exempt_level=logging.CRITICAL,
+                ):
+        """
+        Limit the records logged per logger with a token bucket.
+
+        Each logger can log ``burst`` records at once, refilled at
+        ``rate_per_s``. Suppressed records are counted and summarized in
+        the next record from that logger that is let through.
+
+        """
+        super().__init__()
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self.exempt_level = exempt_level
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= self.exempt_level:
+            return True
+        current_time = time.monotonic()
+        with self._lock:
+            tokens, last_time, n_suppressed = self._buckets.get(
+                record.name, (self.burst, current_time, 0))
+            tokens = min(self.burst,
+                         tokens + (current_time - last_time) * self.rate_per_s)
+            if tokens < 1:
+                self._buckets[record.name] = (
+                    tokens, current_time, n_suppressed + 1)
+                return False
+            self._buckets[record.name] = (tokens - 1, current_time, 0)
+        if n_suppressed:
+            record.msg = (f"{record.getMessage()} ({n_suppressed} similar "
+                          f"messages from {record.name} suppressed)")
+            record.args = None
+        return True
+
 
 # --- Logging setup functions --- #
 
-def setup_worker_logger(log_queue, filter_level=None):
+def setup_worker_logger(
+        log_queue,
+        filter_level=None,
+        batch_size=BATCH_SIZE_DEFAULT,
+        flush_interval_s=FLUSH_INTERVAL_S_DEFAULT,
+        rate_limit_per_s=RATE_LIMIT_PER_S_DEFAULT,
+        rate_limit_burst=RATE_LIMIT_BURST_DEFAULT,
+        ):
     if filter_level is None:
         filter_level = logging.DEBUG
     root_logger = logging.getLogger()
     root_logger.handlers = []
-    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    if batch_size and batch_size > 1:
+        queue_handler = BatchingQueueHandler(
+            log_queue, batch_size=batch_size,
+            flush_interval_s=flush_interval_s)
+    else:
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+    if rate_limit_per_s:
+        queue_handler.addFilter(RateLimitFilter(
+            rate_per_s=rate_limit_per_s, burst=rate_limit_burst))
+    root_logger.addHandler(queue_handler)
     root_logger.setLevel(filter_level)
 
 
@@ -48,10 +210,12 @@ def shutdown_log_listener(log_queue):
     try:
         while True:
             try:
-                log_record = log_queue.get(block=False)
-                logger.warning(
-                    "Record found in log queue past shutdown: %r",
-                    log_record)
+                queue_item = log_queue.get(block=False)
+                for log_record in (queue_item if isinstance(queue_item, list)
+                                   else [queue_item]):
+                    logger.warning(
+                        "Record found in log queue past shutdown: %r",
+                        log_record)
             except queue.Empty:
                 break  # Break once queue is empty
     except Exception as e:  # Log and pass errors flushing the logging queue
@@ -63,19 +227,46 @@ def shutdown_log_listener(log_queue):
     logging.shutdown()
 
 
-def handle_queued_log_record(log_queue, outer_exit_event=None):
+def handle_log_record(log_record):
     logger = logging.getLogger(__name__)
-    log_record = None
+    try:
+        record_logger = logging.getLogger(log_record.name)
+        record_logger.handle(log_record)
+    except Exception as e:  # If an error occurs logging, log and move on
+        logger.warning("%s logging record %s: %s",
+                       type(e).__name__, log_record, e)
+        logger.info("Error details:", exc_info=True)
+        logger.info("Log record details: %r", log_record)
+
 
+def get_queued_log_records(log_queue):
+    """Wait for records on the queue, and drain those already waiting."""
+    logger = logging.getLogger(__name__)
+    queue_items = []
     try:
-        log_record = log_queue.get(block=True, timeout=SLEEP_TICK_S)
+        queue_items.append(log_queue.get(block=True, timeout=SLEEP_TICK_S))
+        while len(queue_items) < DRAIN_MAX_RECORDS:
+            queue_items.append(log_queue.get(block=False))
     except (queue.Empty, InterruptedError):
         pass  # If the queue is empty or interrupted, just try again
     except Exception as e:  # If an error occurs, log and move on
         logger.error("%s getting from queue %s: %s",
                      type(e).__name__, log_queue, e)
         logger.info("Error details:", exc_info=True)
-    else:
+
+    # Unpack batches sent by a BatchingQueueHandler
+    log_records = []
+    for queue_item in queue_items:
+        if isinstance(queue_item, list):
+            log_records += queue_item
+        else:
+            log_records.append(queue_item)
+    return log_records
+
+
+def handle_queued_log_record(log_queue, outer_exit_event=None):
+    log_record = None
+    for log_record in get_queued_log_records(log_queue):
         if log_record is LogShutdownSentinel:
             if outer_exit_event is not None:
                 outer_exit_event.set()
@@ -86,26 +277,20 @@ def handle_queued_log_record(log_queue, outer_exit_event=None):
                 raise StopIteration
             return None
 
-        try:
-            record_logger = logging.getLogger(log_record.name)
-            record_logger.handle(log_record)
-        except Exception as e:  # If an error occurs logging, log and move on
-            logger.warning("%s logging record %s: %s",
-                           type(e).__name__, log_record, e)
-            logger.info("Error details:", exc_info=True)
-            logger.info("Log record details: %r", log_record)
-        return log_record
+        handle_log_record(log_record)
 
     return log_record
 
 
-def run_log_listener(log_queue, log_configurator,
-                     configurator_kwargs=None, exit_event=None):
+def run_log_listener(log_queue, log_configurator, configurator_kwargs=None,
+                     exit_event=None, ready_event=None):
     if configurator_kwargs is None:
         configurator_kwargs = {}
     log_configurator(**configurator_kwargs)
     logger = logging.getLogger(__name__)
     logger.info("Starting logging system")
+    if ready_event is not None:
+        ready_event.set()
     outer_exit_event = multiprocessing.Event()
 
     brokkr.utils.misc.run_periodic(
@@ -0,0 +1,133 @@
+"""
+Local HTTP server exposing metrics gathered from all worker processes.
+"""
+
+# Standard library imports
+import http.server
+import logging
+import multiprocessing
+import queue
+import threading
+
+# Local imports
+from brokkr.constants import SLEEP_TICK_S
+import brokkr.utils.metrics
+import brokkr.utils.misc
+
+
+METRICS_HOST_DEFAULT = "127.0.0.1"
+METRICS_PORT_DEFAULT = 9108
+METRICS_PATH = "/metrics"
+METRICS_QUEUE_SIZE = 256
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+MAIN_SOURCE_NAME = "main"
+
+try:
+    HTTPServer = http.server.ThreadingHTTPServer
+except AttributeError:  # Not present on Python <= 3.6
+    HTTPServer = http.server.HTTPServer
+
+LOGGER = logging.getLogger(__name__)
+
+
+class MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):  # pylint: disable=invalid-name
+        if self.path.split("?")[0] != METRICS_PATH:
+            self.send_error(404)
+            return
+        metrics_text = self.server.metrics_server.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", METRICS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(metrics_text)))
+        self.end_headers()
+        self.wfile.write(metrics_text)
+
+    def log_message(self, format, *args):
+        LOGGER.debug("Metrics request from %s: " + format,
+                     self.address_string(), *args)
+
+
+class MetricsServer(brokkr.utils.misc.AutoReprMixin):
+    def __init__(
+            self,
+            host=METRICS_HOST_DEFAULT,
+            port=METRICS_PORT_DEFAULT,
+            queue_size=METRICS_QUEUE_SIZE,
+                ):
+        """
+        Collect metric snapshots from workers and serve them over HTTP.
+
+        Workers push snapshots on ``metrics_queue`` (see
+        ``brokkr.utils.metrics.MetricsPusher``), which a collector thread
+        keeps the latest of for each. They are served in the Prometheus
+        text format at ``/metrics``, along with the main process' metrics.
+
+        Parameters
+        ----------
+        host : str, optional
+            Host to listen on. The default is localhost only.
+        port : int, optional
+            Port to listen on. The default is 9108.
+        queue_size : int, optional
+            Max number of snapshots waiting to be collected.
+
+        """
+        self.host = host
+        self.port = port
+        self.metrics_queue = multiprocessing.Queue(maxsize=queue_size)
+        self.snapshots = {}
+        self._http_server = None
+        self._threads = []
+        self._stop_event = threading.Event()
+
+    def collect(self, timeout_s=None):
+        """Collect snapshots from the queue, waiting up to the timeout."""
+        try:
+            source, snapshot = self.metrics_queue.get(timeout=timeout_s)
+        except queue.Empty:
+            return
+        self.snapshots[source] = snapshot
+
+    def _run_collector(self):
+        while not self._stop_event.is_set():
+            try:
+                self.collect(timeout_s=SLEEP_TICK_S)
+            except Exception as e:
+                LOGGER.error("%s collecting metrics: %s", type(e).__name__, e)
+                LOGGER.info("Error details:", exc_info=True)
+
+    def render(self):
+        snapshots = {
+            **self.snapshots,
+            MAIN_SOURCE_NAME: brokkr.utils.metrics.REGISTRY.snapshot(),
+            }
+        return brokkr.utils.metrics.render_prometheus(snapshots)
+
+    def start(self):
+        self._http_server = HTTPServer(
+            (self.host, self.port), MetricsRequestHandler)
+        self._http_server.metrics_server = self
+        self._threads = [
+            threading.Thread(target=self._run_collector,
+                             name="MetricsCollector", daemon=True),
+            threading.Thread(target=self._http_server.serve_forever,
+                             name="MetricsServer", daemon=True),
+            ]
+        for thread in self._threads:
+            thread.start()
+        LOGGER.info("Serving metrics at http://%s:%s%s",
+                    self.host, self._http_server.server_address[1],
+                    METRICS_PATH)
+
+    def shutdown(self):
+        self._stop_event.set()
+        if self._http_server is not None:
+            self._http_server.shutdown()
+            self._http_server.server_close()
+            self._http_server = None
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.metrics_queue.close()
+        self.metrics_queue.cancel_join_thread()
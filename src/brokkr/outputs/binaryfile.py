@@ -2,6 +2,9 @@
 Data output to a binary file.
 """
 
+# Standard library imports
+import struct
+
 # Local imports
 import brokkr.pipeline.baseoutput
 import brokkr.pipeline.utils
@@ -20,15 +23,26 @@ def __init__(
 
     def write_file(self, input_data, output_file_path):
         self.logger.debug("Writing output as binary")
-        data_values = brokkr.pipeline.utils.get_data_values(input_data)
+        data_objects = brokkr.pipeline.utils.get_data_objects(input_data)
 
-        # Convert str-like to bytes if needed
+        # Convert str-like to bytes and pack numbers by binary type if needed
         output_data = []
-        for data_value in data_values:
-            try:
-                output_item = data_value.encode(self._str_encoding)
-            except AttributeError:
+        for data_object in data_objects:
+            data_value = getattr(data_object, "value", data_object)
+            if isinstance(data_value, (bytes, bytearray)):
                 output_item = data_value
+            elif isinstance(data_value, str):
+                output_item = data_value.encode(self._str_encoding)
+            else:
+                binary_type = getattr(
+                    getattr(data_object, "data_type", None),
+                    "binary_type", None)
+                if not binary_type:
+                    raise TypeError(
+                        f"Value {data_value!r} of type "
+                        f"{type(data_value).__name__} must be bytes, str "
+                        f"or have a data type with a binary_type to pack")
+                output_item = struct.pack("!" + binary_type, data_value)
             output_data.append(output_item)
 
         with open(output_file_path, mode="ab") as output_file:
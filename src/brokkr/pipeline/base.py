@@ -4,12 +4,15 @@
 
 # Standard library imports
 import abc
+import asyncio
+import functools
 import logging
 import time
 
 # Local imports
 import brokkr.pipeline.utils
 import brokkr.utils.log
+import brokkr.utils.metrics
 import brokkr.utils.misc
 
 
@@ -23,11 +26,17 @@ def __init__(
             input_data=None,
             exit_event=None,
             skip_na=False,
+            period_ticks=1,
+            carry_forward=True,
                 ):
+        super().__init__()
         self.name = name
         self.input_data = input_data
         self.exit_event = exit_event
         self.skip_na = skip_na
+        self.period_ticks = max(int(period_ticks), 1)
+        self.carry_forward = carry_forward
+        self._metrics_owner = None
 
         self.logger = logging.getLogger(
             brokkr.utils.misc.get_full_class_name(self))
@@ -37,6 +46,17 @@ def __init__(
     def execute(self, input_data=None):
         pass
 
+    @property
+    def metrics_owner(self):
+        """Name this object's metrics are recorded under, unique to it."""
+        if self._metrics_owner is None:
+            self._metrics_owner = brokkr.utils.metrics.REGISTRY.claim_owner(
+                self.name, self)
+        return self._metrics_owner
+
+    def close(self):
+        """Release any resources held, once execution is finished."""
+
     def execute_(self, input_data=None):
         if input_data is None:
             input_data = self.input_data
@@ -48,32 +68,161 @@ def execute_(self, input_data=None):
         output_data = self.execute(input_data=input_data)
         return output_data
 
+    async def execute_async(self, input_data=None):
+        """Execute in the event loop's executor; override to run natively."""
+        loop = asyncio.get_event_loop()
+        output_data = await loop.run_in_executor(
+            None, functools.partial(self.execute, input_data=input_data))
+        return output_data
+
+    async def execute_async_(self, input_data=None):
+        if input_data is None:
+            input_data = self.input_data
+
+        if self.skip_na and brokkr.pipeline.utils.is_all_na(input_data):
+            self.logger.debug("Input data is None/NA, skipping output")
+            return input_data
+
+        output_data = await self.execute_async(input_data=input_data)
+        return output_data
+
 
 # --- Common mixin classes --- #
 
 class SequentialMixin:
-    def execute_step(self, idx, step, input_data=None):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tick_count = -1
+        self._last_contributions = {}
+
+    def start_tick(self):
+        """Advance the count of ticks this sequence of steps has run."""
+        self.tick_count += 1
+
+    def is_step_due(self, step, tick_count=None):
+        """Check if a step runs on a tick, by default the current one."""
+        if tick_count is None:
+            tick_count = self.tick_count
+        return not tick_count % getattr(step, "period_ticks", 1)
+
+    @staticmethod
+    def get_step_contribution(step, input_data, output_data):
+        """Get the data values a step added to its input data."""
+        if not isinstance(output_data, dict):
+            return None
+        decoder = getattr(step, "decoder", None)
+        if decoder is not None:
+            data_names = {data_type.name for data_type in decoder.data_types}
+            return {key: value for key, value in output_data.items()
+                    if key in data_names}
+        if isinstance(input_data, dict):
+            return {key: value for key, value in output_data.items()
+                    if key not in input_data}
+        return output_data
+
+    def fill_skipped_step(self, idx, step, input_data=None):
+        """Fill in the data of a step that isn't due this tick."""
+        if step.carry_forward:
+            contribution = self._last_contributions.get(idx, None)
+        elif getattr(step, "decoder", None) is not None:
+            contribution = step.decoder.output_na_values()
+        else:
+            contribution = None
+        self.logger.debug(
+            "Step %s - %s not due on tick %s, %s",
+            idx + 1, getattr(step, "name", None), self.tick_count,
+            "carrying forward last values" if step.carry_forward
+            else "filling NA values")
+        if not contribution:
+            return input_data
+        if isinstance(input_data, dict):
+            return {**input_data, **contribution}
+        return contribution
+
+    def record_step_output(self, idx, step, input_data, output_data):
+        """Record what a step contributed, to carry forward if not due."""
+        self._last_contributions[idx] = self.get_step_contribution(
+            step, input_data, output_data)
+
+    def run_step_if_due(self, idx, step, input_data=None):
+        """
+        Execute a step if it is due this tick, otherwise fill in its data.
+
+        Steps that run every ``period_ticks`` ticks contribute their last
+        values when not due if ``carry_forward`` is set, or otherwise
+        NA values if they are input steps.
+
+        """
+        if getattr(step, "period_ticks", 1) == 1:
+            return self.execute_step(idx, step, input_data=input_data)
+        if not self.is_step_due(step):
+            return self.fill_skipped_step(idx, step, input_data=input_data)
+        output_data = self.execute_step(idx, step, input_data=input_data)
+        self.record_step_output(idx, step, input_data, output_data)
+        return output_data
+
+    async def run_step_if_due_async(self, idx, step, input_data=None):
+        """Asynchronously execute a step if it is due this tick."""
+        if getattr(step, "period_ticks", 1) == 1:
+            return await self.execute_step_async(
+                idx, step, input_data=input_data)
+        if not self.is_step_due(step):
+            return self.fill_skipped_step(idx, step, input_data=input_data)
+        output_data = await self.execute_step_async(
+            idx, step, input_data=input_data)
+        self.record_step_output(idx, step, input_data, output_data)
+        return output_data
+
+    def _start_step(self, idx, step):
         self.logger.debug(
             "Executing step %s of %s - %s (%s) in %s (%s)",
             idx + 1, len(self.steps), getattr(step, "name", None),
             brokkr.utils.misc.get_full_class_name(step),
             self.name, brokkr.utils.misc.get_full_class_name(self))
+        return brokkr.utils.metrics.REGISTRY.get_histogram(
+            self.metrics_owner,
+            f"step_{idx + 1}_{getattr(step, 'name', None)}")
+
+    def _log_step_error(self, idx, step, e):
+        self.logger.critical(
+            "%s caught at main level on step %s of %s - %s (%s) in "
+            "%s (%s): %s",
+            type(e).__name__, idx + 1, len(self.steps),
+            getattr(step, "name", None),
+            brokkr.utils.misc.get_full_class_name(step),
+            self.name, brokkr.utils.misc.get_full_class_name(self), e)
+        self.logger.info("Error details:", exc_info=True)
+        self.logger.debug("Pausing execution for %s s", ERROR_TIMEOUT_S)
+
+    def execute_step(self, idx, step, input_data=None):
+        histogram = self._start_step(idx, step)
+        start_time_ns = brokkr.utils.misc.perf_counter_ns()
         try:
             output_data = step.execute_(input_data=input_data)
         except Exception as e:
-            self.logger.critical(
-                "%s caught at main level on step %s of %s - %s (%s) in "
-                "%s (%s): %s",
-                type(e).__name__, idx + 1, len(self.steps),
-                getattr(step, "name", None),
-                brokkr.utils.misc.get_full_class_name(step),
-                self.name, brokkr.utils.misc.get_full_class_name(self), e)
-            self.logger.info("Error details:", exc_info=True)
-            self.logger.debug("Pausing execution for %s s", ERROR_TIMEOUT_S)
+            histogram.record(
+                brokkr.utils.misc.perf_counter_ns() - start_time_ns,
+                error=True)
+            self._log_step_error(idx, step, e)
             time.sleep(ERROR_TIMEOUT_S)
             return None
-        else:
-            return output_data
+        histogram.record(brokkr.utils.misc.perf_counter_ns() - start_time_ns)
+        return output_data
+
+    async def execute_step_async(self, idx, step, input_data=None):
+        histogram = self._start_step(idx, step)
+        start_time_ns = brokkr.utils.misc.perf_counter_ns()
+        try:
+            output_data = await step.execute_async_(input_data=input_data)
+        except Exception as e:
+            histogram.record(
+                brokkr.utils.misc.perf_counter_ns() - start_time_ns,
+                error=True)
+            self._log_step_error(idx, step, e)
+            await asyncio.sleep(ERROR_TIMEOUT_S)
+            return None
+        histogram.record(brokkr.utils.misc.perf_counter_ns() - start_time_ns)
+        return output_data
 
 
 # --- Core PipelineStep classes --- #
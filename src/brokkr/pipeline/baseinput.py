@@ -4,6 +4,8 @@
 
 # Standard library imports
 import abc
+import asyncio
+import functools
 import importlib
 
 # Local imports
@@ -41,22 +43,11 @@ def __init__(
         if decode_kwargs is None:
             decode_kwargs = {}
 
-        self.data_types = []
-        for data_type in data_types:
-            try:
-                data_type.name
-            except AttributeError:  # If data_type isn't already an object
-                try:
-                    data_type["name"]
-                except TypeError:  # If data_types is a dict, not a list
-                    data_type_dict = data_types[data_type]
-                    data_type_dict["name"] = data_type
-                    data_type = data_type_dict
-
-                data_type = brokkr.pipeline.datavalue.DataType(
-                    **{**datatype_default_kwargs, **data_type})
-            data_type.name += name_suffix
-            self.data_types.append(data_type)
+        self.data_types = brokkr.pipeline.datavalue.build_data_types(
+            data_types,
+            datatype_default_kwargs=datatype_default_kwargs,
+            name_suffix=name_suffix,
+            )
 
         if binary_decoder:
             decoder_class = brokkr.pipeline.decode.BinaryDataDecoder
@@ -69,13 +60,20 @@ def __init__(
             na_marker=na_marker,
             include_all_data_each=include_all_data_each,
             passthrough_none=passthrough_none,
-            **decode_kwargs,
+            **{"name": self.name, **decode_kwargs},
             )
 
     @abc.abstractmethod
     def read_raw_data(self, input_data=None):
         pass
 
+    async def read_raw_data_async(self, input_data=None):
+        """Read the raw data in the event loop's executor by default."""
+        loop = asyncio.get_event_loop()
+        raw_data = await loop.run_in_executor(
+            None, functools.partial(self.read_raw_data, input_data=input_data))
+        return raw_data
+
     def decode_data(self, raw_data):
         # self.logger.debug("Created data decoder: %r", self.decoder)
         decoded_data = self.decoder.decode_data(raw_data)
@@ -89,6 +87,19 @@ def execute(self, input_data=None):
         if input_data:
             input_data = brokkr.utils.misc.safe_deepcopy(input_data)
         raw_data = self.read_raw_data(input_data=input_data)
+        return self.process_raw_data(raw_data, input_data=input_data)
+
+    async def execute_async(self, input_data=None):
+        if (not self.ignore_na_on_start
+                and input_data is brokkr.pipeline.utils.NASentinel):
+            return self.decode_data(raw_data=None)
+        if input_data:
+            input_data = brokkr.utils.misc.safe_deepcopy(input_data)
+        raw_data = await self.read_raw_data_async(input_data=input_data)
+        return self.process_raw_data(raw_data, input_data=input_data)
+
+    def process_raw_data(self, raw_data, input_data=None):
+        """Truncate and decode raw data and merge it with the input data."""
         if self.truncate_after:
             raw_data = raw_data[:self.truncate_after]
         output_data = self.decode_data(raw_data)
@@ -10,6 +10,7 @@
 
 # Local imports
 import brokkr.pipeline.base
+import brokkr.utils.metrics
 import brokkr.utils.output
 
 
@@ -83,10 +84,15 @@ def execute(self, input_data=None):
             input_data_values = input_data
 
         try:
+            size_before = (output_file_path.stat().st_size
+                           if output_file_path.exists() else 0)
             self.write_file(
                 input_data_values, output_file_path=output_file_path)
             self.logger.debug("Data successfully written to file at %r",
                               output_file_path.as_posix())
+            brokkr.utils.metrics.REGISTRY.increment(
+                self.name, "bytes_written",
+                max(output_file_path.stat().st_size - size_before, 0))
             return input_data
         except Exception as e:
             self.logger.error(
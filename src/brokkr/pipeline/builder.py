@@ -3,6 +3,7 @@
 """
 
 # Standard library imports
+import collections.abc
 import copy
 import importlib
 import importlib.util
@@ -10,6 +11,7 @@
 
 # Local imports
 import brokkr.pipeline.baseinput
+import brokkr.pipeline.utils
 import brokkr.utils.misc
 
 
@@ -22,6 +24,13 @@
 PLUGIN_SUBPACKAGE = "plugins"
 PLUGIN_SUFFIX_DEFAULT = ".py"
 
+# Queue module equivalents of multiprocessing queue classes
+THREAD_QUEUE_CLASSES = {
+    "Queue": "Queue",
+    "JoinableQueue": "Queue",
+    "SimpleQueue": "SimpleQueue",
+    }
+
 LOGGER = logging.getLogger(__name__)
 
 
@@ -45,6 +54,104 @@ def build_queues(input_dict, output_dict=None):
     return output_dict
 
 
+def find_module_paths(config):
+    """Find the modules of all non-plugin objects in a config dict."""
+    module_paths = set()
+    if isinstance(config, dict):
+        module_path = config.get("_module_path", None)
+        if isinstance(module_path, str) and not config.get(
+                "_is_plugin", False):
+            module_paths.add(module_path)
+        config = config.values()
+    if isinstance(config, (list, tuple, collections.abc.ValuesView)):
+        for value in config:
+            module_paths.update(find_module_paths(value))
+    return module_paths
+
+
+def get_queue_names(builder):
+    """Get the names of the queues used by a builder and its subbuilders."""
+    queue_names = set()
+    queue_name = getattr(builder, "queue_name", None)
+    if queue_name is not None:
+        queue_names.add(queue_name)
+    for subbuilder in builder.subbuilders:
+        queue_names.update(get_queue_names(subbuilder))
+    return queue_names
+
+
+def get_worker_queue_names(pipeline_builders):
+    """Get the names of the queues used by each top-level pipeline."""
+    worker_queue_names = []
+    for pipeline_builder in pipeline_builders:
+        # Top-level pipelines are otherwise only set up in their worker
+        if not pipeline_builder.subbuilders:
+            pipeline_builder.setup()
+        worker_queue_names.append(get_queue_names(pipeline_builder))
+    return worker_queue_names
+
+
+def get_exclusive_queue_names(pipeline_builder, pipeline_builders):
+    """Get the names of the queues only used by the given pipeline."""
+    queue_names = set()
+    other_queue_names = set()
+    for other_builder, worker_queue_names in zip(
+            pipeline_builders, get_worker_queue_names(pipeline_builders)):
+        if other_builder is pipeline_builder:
+            queue_names.update(worker_queue_names)
+        else:
+            other_queue_names.update(worker_queue_names)
+    return queue_names - other_queue_names
+
+
+def localize_queue_specs(queue_specs, pipeline_builders):
+    """
+    Use in-process queues for those only used by thread workers.
+
+    Parameters
+    ----------
+    queue_specs : dict of str, dict
+        Specs for the queues to build, by queue name.
+    pipeline_builders : list of ObjectBuilder
+        Set up builders of the top-level pipelines, each a worker.
+
+    Returns
+    -------
+    queue_specs : dict of str, dict
+        Copy of the queue specs, with those of multiprocessing queues only
+        used by thread workers replaced by the corresponding queue module
+        classes, avoiding pickling and a feeder thread per queue.
+
+    """
+    pipeline_modes = [
+        getattr(pipeline_builder, "worker_kwargs", {}).get("mode", "process")
+        for pipeline_builder in pipeline_builders]
+    if "thread" not in pipeline_modes:
+        return queue_specs
+
+    worker_modes = {}
+    for worker_mode, queue_names in zip(
+            pipeline_modes, get_worker_queue_names(pipeline_builders)):
+        for queue_name in queue_names:
+            worker_modes.setdefault(queue_name, set()).add(worker_mode)
+
+    queue_specs = dict(queue_specs)
+    for queue_name, queue_modes in worker_modes.items():
+        queue_spec = queue_specs.get(queue_name, None)
+        if queue_modes != {"thread"} or queue_spec is None:
+            continue
+        module_path = queue_spec.get("_module_path", "multiprocessing")
+        class_name = THREAD_QUEUE_CLASSES.get(
+            queue_spec.get("_class_name", "Queue"), None)
+        if module_path != "multiprocessing" or class_name is None:
+            continue
+        LOGGER.debug("Using in-process queue for thread-only queue %s",
+                     queue_name)
+        queue_specs[queue_name] = {
+            **queue_spec, "_module_path": "queue", "_class_name": class_name}
+    return queue_specs
+
+
 # --- Helper classes --- #
 
 class BuildContext(brokkr.utils.misc.AutoReprMixin):
@@ -80,22 +187,36 @@ def __init__(
     def build_queues(self):
         build_queues(input_dict=self.queue_specs, output_dict=self.queues)
 
+    @staticmethod
+    def shutdown_queue(queue_name, queue_obj):
+        LOGGER.info("Shutting down queue %s: %r", queue_name, queue_obj)
+        try:
+            queue_obj.close()
+        except (NotImplementedError, AttributeError) as e:
+            LOGGER.debug("%s closing queue %s (%r): %s",
+                         type(e).__name__, queue_name, queue_obj, e)
+        try:
+            queue_obj.join_thread()
+        except (NotImplementedError, AttributeError) as e:
+            LOGGER.debug("%s joining thread on queue %s (%r): %s",
+                         type(e).__name__, queue_name, queue_obj, e)
+
     def shutdown_queues(self):
         for queue_name, queue_obj in self.queues.items():
-            LOGGER.info("Shutting down queue %s: %r", queue_name, queue_obj)
-            try:
-                queue_obj.close()
-            except (NotImplementedError, AttributeError) as e:
-                LOGGER.debug("%s closing queue %s (%r): %s",
-                             type(e).__name__, queue_name, queue_obj, e)
-            try:
-                queue_obj.join_thread()
-            except (NotImplementedError, AttributeError) as e:
-                LOGGER.debug("%s joining thread on queue %s (%r): %s",
-                             type(e).__name__, queue_name, queue_obj, e)
+            self.shutdown_queue(queue_name, queue_obj)
             del queue_obj
         self.queues.clear()
 
+    def rebuild_queues(self, queue_names):
+        """Replace the given queues, e.g. if a worker died using them."""
+        for queue_name in queue_names:
+            queue_obj = self.queues.get(queue_name, None)
+            if queue_obj is not None:
+                self.shutdown_queue(queue_name, queue_obj)
+            LOGGER.info("Rebuilding queue %s", queue_name)
+            self.queues[queue_name] = build_queue(
+                **self.queue_specs[queue_name])
+
     def merge(self, build_context):
         if build_context is None:
             return self
@@ -117,6 +238,7 @@ def __init__(
                 ):
         self.subobjects = [] if subobjects is None else subobjects
         self.name = "Unnamed" if name is None else name
+        self.step_key = None
         self.name_sep = name_sep
         self.build_context = (
             BuildContext() if build_context is None else build_context)
@@ -226,6 +348,7 @@ def setup_subobject(
 
             subobject.pop("_builder", None)
             subobject = builder(build_context=build_context, **subobject)
+            subobject.step_key = step_key
         return subobject
 
     def setup_subobjects(self, build_context=None, **setup_kwargs):
@@ -271,6 +394,8 @@ def __init__(
             _class_name="SequentialPipeline",
             _is_plugin=False,
             _dependencies=None,
+            _depends_on=None,
+            _worker=None,
             name=None,
             steps=None,
             build_context=None,
@@ -280,6 +405,10 @@ def __init__(
         self.class_name = _class_name
         self.is_plugin = _is_plugin
         self.dependencies = _dependencies
+        self.depends_on = _depends_on
+        if isinstance(_worker, str):
+            _worker = {"mode": _worker}
+        self.worker_kwargs = {} if _worker is None else dict(_worker)
 
         self.init_kwargs = copy.deepcopy(init_kwargs)
         if name is not None:
@@ -455,6 +584,60 @@ def __init__(
         super().__init__(**{**monitor_pipeline, **builder_kwargs})
 
 
+class DagPipelineBuilder(PipelineBuilder):
+    def __init__(
+            self,
+            _class_name="DagPipeline",
+            **pipeline_builder_kwargs):
+        super().__init__(_class_name=_class_name, **pipeline_builder_kwargs)
+
+    def resolve_dependencies(self):
+        """Get the indices of each step's dependencies and check for cycles."""
+        step_indices = {}
+        for idx, subbuilder in enumerate(self.subbuilders):
+            step_indices[subbuilder.name] = idx
+            if subbuilder.step_key is not None:
+                step_indices.setdefault(subbuilder.step_key, idx)
+
+        dependencies = []
+        for idx, subbuilder in enumerate(self.subbuilders):
+            depends_on = getattr(subbuilder, "depends_on", None)
+            if depends_on is None:
+                dependencies.append([] if not idx else [idx - 1])
+                continue
+            if isinstance(depends_on, str):
+                depends_on = [depends_on]
+            try:
+                dependencies.append(
+                    [step_indices[step_name] for step_name in depends_on])
+            except KeyError as e:
+                LOGGER.critical(
+                    "%s finding dependency %s of step %s in pipeline %s",
+                    type(e).__name__, e, subbuilder.name, self.name)
+                LOGGER.info("Valid step names: %r", list(step_indices))
+                raise SystemExit(1) from e
+
+        try:
+            brokkr.pipeline.utils.sort_topologically(
+                dict(enumerate(dependencies)))
+        except ValueError as e:
+            LOGGER.critical("%s validating steps of pipeline %s: %s",
+                            type(e).__name__, self.name, e)
+            LOGGER.info("Step dependencies: %r", {
+                subbuilder.name: [self.subbuilders[dep_idx].name
+                                  for dep_idx in step_deps]
+                for subbuilder, step_deps in zip(
+                    self.subbuilders, dependencies)})
+            raise SystemExit(1) from e
+        return dependencies
+
+    def setup(self, build_context=None, **setup_kwargs):
+        subbuilders = super().setup(
+            build_context=build_context, **setup_kwargs)
+        self.init_kwargs["dependencies"] = self.resolve_dependencies()
+        return subbuilders
+
+
 class TopLevelBuilder(Builder):
     def __init__(self, pipelines, name="Pipeline", **builder_kwargs):
         super().__init__(
@@ -471,5 +654,6 @@ def __init__(self, pipelines, name="Pipeline", **builder_kwargs):
     "queue": QueueBuilder,
     "pipeline": PipelineBuilder,
     "monitor": MonitorBuilder,
+    "dag": DagPipelineBuilder,
     "toplevel": TopLevelBuilder,
     }
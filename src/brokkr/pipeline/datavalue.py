@@ -46,6 +46,29 @@ def __init__(
                 setattr(self, attr_name, attr_value)
 
 
+def build_data_types(data_types, datatype_default_kwargs=None, name_suffix=""):
+    """Build a list of DataTypes from DataTypes, dicts or a dict of dicts."""
+    if datatype_default_kwargs is None:
+        datatype_default_kwargs = {}
+
+    built_data_types = []
+    for data_type in data_types:
+        try:
+            data_type.name
+        except AttributeError:  # If data_type isn't already an object
+            try:
+                data_type["name"]
+            except TypeError:  # If data_types is a dict, not a list
+                data_type_dict = data_types[data_type]
+                data_type_dict["name"] = data_type
+                data_type = data_type_dict
+
+            data_type = DataType(**{**datatype_default_kwargs, **data_type})
+        data_type.name += name_suffix
+        built_data_types.append(data_type)
+    return built_data_types
+
+
 class DataValue(brokkr.utils.misc.AutoReprMixin):
     def __init__(
             self,
@@ -82,4 +105,6 @@ def is_na(self, value):
         self._is_na = value
 
     def __str__(self):
+        if isinstance(self.value, (bytes, bytearray)):
+            return self.value.hex()
         return str(self.value)
@@ -11,14 +11,15 @@
 import operator
 import struct
 
-# Third party imports
-import simpleeval
-
 # Local imports
 import brokkr.pipeline.datavalue
+import brokkr.utils.metrics
 import brokkr.utils.misc
 import brokkr.utils.output
 
+# Third party imports (loaded on first use)
+simpleeval = brokkr.utils.misc.lazy_import("simpleeval")
+
 
 # --- Module-level constants --- #
 
@@ -53,6 +54,19 @@ def eval_oneshot(expression, **simpleeval_kwargs):
     return eval_result
 
 
+def decode_binary_segments(decoders, binary_segments):
+    """Unpack each binary segment with its decoder into one list of values."""
+    decoded_values = []
+    for decoder, binary_data in zip(decoders, binary_segments):
+        segment_values = None
+        if binary_data is not None:
+            segment_values = decoder.decode_binary(binary_data=binary_data)
+        if segment_values is None:
+            segment_values = [None] * len(decoder.data_types)
+        decoded_values += segment_values
+    return decoded_values
+
+
 # --- Conversion functions --- #
 
 def _convert_none(value):
@@ -184,8 +198,10 @@ def __init__(
             conversion_functions=None,
             include_all_data_each=False,
             passthrough_none=False,
+            name=None,
                 ):
         self.data_types = data_types
+        self.name = name
         self.na_marker = NA_MARKER_DEFAULT if na_marker is None else na_marker
         if conversion_functions is None:
             conversion_functions = {}
@@ -212,6 +228,16 @@ def output_na_values(self):
                        if data_type.conversion}
         return output_data
 
+    def get_uncertainty(self, data_type):
+        if data_type.uncertainty is not True:
+            return data_type.uncertainty
+        uncertainty = abs(
+            self.conversion_functions[data_type.conversion](
+                1, **data_type.conversion_kwargs)
+            - self.conversion_functions[data_type.conversion](
+                0, **data_type.conversion_kwargs))
+        return round(uncertainty, -int(math.floor(math.log10(uncertainty))))
+
     def convert_data(self, raw_data):
         error_count = 0
         output_data = {}
@@ -256,22 +282,14 @@ def convert_data(self, raw_data):
                 output_data[data_type.name] = self.output_na_value(data_type)
                 error_count += 1
             else:
-                if data_type.uncertainty is True:
-                    uncertainty = abs(
-                        self.conversion_functions[data_type.conversion](
-                            1, **data_type.conversion_kwargs)
-                        - self.conversion_functions[data_type.conversion](
-                            0, **data_type.conversion_kwargs))
-                    uncertainty = round(
-                        uncertainty, -int(math.floor(math.log10(uncertainty))))
-
-                else:
-                    uncertainty = data_type.uncertainty
                 data_value = brokkr.pipeline.datavalue.DataValue(
                     output_value, data_type=data_type, raw_value=value,
-                    uncertainty=uncertainty)
+                    uncertainty=self.get_uncertainty(data_type))
                 output_data[data_type.name] = data_value
 
+        if error_count:
+            brokkr.utils.metrics.REGISTRY.increment(
+                self.name, "decode_errors", error_count)
         if error_count > 1:
             LOGGER.warning("%s additional decode errors were suppressed.",
                            error_count - 1)
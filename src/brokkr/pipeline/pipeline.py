@@ -4,14 +4,43 @@
 
 # Standard library imports
 import abc
+import asyncio
+import concurrent.futures
 import multiprocessing
 
 # Local imports
+from brokkr.constants import SLEEP_TICK_S
 import brokkr.pipeline.base
 import brokkr.pipeline.utils
+import brokkr.utils.metrics
 import brokkr.utils.misc
 
 
+METRICS_INTERVAL_S_DEFAULT = 60
+
+
+# --- Helper functions --- #
+
+def run_forever_in_event_loop(pipeline, input_data=None, exit_event=None):
+    """Run a pipeline's execute_forever_async in a new event loop."""
+    if exit_event is not None:
+        pipeline.exit_event = exit_event
+    if pipeline.exit_event is None:
+        pipeline.exit_event = multiprocessing.Event()
+    pipeline.logger.debug("Setting up signal handlers in event loop...")
+    brokkr.utils.misc.set_signal_handler(
+        brokkr.utils.misc.generate_quit_handler(
+            pipeline.exit_event, logger=pipeline.logger))
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(pipeline.execute_forever_async(
+            input_data=input_data, exit_event=pipeline.exit_event))
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+        pipeline.close()
+
+
 # --- Core Pipeline classes --- #
 
 class Pipeline(brokkr.pipeline.base.Executable, metaclass=abc.ABCMeta):
@@ -21,14 +50,93 @@ def __init__(
             period_s=0,
             na_on_start=False,
             wait_on_exit=False,
+            metrics_path=None,
+            metrics_interval_s=METRICS_INTERVAL_S_DEFAULT,
+            catchup_policy=brokkr.utils.misc.CATCHUP_POLICY_DEFAULT,
             **executable_kwargs):
         super().__init__(**executable_kwargs)
         self.steps = steps
         self.period_s = period_s
         self.na_on_start = na_on_start
         self.wait_on_exit = wait_on_exit
+        self.metrics_path = metrics_path
+        self.metrics_interval_s = metrics_interval_s
+        self.catchup_policy = catchup_policy
+        self.periodic_stats = brokkr.utils.misc.PeriodicStats()
 
         self.outer_exit_event = multiprocessing.Event()
+        self.tick_histogram = brokkr.utils.metrics.REGISTRY.get_histogram(
+            self.metrics_owner, "tick")
+        self.lateness_histogram = (
+            brokkr.utils.metrics.REGISTRY.get_histogram(
+                self.metrics_owner, "tick_lateness"))
+        self._next_metrics_time = (brokkr.utils.misc.monotonic_ns()
+                                   + metrics_interval_s
+                                   * brokkr.utils.misc.NS_IN_S)
+
+    def get_metrics(self):
+        """Get a summary of the tick and step timings of this pipeline."""
+        return brokkr.utils.metrics.REGISTRY.query(
+            owner=self.metrics_owner).get(self.metrics_owner, {})
+
+    def write_metrics(self):
+        metrics_path = str(self.metrics_path).format(name=self.name)
+        self.logger.debug("Writing metrics for %s to %r",
+                          self.name, metrics_path)
+        try:
+            brokkr.utils.metrics.REGISTRY.write(metrics_path)
+        except Exception as e:
+            self.logger.error(
+                "%s writing metrics for %s to %r: %s",
+                type(e).__name__, self.name, metrics_path, e)
+            self.logger.info("Error details:", exc_info=True)
+
+    def publish_periodic_stats(self):
+        """Publish the scheduling stats of the last tick to the registry."""
+        if not self.periodic_stats.n_ticks:
+            return
+        self.lateness_histogram.record(self.periodic_stats.lateness_ns_last)
+        registry = brokkr.utils.metrics.REGISTRY
+        registry.set_counter(self.metrics_owner, "tick_overruns",
+                             self.periodic_stats.n_overruns)
+        registry.set_counter(self.metrics_owner, "ticks_skipped",
+                             self.periodic_stats.n_skipped)
+
+    def record_tick(self, start_time_ns, error=False):
+        """Record the duration of a tick and write metrics if it is time."""
+        self.tick_histogram.record(
+            brokkr.utils.misc.perf_counter_ns() - start_time_ns, error=error)
+        if error:
+            return
+        if (self.metrics_path
+                and brokkr.utils.misc.monotonic_ns()
+                >= self._next_metrics_time):
+            self._next_metrics_time = (
+                brokkr.utils.misc.monotonic_ns()
+                + self.metrics_interval_s * brokkr.utils.misc.NS_IN_S)
+            self.write_metrics()
+
+    def execute_(self, input_data=None):
+        self.publish_periodic_stats()
+        start_time_ns = brokkr.utils.misc.perf_counter_ns()
+        try:
+            output_data = super().execute_(input_data=input_data)
+        except Exception:
+            self.record_tick(start_time_ns, error=True)
+            raise
+        self.record_tick(start_time_ns)
+        return output_data
+
+    async def execute_async_(self, input_data=None):
+        self.publish_periodic_stats()
+        start_time_ns = brokkr.utils.misc.perf_counter_ns()
+        try:
+            output_data = await super().execute_async_(input_data=input_data)
+        except Exception:
+            self.record_tick(start_time_ns, error=True)
+            raise
+        self.record_tick(start_time_ns)
+        return output_data
 
     def shutdown(self):
         self.logger.info(
@@ -36,6 +144,18 @@ def shutdown(self):
             brokkr.utils.misc.get_full_class_name(self))
         self.outer_exit_event.set()
 
+    def close(self):
+        """Close each of the pipeline's steps, logging any errors."""
+        for step in self.steps:
+            try:
+                step.close()
+            except Exception as e:
+                self.logger.error(
+                    "%s closing step %s (%s) of %s: %s",
+                    type(e).__name__, getattr(step, "name", None),
+                    brokkr.utils.misc.get_full_class_name(step), self.name, e)
+                self.logger.info("Error details:", exc_info=True)
+
     @abc.abstractmethod
     def execute(self, input_data=None):
         self.logger.debug(
@@ -60,20 +180,87 @@ def execute_forever(self, input_data=None, exit_event=None):
         if self.na_on_start:
             self.logger.debug("Injecting NA values on start")
             self.execute_(input_data=brokkr.pipeline.utils.NASentinel)
-        brokkr.utils.misc.run_periodic(
-            type(self).execute_,
-            period_s=self.period_s,
-            exit_event=self.exit_event,
-            outer_exit_event=self.outer_exit_event,
-            logger=self.logger,
-            )(self, input_data=input_data)
+        try:
+            brokkr.utils.misc.run_periodic(
+                type(self).execute_,
+                period_s=self.period_s,
+                exit_event=self.exit_event,
+                outer_exit_event=self.outer_exit_event,
+                logger=self.logger,
+                catchup_policy=self.catchup_policy,
+                stats=self.periodic_stats,
+                )(self, input_data=input_data)
+        finally:
+            self.close()
+
+    async def execute_forever_async(self, input_data=None, exit_event=None):
+        """
+        Execute the pipeline periodically as a task in a running event loop.
+
+        Follows the same tick grid and catchup policy as execute_forever,
+        but awaits between ticks instead of blocking, so many pipelines
+        can share one event loop. Signal handling is left to the caller.
+
+        Parameters
+        ----------
+        input_data : Any, optional
+            Data to pass to the pipeline each tick.
+        exit_event : multiprocessing.Event, optional
+            Event that, once set, stops waiting between ticks.
+
+        """
+        if exit_event is not None:
+            self.exit_event = exit_event
+        if self.catchup_policy not in brokkr.utils.misc.CATCHUP_POLICIES:
+            raise ValueError(
+                f"Catchup policy must be one of "
+                f"{brokkr.utils.misc.CATCHUP_POLICIES}, "
+                f"not {self.catchup_policy!r}")
+        self.logger.info(
+            "Beginning async execution of %s (%s)", self.name,
+            brokkr.utils.misc.get_full_class_name(self))
+        if self.na_on_start:
+            self.logger.debug("Injecting NA values on start")
+            await self.execute_async_(
+                input_data=brokkr.pipeline.utils.NASentinel)
+
+        period_ns = int(self.period_s * brokkr.utils.misc.NS_IN_S)
+        scheduled_time = brokkr.utils.misc.monotonic_ns()
+        while not self.outer_exit_event.is_set():
+            start_time = brokkr.utils.misc.monotonic_ns()
+            self.periodic_stats.record_tick(
+                max(start_time - scheduled_time, 0))
+            await self.execute_async_(input_data=input_data)
+
+            if period_ns <= 0:
+                # Yield to the other tasks in the loop between ticks
+                await asyncio.sleep(0)
+                continue
+            scheduled_time = brokkr.utils.misc.schedule_next_tick(
+                scheduled_time=scheduled_time,
+                start_time=start_time,
+                period_ns=period_ns,
+                catchup_policy=self.catchup_policy,
+                stats=self.periodic_stats,
+                logger=self.logger,
+                )
+
+            # Sleep in short increments to promptly notice the exit event
+            while not (self.exit_event and self.exit_event.is_set()):
+                remaining_s = ((scheduled_time
+                                - brokkr.utils.misc.monotonic_ns())
+                               / brokkr.utils.misc.NS_IN_S)
+                if remaining_s <= 0:
+                    break
+                await asyncio.sleep(min(remaining_s, SLEEP_TICK_S))
 
 
 class SequentialPipeline(Pipeline, brokkr.pipeline.base.SequentialMixin):
     def execute(self, input_data=None):
         data = super().execute(input_data=input_data)
+        self.start_tick()
         for idx, step in enumerate(self.steps):
-            data = self.execute_step(idx, step, input_data=data)
+            data = self.run_step_if_due(idx, step, input_data=data)
             if data is brokkr.pipeline.utils.ShutdownSentinel:
                 self.logger.info(
                     "Recieved shutdown sentinel from step %s - %s"
@@ -86,3 +273,235 @@ def execute(self, input_data=None):
                     idx + 1, getattr(step, "name", None), self.name)
                 break
         return data
+
+
+class DagPipeline(Pipeline, brokkr.pipeline.base.SequentialMixin):
+    def __init__(
+            self,
+            steps,
+            dependencies=None,
+            max_workers=None,
+            **pipeline_kwargs):
+        """
+        Pipeline running steps as a directed acyclic graph.
+
+        Each step receives a shallow copy of the output of the steps it
+        depends on, merged in order if more than one, or the pipeline
+        input data if it has no dependencies. Steps whose dependencies are
+        complete run concurrently on a thread pool.
+
+        Parameters
+        ----------
+        steps : list of PipelineStep
+            The steps of the pipeline.
+        dependencies : list of list of int, optional
+            Indices of the steps each step depends on. By default, each
+            step depends on the previous one, as in a SequentialPipeline.
+        max_workers : int, optional
+            Max threads to run branches on. By default, one per step.
+        **pipeline_kwargs
+            Passed on to the ``Pipeline`` base class.
+
+        """
+        super().__init__(steps=steps, **pipeline_kwargs)
+        if dependencies is None:
+            dependencies = [[] if not idx else [idx - 1]
+                            for idx in range(len(steps))]
+        if len(dependencies) != len(steps):
+            raise ValueError(
+                f"Number of dependency lists ({len(dependencies)}) must match "
+                f"number of steps ({len(steps)})")
+        self.dependencies = [list(step_deps) for step_deps in dependencies]
+        self.step_order = brokkr.pipeline.utils.sort_topologically(
+            dict(enumerate(self.dependencies)))
+        self.sink_steps = [
+            idx for idx in range(len(steps))
+            if not any(idx in step_deps for step_deps in self.dependencies)]
+        self.max_workers = max_workers if max_workers else max(len(steps), 1)
+        self._executor = None
+
+    def shutdown(self):
+        super().shutdown()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    @staticmethod
+    def merge_data(upstream_data):
+        """Merge the output of upstream steps into the input of a step."""
+        if len(upstream_data) == 1:
+            data = upstream_data[0]
+            if isinstance(data, dict):
+                return dict(data)
+            if isinstance(data, list):
+                return list(data)
+            return data
+        merged_data = {}
+        for data in upstream_data:
+            if isinstance(data, dict):
+                merged_data.update(data)
+        return merged_data
+
+    def is_upstream_none(self, idx, outputs):
+        """Check if any step this one depends on output no data."""
+        upstream_data = [
+            outputs[dep_idx] for dep_idx in self.dependencies[idx]]
+        return any(data is None
+                   or data is brokkr.pipeline.utils.ShutdownSentinel
+                   for data in upstream_data)
+
+    def get_step_input(self, idx, input_data, outputs):
+        if not self.dependencies[idx]:
+            return self.merge_data([input_data])
+        return self.merge_data(
+            [outputs[dep_idx] for dep_idx in self.dependencies[idx]])
+
+    def execute(self, input_data=None):
+        data = super().execute(input_data=input_data)
+        if data is None and self.outer_exit_event.is_set():
+            return None
+        self.start_tick()
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix=f"{self.name} Branch")
+
+        outputs = {}
+        futures = {}
+        remaining = list(self.step_order)
+        while remaining or futures:
+            ready = [idx for idx in remaining
+                     if all(dep_idx in outputs
+                            for dep_idx in self.dependencies[idx])]
+            progressed = False
+            for idx in ready:
+                remaining.remove(idx)
+                step_input = self.get_step_input(idx, data, outputs)
+                if self.is_upstream_none(idx, outputs):
+                    self.logger.debug(
+                        "Upstream data is None on step %s - %s in pipeline "
+                        "%s, skipping", idx + 1,
+                        getattr(self.steps[idx], "name", None), self.name)
+                    outputs[idx] = None
+                    progressed = True
+                # Run inline when nothing can run alongside, to save overhead
+                elif len(ready) == 1 and not futures:
+                    outputs[idx] = self.run_step_if_due(
+                        idx, self.steps[idx], input_data=step_input)
+                    progressed = True
+                else:
+                    futures[self._executor.submit(
+                        self.run_step_if_due, idx, self.steps[idx],
+                        input_data=step_input)] = idx
+            if futures and not progressed:
+                done, __ = concurrent.futures.wait(
+                    futures, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    outputs[futures.pop(future)] = future.result()
+
+        shutdown = False
+        for idx, output_data in outputs.items():
+            if output_data is brokkr.pipeline.utils.ShutdownSentinel:
+                self.logger.info(
+                    "Recieved shutdown sentinel from step %s - %s "
+                    "in pipeline %s", idx + 1,
+                    getattr(self.steps[idx], "name", None), self.name)
+                outputs[idx] = None
+                shutdown = True
+
+        if shutdown:
+            self.shutdown()
+            return brokkr.pipeline.utils.ShutdownSentinel
+        return self.merge_data([outputs[idx] for idx in self.sink_steps])
+
+
+class AsyncSequentialPipeline(SequentialPipeline):
+    """
+    Sequential pipeline whose steps are awaited in an asyncio event loop.
+
+    Steps with a native ``execute_async`` (e.g. async Modbus TCP inputs)
+    run directly in the loop, while blocking steps are run in the loop's
+    default executor, so they don't stall other pipelines sharing it.
+    """
+
+    async def execute_async(self, input_data=None):
+        data = super(SequentialPipeline, self).execute(input_data=input_data)
+        self.start_tick()
+        for idx, step in enumerate(self.steps):
+            data = await self.run_step_if_due_async(
+                idx, step, input_data=data)
+            if data is brokkr.pipeline.utils.ShutdownSentinel:
+                self.logger.info(
+                    "Recieved shutdown sentinel from step %s - %s"
+                    "in pipeline %s", idx + 1, step.name, self.name)
+                self.shutdown()
+                break
+            if data is None:
+                self.logger.debug(
+                    "Data is none on step %s - %s in pipeline %s, restarting",
+                    idx + 1, getattr(step, "name", None), self.name)
+                break
+        return data
+
+    def execute_forever(self, input_data=None, exit_event=None):
+        run_forever_in_event_loop(
+            self, input_data=input_data, exit_event=exit_event)
+
+
+class AsyncPipelineGroup(Pipeline):
+    def __init__(self, steps, **pipeline_kwargs):
+        """
+        Host many pipelines as concurrent tasks in a single event loop.
+
+        Each pipeline runs its own periodic loop as a task, with its own
+        period and catchup policy, sharing one thread and event loop
+        instead of needing a worker each.
+
+        Parameters
+        ----------
+        steps : list of Pipeline
+            The pipelines to run.
+        **pipeline_kwargs
+            Passed on to the ``Pipeline`` base class.
+
+        """
+        super().__init__(steps=steps, **pipeline_kwargs)
+        self._loop = None
+
+    def shutdown(self):
+        super().shutdown()
+        for pipeline in self.steps:
+            pipeline.shutdown()
+
+    def close(self):
+        super().close()
+        if self._loop is not None:
+            self._loop.close()
+            self._loop = None
+
+    async def execute_async(self, input_data=None):
+        data = super().execute(input_data=input_data)
+        if data is None and self.outer_exit_event.is_set():
+            return None
+        return await asyncio.gather(*[
+            pipeline.execute_async_(input_data=data)
+            for pipeline in self.steps])
+
+    def execute(self, input_data=None):
+        """Run one tick of every pipeline concurrently."""
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(
+            self.execute_async(input_data=input_data))
+
+    async def execute_forever_async(self, input_data=None, exit_event=None):
+        if exit_event is not None:
+            self.exit_event = exit_event
+        await asyncio.gather(*[
+            pipeline.execute_forever_async(
+                input_data=input_data, exit_event=self.exit_event)
+            for pipeline in self.steps])
+
+    def execute_forever(self, input_data=None, exit_event=None):
+        run_forever_in_event_loop(
+            self, input_data=input_data, exit_event=exit_event)
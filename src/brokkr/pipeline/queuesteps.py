@@ -9,6 +9,7 @@
 from brokkr.constants import SLEEP_TICK_S
 import brokkr.pipeline.base
 import brokkr.pipeline.utils
+import brokkr.utils.metrics
 
 
 # Module-level constants
@@ -63,8 +64,8 @@ def safe_put(self, input_data, **put_kwargs):
             except InterruptedError:  # If interrupted, just try to put again
                 self.logger.info("QUeue writing interrupted, retrying")
                 self.data_queue.put(input_data, **put_kwargs)
-            return True
         except queue.Full:
+            brokkr.utils.metrics.REGISTRY.increment(self.name, "queue_drops")
             try:
                 queue_size = self.data_queue.qsize()
             # Ignore errors related to OSes or queues that don't support qsize
@@ -77,6 +78,12 @@ def safe_put(self, input_data, **put_kwargs):
                 self.name, queue_size)
             self.logger.debug("Queue details: %s", self.data_queue.__dict__)
             return False
+        try:
+            brokkr.utils.metrics.REGISTRY.set_gauge(
+                self.name, "queue_depth", self.data_queue.qsize())
+        except (NotImplementedError, AttributeError):
+            pass  # Ignore OSes or queues that don't support qsize
+        return True
 
     def execute(self, input_data=None):
         if self.truncate_to_headers:
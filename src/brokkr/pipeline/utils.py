@@ -93,3 +93,51 @@ def truncate_to_headers(input_data=None):
         if header_bytes:
             data_object.value = data_object.value[:header_bytes]
     return input_data
+
+
+def sort_topologically(dependencies):
+    """
+    Order the nodes of a graph so each comes after its dependencies.
+
+    Parameters
+    ----------
+    dependencies : dict[Hashable, Sequence[Hashable]]
+        The nodes each node depends on, for every node in the graph.
+
+    Returns
+    -------
+    sorted_nodes : list[Hashable]
+        The nodes in dependency order, ties broken by the original order.
+
+    Raises
+    ------
+    ValueError
+        If a dependency isn't a node of the graph, or the graph has a cycle.
+
+    """
+    n_remaining = {}
+    dependents = {node: [] for node in dependencies}
+    for node, node_dependencies in dependencies.items():
+        n_remaining[node] = len(set(node_dependencies))
+        for dependency in set(node_dependencies):
+            try:
+                dependents[dependency].append(node)
+            except KeyError:
+                raise ValueError(f"Dependency {dependency!r} of {node!r} "
+                                 "is not in the graph") from None
+
+    ready_nodes = [node for node, n_deps in n_remaining.items() if not n_deps]
+    sorted_nodes = []
+    while ready_nodes:
+        node = ready_nodes.pop(0)
+        sorted_nodes.append(node)
+        for dependent in dependents[node]:
+            n_remaining[dependent] -= 1
+            if not n_remaining[dependent]:
+                ready_nodes.append(dependent)
+
+    if len(sorted_nodes) < len(dependencies):
+        cycle_nodes = [node for node in dependencies
+                       if node not in sorted_nodes]
+        raise ValueError(f"Dependency cycle found among {cycle_nodes!r}")
+    return sorted_nodes
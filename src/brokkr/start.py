@@ -23,6 +23,15 @@
 
 CONFIG_REQUIRE = ["systempath", "unit"]
 
+# Modules for the forkserver or parent to import before starting workers
+PRELOAD_MODULES_DEFAULT = [
+    "brokkr.config.main",
+    "brokkr.config.presets",
+    "brokkr.multiprocess.handler",
+    "brokkr.pipeline.builder",
+    "brokkr.pipeline.pipeline",
+    ]
+
 DEFAULT_PIPELINE = {
     "_builder": "monitor",
     "name": "Default Pipeline",
@@ -196,6 +205,76 @@ def create_build_context(exit_event=None, mp_handler=None):
     return build_context
 
 
+def generate_queue_rebuilder(build_context, pipeline_builders, logger=None):
+    import brokkr.pipeline.builder
+
+    if logger is None:
+        logger = logging.getLogger(__name__)
+
+    def _rebuild_worker_queues(worker_config):
+        """
+        Replace the queues only used by a worker that died.
+
+        It may have left them unusable, e.g. holding their lock or partway
+        through a write. Queues shared with running workers are kept, as
+        those still hold them, and can't be stopped on their own to be
+        handed new ones since they all share the same exit event.
+        """
+        queue_names = brokkr.pipeline.builder.get_exclusive_queue_names(
+            worker_config.executor, pipeline_builders)
+        shared_queue_names = brokkr.pipeline.builder.get_queue_names(
+            worker_config.executor) - queue_names
+        if shared_queue_names:
+            logger.warning(
+                "Keeping queues %s of worker %s shared with running workers; "
+                "restart Brokkr if they stop passing data",
+                sorted(shared_queue_names), worker_config.name)
+        build_context.rebuild_queues(queue_names)
+    return _rebuild_worker_queues
+
+
+def get_preload_modules():
+    """Find modules for workers to preload, from the pipelines and presets."""
+    from brokkr.config.main import CONFIG
+    import brokkr.pipeline.builder
+
+    if not CONFIG["general"]["worker_preload"]:
+        return []
+    try:
+        from brokkr.config.presets import PRESETS as presets
+    except (Exception, SystemExit):  # Reported once logging is set up
+        presets = {}
+    return [
+        *PRELOAD_MODULES_DEFAULT,
+        *sorted(brokkr.pipeline.builder.find_module_paths(
+            [CONFIG["pipelines"], CONFIG["steps"], presets])),
+        ]
+
+
+def setup_workers(mp_handler, pipeline_builders):
+    """Set up the worker configs and their scheduling on the handler."""
+    from brokkr.config.main import CONFIG
+    import brokkr.multiprocess.handler
+
+    mp_handler.worker_configs = [
+        brokkr.multiprocess.handler.WorkerConfig(
+            executor=pipeline_builder,
+            name=" ".join([
+                getattr(pipeline_builder, "name", "Unnamed"),
+                pipeline_builder.worker_kwargs.get(
+                    "mode", "process").title()]),
+            build_method="setup_and_build",
+            run_method="execute_forever",
+            **pipeline_builder.worker_kwargs,
+            )
+        for pipeline_builder in pipeline_builders
+        ]
+    mp_handler.worker_startup_wait_s = (
+        CONFIG["general"]["worker_startup_wait_s"])
+    mp_handler.worker_shutdown_wait_s = (
+        CONFIG["general"]["worker_shutdown_wait_s"])
+
+
 def get_monitoring_pipeline(
         pipeline_key=None,
         output_override=True,
@@ -312,11 +391,15 @@ def start_brokkr(log_level_file=None, log_level_console=None):
         )
 
     # Create multiprocess handler and start logging process
-    exit_event = multiprocessing.Event()
     mp_handler = brokkr.multiprocess.handler.MultiprocessHandler(
+        start_method=CONFIG["general"]["worker_start_method"],
+        preload_modules=get_preload_modules(),
         log_config=log_config,
-        exit_event=exit_event,
+        log_transport_config=CONFIG["log_transport"],
+        metrics_config=CONFIG["metrics"],
+        restart_config=CONFIG["restart"],
         )
+    exit_event = mp_handler.exit_event
     mp_handler.start_logger()
 
     # Log startup messages
@@ -358,21 +441,27 @@ def start_brokkr(log_level_file=None, log_level_console=None):
             e, mp_handler, exit_event, logger,
             message="building pipeline list")
         raise
+    try:
+        build_context.queue_specs = (
+            brokkr.pipeline.builder.localize_queue_specs(
+                build_context.queue_specs, pipeline_builders.subbuilders))
+    except BaseException as e:
+        handle_startup_error(
+            e, mp_handler, exit_event, logger,
+            message="setting up pipeline queues")
+        raise
+    mp_handler.supervisor.before_restart = generate_queue_rebuilder(
+        build_context, pipeline_builders.subbuilders, logger=logger)
 
     # Setup worker configs for multiprocess handler
     logger.debug("Setting up working configs")
-    worker_configs = [
-        brokkr.multiprocess.handler.WorkerConfig(
-            executor=pipeline_builder,
-            name=getattr(pipeline_builder, "name", "Unnamed") + " Process",
-            build_method="setup_and_build",
-            run_method="execute_forever",
-            )
-        for pipeline_builder in pipeline_builders.subbuilders
-        ]
-    mp_handler.worker_configs = worker_configs
-    mp_handler.worker_shutdown_wait_s = (
-        CONFIG["general"]["worker_shutdown_wait_s"])
+    try:
+        setup_workers(mp_handler, pipeline_builders.subbuilders)
+    except BaseException as e:
+        handle_startup_error(
+            e, mp_handler, exit_event, logger,
+            message="setting up worker configs")
+        raise
 
     # Start multiprocess manager mainloop
     logger.debug("Starting multiprocess manager mainloop: %r", mp_handler)
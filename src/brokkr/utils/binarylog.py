@@ -0,0 +1,590 @@
+"""
+Compact binary log sink with per-segment indices for fast searching.
+"""
+
+# Standard library imports
+import datetime
+import json
+import logging
+import os
+from pathlib import Path
+import struct
+import sys
+
+# Local imports
+import brokkr.utils.log
+import brokkr.utils.misc
+
+
+# Record length, creation time (s), level number and process ID
+RECORD_HEADER_FORMAT = "!IdBI"
+FIELD_LENGTH_FORMAT = "!I"
+RECORD_HEADER_SIZE = struct.calcsize(RECORD_HEADER_FORMAT)
+FIELD_LENGTH_SIZE = struct.calcsize(FIELD_LENGTH_FORMAT)
+
+# Variable-length UTF-8 fields stored after the header, in order
+RECORD_FIELDS = (
+    "process_name", "logger_name", "template", "args", "exc_text")
+
+SEGMENT_SUFFIX_DIGITS = 6
+INDEX_SUFFIX = ".idx"
+
+MAX_BYTES_DEFAULT = int(1e7)
+BACKUP_COUNT_DEFAULT = 10
+
+TIME_FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%dT%H:%M",
+    "%Y-%m-%d",
+    )
+TIME_FORMAT_OUTPUT = "%Y-%m-%d %H:%M:%S"
+
+LOGGER = logging.getLogger(__name__)
+
+
+# --- Helper functions --- #
+
+def simplify_args(args):
+    """Convert log message args to JSON-compatible values, or None."""
+    if not args:
+        return None
+
+    def _simplify_arg(arg):
+        if arg is None or isinstance(arg, (bool, int, float, str)):
+            return arg
+        return str(arg)
+
+    if isinstance(args, dict):
+        return {str(key): _simplify_arg(arg) for key, arg in args.items()}
+    return [_simplify_arg(arg) for arg in args]
+
+
+def get_segment_paths(filename):
+    """Get the paths of the existing segments of a log, oldest first."""
+    filename = brokkr.utils.misc.convert_path(filename)
+    segment_paths = []
+    for segment_path in filename.parent.glob(filename.name + ".*"):
+        segment_number = segment_path.name[len(filename.name) + 1:]
+        if (segment_number.isdigit()
+                and len(segment_number) == SEGMENT_SUFFIX_DIGITS):
+            segment_paths.append(segment_path)
+    return sorted(segment_paths)
+
+
+def get_index_path(segment_path):
+    return segment_path.with_name(segment_path.name + INDEX_SUFFIX)
+
+
+def logger_matches(logger_name, logger_query):
+    return (logger_name == logger_query
+            or logger_name.startswith(logger_query + "."))
+
+
+def record_matches(record, start_time=None, end_time=None,
+                   min_level=None, logger_name=None):
+    """Check if a log record matches all the given search criteria."""
+    if start_time is not None and record.created < start_time:
+        return False
+    if end_time is not None and record.created > end_time:
+        return False
+    if min_level is not None and record.levelno < min_level:
+        return False
+    if logger_name and not logger_matches(record.logger_name, logger_name):
+        return False
+    return True
+
+
+def parse_time(time_value):
+    """Parse a time given as a Unix timestamp or a local date/time string."""
+    if time_value is None or isinstance(time_value, (int, float)):
+        return time_value
+    try:
+        return float(time_value)
+    except ValueError:
+        pass
+    for time_format in TIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(
+                time_value, time_format).timestamp()
+        except ValueError:
+            pass
+    raise ValueError(f"Time {time_value!r} must be a timestamp or match "
+                     f"one of the formats {TIME_FORMATS}")
+
+
+def parse_level(level):
+    if level is None or isinstance(level, int):
+        return level
+    if level.isdigit():
+        return int(level)
+    level_number = logging.getLevelName(level.upper())
+    if not isinstance(level_number, int):
+        raise ValueError(f"Unknown log level {level!r}")
+    return level_number
+
+
+# --- Core classes --- #
+
+class BinaryLogRecord(brokkr.utils.misc.AutoReprMixin):
+    def __init__(
+            self,
+            created,
+            levelno,
+            process,
+            process_name="",
+            logger_name="",
+            template="",
+            args=None,
+            exc_text="",
+                ):
+        self.created = created
+        self.levelno = levelno
+        self.process = process
+        self.process_name = process_name
+        self.logger_name = logger_name
+        self.template = template
+        self.args = args
+        self.exc_text = exc_text
+
+    @classmethod
+    def from_log_record(cls, log_record, formatter=None):
+        # Use the template and args preserved by the worker queue handler
+        template = getattr(log_record, "template", None)
+        args = getattr(log_record, "template_args", None)
+        if template is None:
+            template = getattr(log_record, "message", None)
+            if template is None:
+                template = log_record.getMessage()
+            args = None
+
+        exc_text = (getattr(log_record, "traceback_text", None)
+                    or log_record.exc_text or "")
+        if log_record.exc_info and not exc_text:
+            if formatter is None:
+                formatter = logging.Formatter()
+            exc_text = formatter.formatException(log_record.exc_info)
+
+        return cls(
+            created=log_record.created,
+            levelno=log_record.levelno,
+            process=log_record.process or 0,
+            process_name=log_record.processName or "",
+            logger_name=log_record.name,
+            template=str(template),
+            args=args,
+            exc_text=exc_text,
+            )
+
+    @classmethod
+    def from_bytes(cls, record_bytes):
+        __, created, levelno, process = struct.unpack_from(
+            RECORD_HEADER_FORMAT, record_bytes)
+        offset = RECORD_HEADER_SIZE
+        fields = {}
+        for field_name in RECORD_FIELDS:
+            field_length, = struct.unpack_from(
+                FIELD_LENGTH_FORMAT, record_bytes, offset)
+            offset += FIELD_LENGTH_SIZE
+            fields[field_name] = record_bytes[
+                offset:offset + field_length].decode("utf-8")
+            offset += field_length
+        fields["args"] = json.loads(fields["args"]) if fields["args"] else None
+        return cls(created=created, levelno=levelno, process=process,
+                   **fields)
+
+    def to_bytes(self):
+        args_json = "" if self.args is None else json.dumps(
+            self.args, separators=(",", ":"), default=str)
+        field_bytes = b"".join(
+            struct.pack(FIELD_LENGTH_FORMAT, len(field_encoded))
+            + field_encoded for field_encoded in (
+                field.encode("utf-8", errors="replace") for field in (
+                    self.process_name, self.logger_name, self.template,
+                    args_json, self.exc_text)))
+        record_length = RECORD_HEADER_SIZE + len(field_bytes)
+        return struct.pack(
+            RECORD_HEADER_FORMAT, record_length, self.created,
+            min(self.levelno, 255), self.process) + field_bytes
+
+    def get_message(self):
+        if self.args is None:
+            return self.template
+        try:
+            if isinstance(self.args, dict):
+                return self.template % self.args
+            return self.template % tuple(self.args)
+        except (TypeError, ValueError, KeyError):
+            return f"{self.template} {self.args}"
+
+    def format(self):
+        time_created = datetime.datetime.fromtimestamp(self.created)
+        message = (f"{time_created.strftime(TIME_FORMAT_OUTPUT)}."
+                   f"{time_created.microsecond // 1000:0>3}"
+                   f" | {logging.getLevelName(self.levelno)}"
+                   f" | {self.process_name} | {self.logger_name}"
+                   f" | {self.get_message()}")
+        if self.exc_text:
+            message = f"{message}\n{self.exc_text}"
+        return message
+
+
+class SegmentIndex(brokkr.utils.misc.AutoReprMixin):
+    def __init__(
+            self,
+            start_time=None,
+            end_time=None,
+            n_records=0,
+            levels=None,
+            loggers=None,
+                ):
+        """
+        Summary of the records in a log segment, to skip it when searching.
+
+        Parameters
+        ----------
+        start_time : float, optional
+            Creation time of the earliest record, as a Unix timestamp.
+        end_time : float, optional
+            Creation time of the latest record, as a Unix timestamp.
+        n_records : int, optional
+            Number of records in the segment.
+        levels : dict[int, int], optional
+            Number of records at each level number.
+        loggers : Iterable[str], optional
+            Names of the loggers with records in the segment.
+
+        """
+        self.start_time = start_time
+        self.end_time = end_time
+        self.n_records = n_records
+        self.levels = {} if levels is None else {
+            int(level): count for level, count in levels.items()}
+        self.loggers = set() if loggers is None else set(loggers)
+
+    def add(self, record):
+        if self.start_time is None or record.created < self.start_time:
+            self.start_time = record.created
+        if self.end_time is None or record.created > self.end_time:
+            self.end_time = record.created
+        self.n_records += 1
+        self.levels[record.levelno] = self.levels.get(record.levelno, 0) + 1
+        self.loggers.add(record.logger_name)
+
+    def may_match(self, start_time=None, end_time=None,
+                  min_level=None, logger_name=None):
+        if not self.n_records:
+            return False
+        if start_time is not None and self.end_time < start_time:
+            return False
+        if end_time is not None and self.start_time > end_time:
+            return False
+        if min_level is not None and max(self.levels) < min_level:
+            return False
+        if logger_name and not any(
+                logger_matches(segment_logger, logger_name)
+                for segment_logger in self.loggers):
+            return False
+        return True
+
+    @classmethod
+    def read(cls, index_path):
+        with open(index_path, "r", encoding="utf-8") as index_file:
+            return cls(**json.load(index_file))
+
+    def write(self, index_path):
+        index_data = {
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "n_records": self.n_records,
+            "levels": self.levels,
+            "loggers": sorted(self.loggers),
+            }
+        index_path_temp = index_path.with_name(index_path.name + ".tmp")
+        with open(index_path_temp, "w", encoding="utf-8") as index_file:
+            json.dump(index_data, index_file, separators=(",", ":"))
+        os.replace(index_path_temp, index_path)
+
+
+# --- Reading and searching --- #
+
+def read_segment(segment_path, with_offsets=False):
+    """
+    Read the records in a log segment, stopping at any truncated one.
+
+    Parameters
+    ----------
+    segment_path : str or pathlib.Path
+        Path to the segment to read.
+    with_offsets : bool, optional
+        If True, yield the offset of the end of each record with it.
+
+    Yields
+    ------
+    record : BinaryLogRecord or tuple(BinaryLogRecord, int)
+        Each complete record, with its end offset if requested.
+
+    """
+    with open(segment_path, "rb") as segment_file:
+        segment_bytes = segment_file.read()
+    offset = 0
+    while offset + RECORD_HEADER_SIZE <= len(segment_bytes):
+        record_length, = struct.unpack_from(
+            FIELD_LENGTH_FORMAT, segment_bytes, offset)
+        if (record_length < RECORD_HEADER_SIZE
+                or offset + record_length > len(segment_bytes)):
+            LOGGER.debug("Truncated record at byte %s of %s",
+                         offset, segment_path)
+            return
+        record = BinaryLogRecord.from_bytes(
+            segment_bytes[offset:offset + record_length])
+        offset += record_length
+        yield (record, offset) if with_offsets else record
+
+
+def index_segment(segment_path):
+    segment_index = SegmentIndex()
+    for record in read_segment(segment_path):
+        segment_index.add(record)
+    return segment_index
+
+
+def search_log(
+        filename,
+        start_time=None,
+        end_time=None,
+        min_level=None,
+        logger_name=None,
+        ):
+    """
+    Get the records from a binary log matching the given criteria.
+
+    Segments whose index rules out any match are skipped without being
+    read; those without an index (e.g. the one still being written) are
+    scanned in full.
+
+    Parameters
+    ----------
+    filename : str or pathlib.Path
+        Base path of the log, without the segment number suffix.
+    start_time : float, optional
+        Only return records created at or after this Unix timestamp.
+    end_time : float, optional
+        Only return records created at or before this Unix timestamp.
+    min_level : int, optional
+        Only return records at or above this level number.
+    logger_name : str, optional
+        Only return records from this logger or its children.
+
+    Yields
+    ------
+    record : BinaryLogRecord
+        Each matching record, in the order they were written.
+
+    """
+    criteria = {"start_time": start_time, "end_time": end_time,
+                "min_level": min_level, "logger_name": logger_name}
+    for segment_path in get_segment_paths(filename):
+        try:
+            segment_index = SegmentIndex.read(get_index_path(segment_path))
+        except (OSError, ValueError, TypeError):
+            pass  # If the segment has no valid index, scan it
+        else:
+            if not segment_index.may_match(**criteria):
+                LOGGER.debug("Skipping segment %s", segment_path)
+                continue
+
+        for record in read_segment(segment_path):
+            if record_matches(record, **criteria):
+                yield record
+
+
+@brokkr.utils.log.basic_logging
+def search_log_main(
+        log_path=None, start=None, end=None, level=None, logger=None):
+    if log_path is None:
+        log_path = get_default_log_path()
+    n_records = 0
+    for record in search_log(
+            log_path,
+            start_time=parse_time(start),
+            end_time=parse_time(end),
+            min_level=parse_level(level),
+            logger_name=logger,
+            ):
+        print(record.format())
+        n_records += 1
+    LOGGER.info("Found %s matching records in %s", n_records, log_path)
+    return n_records
+
+
+def get_default_log_path():
+    # pylint: disable=import-outside-toplevel
+    from brokkr.config.log import LOG_CONFIG
+    from brokkr.config.main import CONFIG
+    from brokkr.config.metadata import METADATA
+    from brokkr.config.unit import UNIT_CONFIG
+
+    output_path = Path(CONFIG["general"]["output_path_client"].as_posix()
+                       .format(system_name=METADATA["name"]))
+    log_config = brokkr.utils.log.render_full_log_config(
+        LOG_CONFIG,
+        output_path=output_path,
+        system_name=METADATA["name"],
+        unit_number=UNIT_CONFIG["number"],
+        )
+    for log_handler in log_config["handlers"].values():
+        if log_handler.get("class", "").endswith(
+                BinaryLogHandler.__name__):
+            return log_handler["filename"]
+    LOGGER.error("No binary log handler found in the log config")
+    sys.exit(1)
+
+
+# --- Logging handler --- #
+
+class BinaryLogHandler(logging.Handler):
+    def __init__(
+            self,
+            filename,
+            max_bytes=MAX_BYTES_DEFAULT,
+            backup_count=BACKUP_COUNT_DEFAULT,
+            level=logging.NOTSET,
+                ):
+        """
+        Write log records as compact binary records to rotating segments.
+
+        Each record stores the time, level, process, logger, message
+        template, args and any traceback, prefixed by its length. When a
+        segment is full or the handler is closed, an index of the time
+        range, levels and loggers it contains is written alongside it,
+        letting ``search_log`` skip segments that can't match.
+        The first segment is only opened on the first record, continuing
+        the last existing one if it isn't full, e.g. after a restart.
+        Each record is flushed as it is written.
+
+        Parameters
+        ----------
+        filename : str or pathlib.Path
+            Base path of the log; segments are suffixed with their number.
+        max_bytes : int, optional
+            Size after which to start a new segment, in bytes.
+        backup_count : int, optional
+            Number of complete segments to keep besides the current one.
+        level : int or str, optional
+            Minimum level of records to write. By default, all.
+
+        """
+        super().__init__(level=level)
+        self.filename = brokkr.utils.misc.convert_path(filename)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.segment_path = None
+        self.segment_file = None
+        self.segment_index = None
+
+    def _resume_segment(self, segment_path):
+        """Continue writing a segment, returning if it is usable."""
+        segment_index = SegmentIndex()
+        segment_end = 0
+        try:
+            for record, segment_end in read_segment(
+                    segment_path, with_offsets=True):
+                segment_index.add(record)
+            # Drop any partly written record left after a crash
+            os.truncate(segment_path, segment_end)
+            segment_file = open(  # pylint: disable=consider-using-with
+                segment_path, "ab")
+        except Exception as e:  # Start a new segment instead
+            LOGGER.warning("%s resuming binary log segment %s: %s",
+                           type(e).__name__, segment_path, e)
+            return False
+
+        # Remove the index, which is rewritten when the segment is closed
+        try:
+            os.remove(get_index_path(segment_path))
+        except FileNotFoundError:
+            pass
+        self.segment_path = segment_path
+        self.segment_file = segment_file
+        self.segment_index = segment_index
+        return True
+
+    def _open_segment(self):
+        os.makedirs(self.filename.parent, exist_ok=True)
+        segment_paths = get_segment_paths(self.filename)
+
+        # Continue the last segment if it has room, else start a new one
+        if not (segment_paths
+                and segment_paths[-1].stat().st_size < self.max_bytes
+                and self._resume_segment(segment_paths[-1])):
+            segment_number = 0
+            if segment_paths:
+                segment_number = int(
+                    segment_paths[-1].name[-SEGMENT_SUFFIX_DIGITS:]) + 1
+            self.segment_path = self.filename.with_name(
+                f"{self.filename.name}."
+                f"{segment_number:0>{SEGMENT_SUFFIX_DIGITS}}")
+            self.segment_file = open(  # pylint: disable=consider-using-with
+                self.segment_path, "ab")
+            self.segment_index = SegmentIndex()
+        segment_paths = [segment_path for segment_path in segment_paths
+                         if segment_path != self.segment_path]
+
+        # Index complete segments left unindexed, e.g. by a crash
+        for segment_path in segment_paths:
+            index_path = get_index_path(segment_path)
+            if not index_path.exists():
+                try:
+                    index_segment(segment_path).write(index_path)
+                except Exception as e:  # Still write to the segment
+                    LOGGER.warning("%s indexing binary log segment %s: %s",
+                                   type(e).__name__, segment_path, e)
+
+        # Remove the oldest segments past the backup count
+        for segment_path in segment_paths[
+                :max(len(segment_paths) - self.backup_count, 0)]:
+            for path_toremove in (segment_path, get_index_path(segment_path)):
+                try:
+                    os.remove(path_toremove)
+                except FileNotFoundError:
+                    pass
+
+    def _close_segment(self):
+        if self.segment_file is None:
+            return
+        self.segment_file.close()
+        self.segment_index.write(get_index_path(self.segment_path))
+        self.segment_file = None
+        self.segment_index = None
+
+    def emit(self, record):
+        try:
+            binary_record = BinaryLogRecord.from_log_record(
+                record, formatter=self.formatter)
+            if self.segment_file is None:
+                self._open_segment()
+            self.segment_file.write(binary_record.to_bytes())
+            self.segment_file.flush()
+            self.segment_index.add(binary_record)
+            if self.segment_file.tell() >= self.max_bytes:
+                self._close_segment()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.segment_file is not None:
+                self.segment_file.flush()
+        finally:
+            self.release()
+
+    def close(self):
+        self.acquire()
+        try:
+            self._close_segment()
+        finally:
+            self.release()
+            super().close()
@@ -0,0 +1,348 @@
+"""
+Fair cross-process arbitration of access to shared buses (e.g. RS-485).
+"""
+
+# Standard library imports
+import contextlib
+import logging
+import os
+from pathlib import Path
+import re
+import struct
+import tempfile
+import threading
+import time
+
+# Local imports
+import brokkr.utils.metrics
+import brokkr.utils.misc
+
+try:
+    import fcntl
+except ModuleNotFoundError:  # Not present on Windows
+    fcntl = None  # pylint: disable=invalid-name
+
+
+LOCK_PATH_DEFAULT = Path(tempfile.gettempdir())
+LOCK_FILENAME_TEMPLATE = "brokkr_bus_{device_name}.lock"
+
+# Next ticket, ticket now serving, time (ns) it started, if it was claimed
+# and the time (ns) after which its holder is presumed dead (0 for default)
+LOCK_STATE_FORMAT = "!QQqQQ"
+
+POLL_INTERVAL_S_DEFAULT = 0.001
+CLAIM_TIMEOUT_S_DEFAULT = 0.25
+STALE_TIMEOUT_S_DEFAULT = 10
+ACQUIRE_TIMEOUT_S_DEFAULT = 30
+
+LOGGER = logging.getLogger(__name__)
+
+
+# --- Helper classes --- #
+
+class BusStats(brokkr.utils.misc.AutoReprMixin):
+    def __init__(self):
+        self.n_transactions = 0
+        self.n_contended = 0
+        self.n_timeouts = 0
+        self.wait_s_total = 0
+        self.wait_s_max = 0
+        self.hold_s_total = 0
+        self.hold_s_max = 0
+
+    def record(self, wait_s, hold_s, contended=False):
+        self.n_transactions += 1
+        self.n_contended += bool(contended)
+        self.wait_s_total += wait_s
+        self.wait_s_max = max(self.wait_s_max, wait_s)
+        self.hold_s_total += hold_s
+        self.hold_s_max = max(self.hold_s_max, hold_s)
+
+    def summarize(self):
+        n_transactions = max(self.n_transactions, 1)
+        return {
+            "n_transactions": self.n_transactions,
+            "n_contended": self.n_contended,
+            "n_timeouts": self.n_timeouts,
+            "wait_s_mean": self.wait_s_total / n_transactions,
+            "wait_s_max": self.wait_s_max,
+            "hold_s_mean": self.hold_s_total / n_transactions,
+            "hold_s_max": self.hold_s_max,
+            }
+
+
+# --- Core classes --- #
+
+class BusArbiter(brokkr.utils.misc.AutoReprMixin):
+    def __init__(
+            self,
+            device,
+            lock_path=LOCK_PATH_DEFAULT,
+            poll_interval_s=POLL_INTERVAL_S_DEFAULT,
+            claim_timeout_s=CLAIM_TIMEOUT_S_DEFAULT,
+            stale_timeout_s=STALE_TIMEOUT_S_DEFAULT,
+                ):
+        """
+        Arbitrate access to a bus shared by multiple processes and threads.
+
+        Transactions are served strictly first-come, first-served with a
+        ticket lock, the state of which is kept in a small lock file
+        guarded by an exclusive ``flock``. This avoids overlapping
+        requests while interleaving every contender fairly.
+
+        Parameters
+        ----------
+        device : str
+            Path or name of the bus device, e.g. ``/dev/ttyUSB0``.
+        lock_path : str or pathlib.Path, optional
+            Directory to create the lock file in.
+            By default, the system temporary directory.
+        poll_interval_s : float, optional
+            Interval at which to check if it is this ticket's turn, in s.
+        claim_timeout_s : float, optional
+            Time after which a ticket that came up but was never claimed
+            (e.g. the waiter gave up or died) is skipped, in s.
+        stale_timeout_s : float, optional
+            Time after which a claimed ticket is presumed held by a dead
+            process and is skipped, in s, unless its transaction
+            specified its own. The default is 10 s.
+
+        """
+        self.device = device
+        device_name = re.sub(r"[^\w.-]", "_", str(device).strip("/"))
+        self.lock_file_path = (brokkr.utils.misc.convert_path(lock_path)
+                               / LOCK_FILENAME_TEMPLATE.format(
+                                   device_name=device_name))
+        self.poll_interval_s = poll_interval_s
+        self.claim_timeout_s = claim_timeout_s
+        self.stale_timeout_s = stale_timeout_s
+
+        self.stats = {}
+        self._thread_lock = threading.Lock()
+        self._fd = None
+        self._fd_pid = None
+
+    def _open(self):
+        # Flock is per open file, so don't reuse one inherited via fork
+        if self._fd is None or self._fd_pid != os.getpid():
+            os.makedirs(self.lock_file_path.parent, exist_ok=True)
+            self._fd = os.open(
+                self.lock_file_path, os.O_RDWR | os.O_CREAT, 0o666)
+            self._fd_pid = os.getpid()
+        return self._fd
+
+    @contextlib.contextmanager
+    def _locked_state(self):
+        with self._thread_lock:
+            fd = self._open()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                state_size = struct.calcsize(LOCK_STATE_FORMAT)
+                state_bytes = os.pread(fd, state_size, 0)
+                if len(state_bytes) < state_size:
+                    state = [0, 0, 0, 0, 0]
+                else:
+                    state = list(struct.unpack(LOCK_STATE_FORMAT, state_bytes))
+                state_orig = list(state)
+                yield state
+                if state != state_orig:
+                    os.pwrite(fd, struct.pack(LOCK_STATE_FORMAT, *state), 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _take_ticket(self):
+        with self._locked_state() as state:
+            ticket = state[0]
+            state[0] += 1
+            if state[1] == ticket:
+                state[2] = brokkr.utils.misc.monotonic_ns()
+                state[3] = 0
+        return ticket
+
+    def _try_claim(self, ticket, hold_timeout_s=None):
+        """
+        Claim the bus if it is this ticket's turn.
+
+        Returns
+        -------
+        claimed : bool
+            Whether the bus was claimed.
+        ticket : int
+            The ticket to keep waiting on, which is a new one at the back
+            of the line if the previous was skipped while not polled.
+
+        """
+        hold_timeout_ns = round(
+            (hold_timeout_s or 0) * brokkr.utils.misc.NS_IN_S)
+        with self._locked_state() as state:
+            now = brokkr.utils.misc.monotonic_ns()
+            if state[1] > ticket:
+                LOGGER.warning(
+                    "Ticket %s on bus %s was skipped; taking ticket %s",
+                    ticket, self.device, state[0])
+                ticket = state[0]
+                state[0] += 1
+                if state[1] == ticket:
+                    state[2] = now
+                    state[3] = 0
+            if state[1] != ticket:
+                if state[3]:
+                    timeout_ns = state[4] or round(
+                        self.stale_timeout_s * brokkr.utils.misc.NS_IN_S)
+                else:
+                    timeout_ns = round(
+                        self.claim_timeout_s * brokkr.utils.misc.NS_IN_S)
+                if now - state[2] <= timeout_ns:
+                    return False, ticket
+                LOGGER.warning(
+                    "Skipping %s ticket %s on bus %s after %s s",
+                    "stale" if state[3] else "unclaimed", state[1],
+                    self.device, timeout_ns / brokkr.utils.misc.NS_IN_S)
+                state[1] += 1
+                state[2] = now
+                state[3] = 0
+                state[4] = 0
+                if state[1] != ticket:
+                    return False, ticket
+            state[2] = now
+            state[3] = 1
+            state[4] = hold_timeout_ns
+        return True, ticket
+
+    def acquire(self, timeout_s=ACQUIRE_TIMEOUT_S_DEFAULT,
+                hold_timeout_s=None):
+        """
+        Wait for this process' turn on the bus and acquire it.
+
+        Parameters
+        ----------
+        timeout_s : float, optional
+            Maximum time to wait for the bus, in s. The default is 30.
+        hold_timeout_s : float, optional
+            Time after which other contenders may presume this process
+            died holding the bus, in s. Should exceed the longest the
+            transaction can take. By default, their ``stale_timeout_s``.
+
+        Returns
+        -------
+        ticket : int or None
+            The ticket to pass to release(), or None if timed out.
+
+        """
+        if fcntl is None:
+            # Without flock, only arbitrate between threads in this process,
+            # holding the lock until release() is called with the ticket
+            # pylint: disable=consider-using-with
+            acquired = self._thread_lock.acquire(timeout=timeout_s)
+            return 0 if acquired else None
+
+        ticket = self._take_ticket()
+        deadline = time.monotonic() + timeout_s
+        while True:
+            claimed, ticket = self._try_claim(
+                ticket, hold_timeout_s=hold_timeout_s)
+            if claimed:
+                return ticket
+            if time.monotonic() > deadline:
+                return None
+            time.sleep(self.poll_interval_s)
+
+    def release(self, ticket):
+        """Release the bus, passing it to the next ticket in line."""
+        if fcntl is None:
+            self._thread_lock.release()
+            return
+        with self._locked_state() as state:
+            if state[1] == ticket:
+                state[1] += 1
+                state[2] = brokkr.utils.misc.monotonic_ns()
+                state[3] = 0
+                state[4] = 0
+
+    @contextlib.contextmanager
+    def transaction(self, unit=None, timeout_s=ACQUIRE_TIMEOUT_S_DEFAULT,
+                    hold_timeout_s=None):
+        """
+        Context manager to hold the bus for a transaction and track stats.
+
+        Parameters
+        ----------
+        unit : Any, optional
+            Unit (e.g. Modbus unit ID) to track the stats of the
+            transaction under. By default, tracks them under None.
+        timeout_s : float, optional
+            Maximum time to wait for the bus, in s. The default is 30.
+        hold_timeout_s : float, optional
+            Maximum time the transaction can hold the bus, after which
+            its holder is presumed dead, in s (see acquire()).
+
+        Raises
+        ------
+        TimeoutError
+            If the bus could not be acquired before the timeout.
+
+        """
+        unit_stats = self.stats.setdefault(unit, BusStats())
+        start_time = time.monotonic()
+        ticket = self.acquire(
+            timeout_s=timeout_s, hold_timeout_s=hold_timeout_s)
+        acquire_time = time.monotonic()
+        if ticket is None:
+            unit_stats.n_timeouts += 1
+            brokkr.utils.metrics.REGISTRY.increment(
+                self.device, "bus_timeouts")
+            raise TimeoutError(
+                f"Could not acquire bus {self.device} in {timeout_s} s")
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+            wait_s = acquire_time - start_time
+            hold_s = time.monotonic() - acquire_time
+            unit_stats.record(
+                wait_s=wait_s, hold_s=hold_s,
+                contended=wait_s > self.poll_interval_s)
+            for name, duration_s in (("bus_wait", wait_s),
+                                     ("bus_hold", hold_s)):
+                brokkr.utils.metrics.REGISTRY.get_histogram(
+                    self.device, name).record(
+                        int(duration_s * brokkr.utils.misc.NS_IN_S))
+
+    def get_stats(self):
+        """Get a summary of the latency and contention stats per unit."""
+        return {unit: unit_stats.summarize()
+                for unit, unit_stats in self.stats.items()}
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+# --- Utility functions --- #
+
+_BUS_ARBITERS = {}
+_BUS_ARBITERS_LOCK = threading.Lock()
+
+
+def get_bus_arbiter(device, **arbiter_kwargs):
+    """
+    Get the shared BusArbiter for a device, creating it if needed.
+
+    There is one arbiter per device in each process, as every user of the
+    bus must take part in the same arbitration. If it already exists with
+    different kwargs, those of the first caller are kept with a warning.
+    """
+    with _BUS_ARBITERS_LOCK:
+        try:
+            arbiter, first_kwargs = _BUS_ARBITERS[device]
+        except KeyError:
+            arbiter = BusArbiter(device, **arbiter_kwargs)
+            LOGGER.debug("Created bus arbiter %r", arbiter)
+            _BUS_ARBITERS[device] = (arbiter, arbiter_kwargs)
+            return arbiter
+    if arbiter_kwargs != first_kwargs:
+        LOGGER.warning(
+            "Bus arbiter for %s already set up with %r; ignoring %r",
+            device, first_kwargs, arbiter_kwargs)
+    return arbiter
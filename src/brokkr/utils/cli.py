@@ -246,6 +246,25 @@ def generate_argparser_main():
         "--timeout", dest="timeout_s", help="The timeout to use, in s")
     verbose_parsers.append(parser_netcat)
 
+    # Parser for the search-log subcommand
+    desc_search_log = "Search the binary log by time, level and logger"
+    parser_search_log = subparsers.add_parser(
+        "search-log", help=desc_search_log, description=desc_search_log,
+        argument_default=argparse.SUPPRESS)
+    parser_search_log.add_argument(
+        "log_path", nargs="?",
+        help="Base path of the binary log, if not that in the log config")
+    parser_search_log.add_argument(
+        "--start", help=("Earliest time to show records from, as a Unix "
+                         "timestamp or local YYYY-MM-DD[ HH:MM[:SS]]"))
+    parser_search_log.add_argument(
+        "--end", help="Latest time to show records from, in the same format")
+    parser_search_log.add_argument(
+        "--level", help="Minimum level of records to show, e.g. WARNING")
+    parser_search_log.add_argument(
+        "--logger", help="Only show records from this logger and children")
+    verbose_parsers.append(parser_search_log)
+
     # Add common parameters to subcommand groups
     for verbose_parser in verbose_parsers:
         verbose_parser.add_argument(
@@ -337,6 +356,9 @@ def dispatch_command(subcommand, parsed_args):
     elif subcommand == "netcat":
         import brokkr.utils.network
         brokkr.utils.network.netcat_main(**parsed_args)
+    elif subcommand == "search_log":
+        import brokkr.utils.binarylog
+        brokkr.utils.binarylog.search_log_main(**parsed_args)
     else:
         generate_argparser_main().print_usage()
 
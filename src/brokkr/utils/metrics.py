@@ -0,0 +1,379 @@
+"""
+Low-overhead, always-on performance metrics for pipelines and steps.
+"""
+
+# Standard library imports
+import array
+import datetime
+import json
+import logging
+import math
+import os
+from pathlib import Path
+import queue
+import re
+import threading
+import weakref
+
+# Local imports
+import brokkr.utils.misc
+
+
+# Buckets grow by 2**(1/4) (~19%) from 1 us, to cover up to ~4.6 min
+HISTOGRAM_MIN_NS = 1000
+HISTOGRAM_GROWTH_FACTOR = 2 ** 0.25
+HISTOGRAM_N_BUCKETS = 120
+HISTOGRAM_QUANTILES = (0.5, 0.95, 0.99)
+
+NS_IN_MS = int(1e6)
+
+METRICS_PUSH_INTERVAL_S_DEFAULT = 5
+PROMETHEUS_PREFIX = "brokkr_"
+
+LOGGER = logging.getLogger(__name__)
+
+
+# --- Core classes --- #
+
+class Histogram(brokkr.utils.misc.AutoReprMixin):
+    def __init__(
+            self,
+            min_value=HISTOGRAM_MIN_NS,
+            growth_factor=HISTOGRAM_GROWTH_FACTOR,
+            n_buckets=HISTOGRAM_N_BUCKETS,
+                ):
+        """
+        Fixed-size histogram of durations, with logarithmic buckets.
+
+        Recording is O(1) and memory is constant regardless of the number
+        of samples, at the cost of quantiles only being accurate to within
+        one bucket width. Recording and summarizing are thread safe.
+
+        Parameters
+        ----------
+        min_value : int, optional
+            Upper bound of the first bucket, in ns. The default is 1 us.
+        growth_factor : float, optional
+            Ratio of each bucket's upper bound to the last.
+        n_buckets : int, optional
+            Number of buckets; the last also holds any larger values.
+
+        """
+        self.min_value = min_value
+        self.growth_factor = growth_factor
+        self.n_buckets = n_buckets
+        self._log_growth = math.log(growth_factor)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.bucket_counts = array.array("Q", [0] * self.n_buckets)
+            self.count = 0
+            self.error_count = 0
+            self.total = 0
+            self.max_value = 0
+
+    def record(self, value, error=False):
+        """Record one sample, e.g. a duration in ns."""
+        if value <= self.min_value:
+            bucket_idx = 0
+        else:
+            bucket_idx = min(
+                math.ceil(math.log(value / self.min_value) / self._log_growth),
+                self.n_buckets - 1)
+        with self._lock:
+            self.bucket_counts[bucket_idx] += 1
+            self.count += 1
+            self.error_count += bool(error)
+            self.total += value
+            self.max_value = max(self.max_value, value)
+
+    def get_bucket_bound(self, bucket_idx):
+        return self.min_value * self.growth_factor ** bucket_idx
+
+    def get_quantile(self, quantile):
+        """Get the upper bound of the bucket the given quantile falls in."""
+        if not self.count:
+            return None
+        target_count = quantile * self.count
+        cumulative_count = 0
+        for bucket_idx, bucket_count in enumerate(self.bucket_counts):
+            cumulative_count += bucket_count
+            if cumulative_count >= target_count and bucket_count:
+                return min(self.get_bucket_bound(bucket_idx), self.max_value)
+        return self.max_value
+
+    def summarize(self, scale=NS_IN_MS, quantiles=HISTOGRAM_QUANTILES):
+        """Summarize the histogram, by default with values in ms."""
+        with self._lock:
+            summary = {
+                "count": self.count,
+                "error_count": self.error_count,
+                "sum": self.total / scale,
+                "mean": (self.total / self.count / scale
+                         if self.count else None),
+                "max": self.max_value / scale if self.count else None,
+                }
+            for quantile in quantiles:
+                value = self.get_quantile(quantile)
+                summary[f"p{round(quantile * 100)}"] = (
+                    None if value is None else value / scale)
+        return summary
+
+
+class MetricsRegistry(brokkr.utils.misc.AutoReprMixin):
+    def __init__(self):
+        """Registry of the metrics recorded in this process."""
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self._owner_objects = {}
+        self._lock = threading.Lock()
+
+    def claim_owner(self, owner, owner_object):
+        """
+        Get a name to record an object's metrics under, unique to it.
+
+        If another live object already records its metrics under the name,
+        a numeric suffix is added, so e.g. pipelines sharing a name don't
+        mix their metrics.
+        """
+        with self._lock:
+            unique_owner = owner
+            n_owner = 1
+            while True:
+                owner_ref = self._owner_objects.get(unique_owner, None)
+                claimed_object = None if owner_ref is None else owner_ref()
+                if claimed_object is None or claimed_object is owner_object:
+                    break
+                n_owner += 1
+                unique_owner = f"{owner}_{n_owner}"
+            self._owner_objects[unique_owner] = weakref.ref(owner_object)
+        return unique_owner
+
+    def get_histogram(self, owner, name):
+        """Get the histogram for a metric of an owner, e.g. a pipeline."""
+        with self._lock:
+            try:
+                return self.histograms[(owner, name)]
+            except KeyError:
+                histogram = Histogram()
+                self.histograms[(owner, name)] = histogram
+                return histogram
+
+    def increment(self, owner, name, value=1):
+        """Increment a counter of an owner, e.g. a step, by a value."""
+        with self._lock:
+            self.counters[(owner, name)] = (
+                self.counters.get((owner, name), 0) + value)
+
+    def set_counter(self, owner, name, value):
+        """Set a counter to a total that is accumulated elsewhere."""
+        with self._lock:
+            self.counters[(owner, name)] = value
+
+    def set_gauge(self, owner, name, value):
+        """Set a gauge of an owner, e.g. a queue, to its current value."""
+        with self._lock:
+            self.gauges[(owner, name)] = value
+
+    def snapshot(self):
+        """Get a picklable summary of all the metrics, in seconds."""
+        with self._lock:
+            histograms = list(self.histograms.items())
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+        return {
+            "histograms": {
+                key: histogram.summarize(scale=brokkr.utils.misc.NS_IN_S)
+                for key, histogram in histograms},
+            "counters": counters,
+            "gauges": gauges,
+            }
+
+    def query(self, owner=None):
+        """
+        Summarize the histograms, by default with values in ms.
+
+        Parameters
+        ----------
+        owner : str, optional
+            Only include the metrics of this owner, e.g. a pipeline name.
+            By default, include all owners.
+
+        Returns
+        -------
+        summaries : dict[str, dict[str, dict[str, Any]]]
+            Summary of each metric by owner and metric name.
+
+        """
+        summaries = {}
+        with self._lock:
+            histograms = list(self.histograms.items())
+        for (metric_owner, name), histogram in histograms:
+            if owner is not None and metric_owner != owner:
+                continue
+            summaries.setdefault(metric_owner, {})[name] = (
+                histogram.summarize())
+        return summaries
+
+    def write(self, output_path, owner=None):
+        """Atomically write the summarized metrics to a JSON file."""
+        output_path = brokkr.utils.misc.convert_path(output_path)
+        os.makedirs(output_path.parent, exist_ok=True)
+        metrics_data = {
+            "time": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "pid": os.getpid(),
+            "metrics": self.query(owner=owner),
+            }
+        temp_path = Path(f"{output_path}.{os.getpid()}.tmp")
+        with open(temp_path, mode="w", encoding="utf-8") as metrics_file:
+            json.dump(metrics_data, metrics_file, indent=4)
+        os.replace(temp_path, output_path)
+
+    def reset(self):
+        with self._lock:
+            histograms = list(self.histograms.values())
+            self.counters.clear()
+            self.gauges.clear()
+        for histogram in histograms:
+            histogram.reset()
+
+
+class MetricsPusher(brokkr.utils.misc.AutoReprMixin):
+    def __init__(
+            self,
+            metrics_queue,
+            source,
+            registry=None,
+            interval_s=METRICS_PUSH_INTERVAL_S_DEFAULT,
+                ):
+        """
+        Periodically push registry snapshots to a queue from a thread.
+
+        Snapshots are taken off the pipeline thread and are dropped rather
+        than blocking if the queue is full, so the pipeline isn't slowed.
+
+        Parameters
+        ----------
+        metrics_queue : multiprocessing.Queue
+            Queue to put tuples of the source and snapshot on.
+        source : str
+            Name to identify the snapshots by, e.g. the worker name.
+        registry : MetricsRegistry, optional
+            Registry to push. By default, this process' registry.
+        interval_s : float, optional
+            Interval to push snapshots at, in s. The default is 5.
+
+        """
+        self.metrics_queue = metrics_queue
+        self.source = source
+        self.registry = REGISTRY if registry is None else registry
+        self.interval_s = interval_s
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def push(self):
+        try:
+            self.metrics_queue.put_nowait(
+                (self.source, self.registry.snapshot()))
+        except queue.Full:
+            LOGGER.debug("Metrics queue full, dropping snapshot from %s",
+                         self.source)
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval_s):
+            try:
+                self.push()
+            except Exception as e:
+                LOGGER.error("%s pushing metrics from %s: %s",
+                             type(e).__name__, self.source, e)
+                LOGGER.info("Error details:", exc_info=True)
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="MetricsPusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+# --- Output functions --- #
+
+def _format_prometheus_name(name):
+    return PROMETHEUS_PREFIX + re.sub(r"[^a-zA-Z0-9_]", "_", str(name))
+
+
+def _format_prometheus_labels(**labels):
+    label_strs = []
+    for label_name, label_value in labels.items():
+        label_value = (str(label_value).replace("\\", "\\\\")
+                       .replace('"', '\\"').replace("\n", "\\n"))
+        label_strs.append(f'{label_name}="{label_value}"')
+    return "{" + ",".join(label_strs) + "}"
+
+
+def render_prometheus(snapshots):
+    """
+    Render metric snapshots in the Prometheus text exposition format.
+
+    Parameters
+    ----------
+    snapshots : dict[str, dict]
+        Snapshots from ``MetricsRegistry.snapshot()``, keyed by source
+        (e.g. worker name), which becomes the ``source`` label.
+
+    Returns
+    -------
+    metrics_text : str
+        The rendered metrics.
+
+    """
+    metric_lines = {}
+    for source, snapshot in snapshots.items():
+        for (owner, name), summary in snapshot["histograms"].items():
+            if not summary["count"]:
+                continue
+            labels = {"source": source, "owner": owner, "metric": name}
+            lines = metric_lines.setdefault(
+                ("duration_seconds", "summary"), [])
+            for summary_key, summary_value in summary.items():
+                if (not summary_key.startswith("p")
+                        or summary_value is None):
+                    continue
+                quantile = int(summary_key[1:]) / 100
+                lines.append(_format_prometheus_labels(
+                    **labels, quantile=quantile) + f" {summary_value}")
+            metric_lines.setdefault(
+                ("duration_seconds_sum", None), []).append(
+                    _format_prometheus_labels(**labels)
+                    + f" {summary['sum']}")
+            metric_lines.setdefault(
+                ("duration_seconds_count", None), []).append(
+                    _format_prometheus_labels(**labels)
+                    + f" {summary['count']}")
+            metric_lines.setdefault(("errors_total", "counter"), []).append(
+                _format_prometheus_labels(**labels)
+                + f" {summary['error_count']}")
+        for metric_type, metric_values in (
+                ("counter", snapshot["counters"]),
+                ("gauge", snapshot["gauges"])):
+            for (owner, name), value in metric_values.items():
+                if metric_type == "counter":
+                    name = f"{name}_total"
+                metric_lines.setdefault((name, metric_type), []).append(
+                    _format_prometheus_labels(source=source, owner=owner)
+                    + f" {value}")
+
+    output_lines = []
+    for (name, metric_type), lines in metric_lines.items():
+        full_name = _format_prometheus_name(name)
+        if metric_type is not None:
+            output_lines.append(f"# TYPE {full_name} {metric_type}")
+        output_lines += [full_name + line for line in lines]
+    return "\n".join(output_lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
@@ -7,16 +7,17 @@
 import copy
 import functools
 import getpass
+import importlib
 import logging
 import multiprocessing
 import operator
 import os
 from pathlib import Path
 import signal
+import sys
+import threading
 import time
-
-# Third party imports
-import packaging.version
+import types
 
 # Local imports
 import brokkr
@@ -33,6 +34,115 @@
 CLI_INVOKED_ENV_VAR = "BROKKR_CLI_INVOKED"
 
 
+# --- Lazy loading --- #
+
+class LazyModule(types.ModuleType):
+    def __init__(self, name):
+        """
+        Stand-in for a module that is only imported on first attribute use.
+
+        Unlike ``importlib.util.LazyLoader``, nothing is imported up front,
+        not even the parent packages of a submodule. Once imported, the
+        module's attributes are copied over, so later access is direct.
+
+        Parameters
+        ----------
+        name : str
+            Full name of the module to import, e.g. ``pymodbus.client.sync``.
+
+        """
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+
+    def load(self):
+        if self._lazy_module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__.update(module.__dict__)
+            self.__dict__["_lazy_module"] = module
+        return self._lazy_module
+
+    def __getattr__(self, name):
+        if name.startswith("__") or self._lazy_module is not None:
+            raise AttributeError(
+                f"module {self.__name__!r} has no attribute {name!r}")
+        return getattr(self.load(), name)
+
+
+_LAZY_MODULES = {}
+
+
+def lazy_import(module_name):
+    """Get a module that is imported when an attribute is first accessed."""
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    return _LAZY_MODULES.setdefault(module_name, LazyModule(module_name))
+
+
+def load_lazy_modules(logger=None):
+    """Import all lazy modules not yet loaded, e.g. before forking."""
+    n_loaded = 0
+    for module_name, lazy_module in list(_LAZY_MODULES.items()):
+        try:
+            lazy_module.load()
+        except Exception as e:  # Leave the error for when the module's used
+            if logger is not None:
+                logger.debug("%s loading lazy module %s: %s",
+                             type(e).__name__, module_name, e)
+        else:
+            n_loaded += 1
+    return n_loaded
+
+
+def set_lazy_attributes(module_name, load_attributes):
+    """
+    Set a module's attributes via a loader only when one is first accessed.
+
+    Uses a module ``__getattr__`` (PEP 562), so on Python < 3.7 the
+    attributes are instead loaded immediately. Declare the attributes
+    in the module with a bare annotation (e.g. ``CONFIG: dict``), which
+    makes them known to static analysis without setting them.
+
+    Parameters
+    ----------
+    module_name : str
+        Name of the module to set the attributes of, i.e. ``__name__``.
+    load_attributes : Callable[[], dict[str, Any]]
+        Function that returns the attributes to set on the module.
+
+    """
+    module = sys.modules[module_name]
+    if sys.version_info < (3, 7):
+        module.__dict__.update(load_attributes())
+        return
+
+    load_lock = threading.RLock()
+    load_state = {"loading": False}
+
+    def __getattr__(name):
+        # Don't load on introspection, or when loading already (circular)
+        if not name.startswith("__"):
+            with load_lock:
+                if (module.__dict__.get("__getattr__", None) is __getattr__
+                        and not load_state["loading"]):
+                    load_state["loading"] = True
+                    try:
+                        module.__dict__.update(load_attributes())
+                        del module.__dict__["__getattr__"]
+                    finally:
+                        load_state["loading"] = False
+        try:
+            return module.__dict__[name]
+        except KeyError:
+            raise AttributeError(
+                f"module {module_name!r} has no attribute {name!r}") from None
+
+    module.__getattr__ = __getattr__
+
+
+# Third party imports (loaded on first use)
+packaging_version = lazy_import("packaging.version")
+
+
 # --- Time functions --- #
 
 def time_ns():
@@ -51,6 +161,14 @@ def monotonic_ns():
         return int(time.monotonic() * NS_IN_S)
 
 
+def perf_counter_ns():
+    # Fallback to non-ns time functions on <= Python 3.6
+    try:
+        return time.perf_counter_ns()
+    except AttributeError:
+        return int(time.perf_counter() * NS_IN_S)
+
+
 START_TIME = monotonic_ns()
 
 
@@ -222,8 +340,8 @@ def check_system_version(metadata, logger):
             ("brokkr_version_max", "less than", operator.le),
                 ]:
         if metadata[key_name] and func(
-                packaging.version.parse(metadata[key_name]),
-                packaging.version.parse(brokkr.__version__)):
+                packaging_version.parse(metadata[key_name]),
+                packaging_version.parse(brokkr.__version__)):
             logger(
                 "%s supported Brokkr version %s of system %s "
                 "is %s current Brokkr version %s",
@@ -262,6 +380,10 @@ def _quit_handler(signo, _frame):
 
 def set_signal_handler(signal_handler, signals=SIGNALS_SET):
     """Helper function that sets a signal handler for the given signals."""
+    # Signal handlers can only be set in the main thread, e.g. not in
+    # thread workers, which rely on the main process' handler instead
+    if threading.current_thread() is not threading.main_thread():
+        return
     for signal_type in signals:
         try:
             signal.signal(getattr(signal, signal_type), signal_handler)
@@ -273,14 +395,132 @@ def _pass_func():
     pass
 
 
+CATCHUP_POLICIES = {"skip", "burst", "coalesce"}
+CATCHUP_POLICY_DEFAULT = "skip"
+
+
+class PeriodicStats(AutoReprMixin):
+    def __init__(self):
+        """Scheduling stats of a periodic loop."""
+        self.n_ticks = 0
+        self.n_overruns = 0
+        self.n_skipped = 0
+        self.lateness_ns_last = 0
+        self.lateness_ns_max = 0
+        self.lateness_ns_total = 0
+
+    def record_tick(self, lateness_ns):
+        self.n_ticks += 1
+        self.lateness_ns_last = lateness_ns
+        self.lateness_ns_total += lateness_ns
+        self.lateness_ns_max = max(self.lateness_ns_max, lateness_ns)
+
+    def summarize(self):
+        return {
+            "n_ticks": self.n_ticks,
+            "n_overruns": self.n_overruns,
+            "n_skipped": self.n_skipped,
+            "lateness_s_mean": (self.lateness_ns_total / self.n_ticks / NS_IN_S
+                                if self.n_ticks else None),
+            "lateness_s_max": self.lateness_ns_max / NS_IN_S,
+            }
+
+
+def schedule_next_tick(
+        scheduled_time,
+        start_time,
+        period_ns,
+        catchup_policy=CATCHUP_POLICY_DEFAULT,
+        stats=None,
+        logger=None,
+        ):
+    """
+    Get the time of the next tick of a periodic loop after one finishes.
+
+    Parameters
+    ----------
+    scheduled_time : int
+        Time the tick that just finished was scheduled for, in ns.
+    start_time : int
+        Time the tick that just finished actually started, in ns.
+    period_ns : int
+        The period of the loop, in ns.
+    catchup_policy : str, optional
+        What to do with missed ticks; see ``run_periodic``.
+    stats : PeriodicStats, optional
+        Object to count overruns and skipped ticks in.
+    logger : logging.Logger, optional
+        Logger to report missed ticks to.
+
+    Returns
+    -------
+    next_time : int
+        Monotonic time to run the next tick at, in ns.
+
+    """
+    if stats is None:
+        stats = PeriodicStats()
+    current_time = monotonic_ns()
+    if current_time - start_time > period_ns:
+        stats.n_overruns += 1
+    next_time = (scheduled_time + period_ns
+                 - (scheduled_time - START_TIME) % period_ns)
+    if current_time >= next_time:
+        n_missed = (current_time - next_time) // period_ns + 1
+        if catchup_policy == "skip":
+            next_time += n_missed * period_ns
+            stats.n_skipped += n_missed
+        elif catchup_policy == "coalesce":
+            next_time = current_time
+            stats.n_skipped += n_missed - 1
+        if logger and catchup_policy != "burst":
+            logger.debug(
+                "Tick overran by %s ms, %s %s missed ticks",
+                round((current_time - scheduled_time) / 1e6, 3),
+                "skipped" if catchup_policy == "skip" else "coalesced",
+                n_missed)
+    return next_time
+
+
 def run_periodic(
         func=None,
         period_s=0,
         exit_event=None,
         outer_exit_event=None,
         logger=None,
+        catchup_policy=CATCHUP_POLICY_DEFAULT,
+        stats=None,
         ):
-    """Decorator to run a function at a periodic interval w/signal handling."""
+    """
+    Decorator to run a function at a periodic interval w/signal handling.
+
+    Ticks are aligned to multiples of the period since startup. If a tick
+    overruns past the next one, the catchup policy determines what happens
+    to the missed ticks: ``skip`` them and wait for the next one on the
+    grid, ``burst`` through each of them back to back, or ``coalesce``
+    them into one tick run immediately.
+
+    Parameters
+    ----------
+    func : Callable, optional
+        The function to run each tick. By default, does nothing.
+    period_s : float, optional
+        The period to run the function at, in s. If 0, runs continuously.
+    exit_event : multiprocessing.Event, optional
+        Event that, once set, stops waiting between ticks. By default,
+        one is created and set by the quit signal handler.
+    outer_exit_event : multiprocessing.Event, optional
+        Event that, once set, stops the loop. By default, ``exit_event``.
+    logger : logging.Logger, optional
+        Logger to use. By default, this module's.
+    catchup_policy : str, optional
+        What to do with missed ticks; ``skip`` (the default), ``burst``
+        or ``coalesce``.
+    stats : PeriodicStats, optional
+        Object to record the lateness of each tick, and the number of
+        overruns and skipped ticks in. By default, a new one is used.
+
+    """
     if func is None:
         func = _pass_func
     if exit_event is None:
@@ -289,6 +529,11 @@ def run_periodic(
         outer_exit_event = exit_event
     if logger is None:
         logger = logging.getLogger(__name__)
+    if catchup_policy not in CATCHUP_POLICIES:
+        raise ValueError(f"Catchup policy must be one of {CATCHUP_POLICIES}, "
+                         f"not {catchup_policy!r}")
+    if stats is None:
+        stats = PeriodicStats()
 
     @functools.wraps(func)
     def _run_periodic(*args, **kwargs):
@@ -298,17 +543,31 @@ def _run_periodic(*args, **kwargs):
         set_signal_handler(generate_quit_handler(exit_event, logger=logger))
 
         # Mainloop to run at intervals
+        period_ns = int(period_s * NS_IN_S)
+        scheduled_time = monotonic_ns()
         while not outer_exit_event.is_set():
+            start_time = monotonic_ns()
+            stats.record_tick(max(start_time - scheduled_time, 0))
             func(*args, **kwargs)
 
-            if period_s <= 0:
+            if period_ns <= 0:
                 continue
-            next_time = (
-                monotonic_ns() + int(period_s * NS_IN_S)
-                - (monotonic_ns() - START_TIME)
-                % int(period_s * NS_IN_S))
-            while not exit_event.is_set() and monotonic_ns() < next_time:
-                time.sleep(max(0, min(
-                    [SLEEP_TICK_S, (next_time - monotonic_ns()) / NS_IN_S])))
+            next_time = schedule_next_tick(
+                scheduled_time=scheduled_time,
+                start_time=start_time,
+                period_ns=period_ns,
+                catchup_policy=catchup_policy,
+                stats=stats,
+                logger=logger,
+                )
+            scheduled_time = next_time
+
+            # Sleep in bounded steps rather than waiting on the event, as
+            # the quit handler sets it and can interrupt a wait on it
+            while not exit_event.is_set():
+                remaining_s = (next_time - monotonic_ns()) / NS_IN_S
+                if remaining_s <= 0:
+                    break
+                time.sleep(min(remaining_s, SLEEP_TICK_S))
 
     return _run_periodic
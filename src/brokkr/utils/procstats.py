@@ -0,0 +1,174 @@
+"""
+Cheap process and system resource statistics read from Linux's /proc.
+"""
+
+# Standard library imports
+import logging
+import os
+from pathlib import Path
+import time
+
+# Local imports
+import brokkr.utils.misc
+
+
+PROC_PATH = Path("/proc")
+DISK_DEVICE_DEFAULT = "mmcblk0"
+SECTOR_SIZE_BYTES = 512
+
+try:
+    CLOCK_TICKS_PER_S = os.sysconf("SC_CLK_TCK")
+    PAGE_SIZE_BYTES = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError):  # Not present on Windows
+    CLOCK_TICKS_PER_S = 100
+    PAGE_SIZE_BYTES = 4096
+
+# Indices of the fields in /proc/<pid>/stat, after the command name
+STAT_FIELD_UTIME = 11
+STAT_FIELD_STIME = 12
+STAT_FIELD_NUM_THREADS = 17
+STAT_FIELD_RSS = 21
+
+# Source file (or directory) each statistic is read from
+PROCESS_STATS = {
+    "cpu_time_s": "stat",
+    "cpu_percent": "stat",
+    "num_threads": "stat",
+    "rss_bytes": "stat",
+    "ctx_switches_voluntary": "status",
+    "ctx_switches_involuntary": "status",
+    "io_read_bytes": "io",
+    "io_write_bytes": "io",
+    "open_fds": "fd",
+    }
+SYSTEM_STATS = {
+    "load_1m": "loadavg",
+    "load_5m": "loadavg",
+    "load_15m": "loadavg",
+    "disk_read_bytes": "diskstats",
+    "disk_write_bytes": "diskstats",
+    }
+STATS = {**PROCESS_STATS, **SYSTEM_STATS}
+
+LOGGER = logging.getLogger(__name__)
+
+
+# --- Core classes --- #
+
+class ProcessStatsReader(brokkr.utils.misc.AutoReprMixin):
+    def __init__(
+            self,
+            proc_path=PROC_PATH / "self",
+            disk_device=DISK_DEVICE_DEFAULT,
+                ):
+        """
+        Read resource usage stats of a process and the system from /proc.
+
+        Only the files needed for the requested stats are read, each once
+        per call, so reading a few stats costs a few small reads.
+
+        Parameters
+        ----------
+        proc_path : str or pathlib.Path, optional
+            The /proc directory of the process (or task) to read stats of.
+            By default, the current process' (``/proc/self``).
+        disk_device : str, optional
+            Block device to read the system disk I/O of, e.g. the SD card.
+
+        """
+        self.proc_path = brokkr.utils.misc.convert_path(proc_path)
+        self.disk_device = disk_device
+        self._last_cpu_time_s = None
+        self._last_read_time = None
+
+    def read_stat(self):
+        stat_text = (self.proc_path / "stat").read_text()
+        # The command name may contain spaces, so split after it
+        fields = stat_text[stat_text.rindex(")") + 2:].split()
+        cpu_time_s = ((int(fields[STAT_FIELD_UTIME])
+                       + int(fields[STAT_FIELD_STIME])) / CLOCK_TICKS_PER_S)
+
+        read_time = time.monotonic()
+        cpu_percent = None
+        if (self._last_read_time is not None
+                and read_time > self._last_read_time):
+            cpu_percent = round(
+                100 * (cpu_time_s - self._last_cpu_time_s)
+                / (read_time - self._last_read_time), 2)
+        self._last_cpu_time_s = cpu_time_s
+        self._last_read_time = read_time
+
+        return {
+            "cpu_time_s": cpu_time_s,
+            "cpu_percent": cpu_percent,
+            "num_threads": int(fields[STAT_FIELD_NUM_THREADS]),
+            "rss_bytes": int(fields[STAT_FIELD_RSS]) * PAGE_SIZE_BYTES,
+            }
+
+    def read_status(self):
+        status = {}
+        for line in (self.proc_path / "status").read_text().splitlines():
+            key, __, value = line.partition(":")
+            status[key] = value.strip()
+        return {
+            "ctx_switches_voluntary": int(status["voluntary_ctxt_switches"]),
+            "ctx_switches_involuntary": int(
+                status["nonvoluntary_ctxt_switches"]),
+            }
+
+    def read_io(self):
+        io_stats = {}
+        for line in (self.proc_path / "io").read_text().splitlines():
+            key, __, value = line.partition(":")
+            io_stats[key] = int(value)
+        return {
+            "io_read_bytes": io_stats["read_bytes"],
+            "io_write_bytes": io_stats["write_bytes"],
+            }
+
+    def read_fd(self):
+        return {"open_fds": len(os.listdir(self.proc_path / "fd"))}
+
+    @staticmethod
+    def read_loadavg():
+        load_avgs = (PROC_PATH / "loadavg").read_text().split()[:3]
+        return {
+            name: float(load_avg) for name, load_avg
+            in zip(("load_1m", "load_5m", "load_15m"), load_avgs)}
+
+    def read_diskstats(self):
+        for line in (PROC_PATH / "diskstats").read_text().splitlines():
+            fields = line.split()
+            if len(fields) > 9 and fields[2] == self.disk_device:
+                return {
+                    "disk_read_bytes": int(fields[5]) * SECTOR_SIZE_BYTES,
+                    "disk_write_bytes": int(fields[9]) * SECTOR_SIZE_BYTES,
+                    }
+        raise ValueError(f"Disk device {self.disk_device!r} not found")
+
+    def read(self, stats=None):
+        """
+        Read the given stats.
+
+        Parameters
+        ----------
+        stats : Iterable[str], optional
+            Names of the stats to read, from ``STATS``. By default, all.
+
+        Returns
+        -------
+        stat_values : dict[str, Any]
+            Value of each stat, or None if it could not be read.
+
+        """
+        if stats is None:
+            stats = STATS.keys()
+        sources = {STATS[stat] for stat in stats}
+        stat_values = {}
+        for source in sources:
+            try:
+                stat_values.update(getattr(self, f"read_{source}")())
+            except (OSError, ValueError, IndexError, KeyError) as e:
+                LOGGER.debug("%s reading %s stats from %s: %s",
+                             type(e).__name__, source, self.proc_path, e)
+        return {stat: stat_values.get(stat, None) for stat in stats}
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Check that the Brokkr CLI cold-starts within an import time budget.
+
+Runs the CLI in fresh interpreters with ``-X importtime`` (Python 3.7+),
+totals the time spent importing modules, prints the slowest imports and
+exits with an error if the fastest run exceeds the budget.
+
+Example: ``python tools/check_importtime.py --budget-ms 200 -- --version``
+"""
+
+# Standard library imports
+import argparse
+import os
+from pathlib import Path
+import subprocess
+import sys
+
+
+BUDGET_MS_DEFAULT = 200
+N_RUNS_DEFAULT = 5
+N_SLOWEST_DEFAULT = 10
+CLI_ARGS_DEFAULT = ("--version",)
+
+IMPORTTIME_PREFIX = "import time:"
+
+# Source dir of the checkout, so it runs without installing the package
+SRC_PATH = Path(__file__).resolve().parent.parent / "src"
+
+
+def parse_importtime(importtime_output):
+    """
+    Parse the output of ``-X importtime`` into per-module times.
+
+    Parameters
+    ----------
+    importtime_output : str
+        The stderr of a process run with ``-X importtime``.
+
+    Returns
+    -------
+    import_times : list of tuple(str, int, int, int)
+        The module name, nesting depth, and self and cumulative import
+        time in us of each module imported, in the order they finished.
+
+    """
+    import_times = []
+    for line in importtime_output.splitlines():
+        if not line.startswith(IMPORTTIME_PREFIX):
+            continue
+        try:
+            self_us, cumulative_us, module_name = (
+                line[len(IMPORTTIME_PREFIX):].split("|"))
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+        except ValueError:  # Header line
+            continue
+        depth = (len(module_name) - len(module_name.lstrip())) // 2
+        import_times.append(
+            (module_name.strip(), depth, self_us, cumulative_us))
+    return import_times
+
+
+def measure_importtime(cli_args=CLI_ARGS_DEFAULT):
+    """Run the CLI once with ``-X importtime`` and parse its import times."""
+    cli_env = dict(os.environ)
+    python_paths = [str(SRC_PATH)]
+    if cli_env.get("PYTHONPATH", None):
+        python_paths.append(cli_env["PYTHONPATH"])
+    cli_env["PYTHONPATH"] = os.pathsep.join(python_paths)
+    cli_process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "brokkr", *cli_args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        env=cli_env,
+        check=False,
+        )
+    if cli_process.returncode:
+        error_output = "\n".join(
+            line for line in cli_process.stderr.splitlines()
+            if not line.startswith(IMPORTTIME_PREFIX))
+        raise RuntimeError(
+            f"'brokkr {' '.join(cli_args)}' failed with exit code "
+            f"{cli_process.returncode}:\n{error_output}")
+    return parse_importtime(cli_process.stderr)
+
+
+def check_importtime(
+        budget_ms=BUDGET_MS_DEFAULT,
+        n_runs=N_RUNS_DEFAULT,
+        n_slowest=N_SLOWEST_DEFAULT,
+        cli_args=CLI_ARGS_DEFAULT,
+        ):
+    """
+    Check the CLI's total import time against a budget, printing a report.
+
+    Parameters
+    ----------
+    budget_ms : float, optional
+        Maximum total import time, in ms.
+    n_runs : int, optional
+        Number of runs, of which the fastest is used to reduce noise.
+    n_slowest : int, optional
+        Number of the slowest imports (by self time) to print.
+    cli_args : Sequence[str], optional
+        Arguments to run the CLI with. By default, ``--version``.
+
+    Returns
+    -------
+    within_budget : bool
+        True if the total import time is within the budget.
+
+    """
+    import_times = min(
+        (measure_importtime(cli_args=cli_args)
+         for __ in range(max(n_runs, 1))),
+        key=lambda run_times: sum(
+            cumulative_us for __, depth, __, cumulative_us in run_times
+            if not depth))
+    total_ms = sum(cumulative_us for __, depth, __, cumulative_us
+                   in import_times if not depth) / 1000
+
+    print(f"Slowest imports of 'brokkr {' '.join(cli_args)}' (self ms):")
+    for module_name, __, self_us, __ in sorted(
+            import_times, key=lambda times: times[2],
+            reverse=True)[:n_slowest]:
+        print(f"{self_us / 1000:>8.1f}  {module_name}")
+    print(f"Total import time: {total_ms:.1f} ms "
+          f"({len(import_times)} modules, budget {budget_ms} ms)")
+
+    within_budget = total_ms <= budget_ms
+    if not within_budget:
+        print(f"Import time exceeds budget by {total_ms - budget_ms:.1f} ms",
+              file=sys.stderr)
+    return within_budget
+
+
+def main(sys_argv=None):
+    parser_main = argparse.ArgumentParser(
+        description="Check the Brokkr CLI cold-start import time.")
+    parser_main.add_argument(
+        "--budget-ms", type=float, default=BUDGET_MS_DEFAULT,
+        help="Maximum total import time, in ms (default %(default)s)")
+    parser_main.add_argument(
+        "--runs", type=int, default=N_RUNS_DEFAULT, dest="n_runs",
+        help="Number of runs to take the fastest of (default %(default)s)")
+    parser_main.add_argument(
+        "--slowest", type=int, default=N_SLOWEST_DEFAULT, dest="n_slowest",
+        help="Number of slowest imports to list (default %(default)s)")
+    parser_main.add_argument(
+        "cli_args", nargs="*", default=list(CLI_ARGS_DEFAULT),
+        help="Arguments to run the CLI with, after '--' "
+        "(default %(default)s)")
+    parsed_args = parser_main.parse_args(sys_argv)
+    try:
+        within_budget = check_importtime(**vars(parsed_args))
+    except RuntimeError as e:
+        print(f"Could not measure import time: {e}", file=sys.stderr)
+        sys.exit(2)
+    sys.exit(0 if within_budget else 1)
+
+
+if __name__ == "__main__":
+    main()